@@ -1,4 +1,4 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from app.services.user_service import (
     register_user,
     get_users,
@@ -6,49 +6,73 @@ from app.services.user_service import (
     edit_user,
     remove_user,
     link_google_account,
+    export_users,
+    import_users,
+    get_users_batch,
 )
 from app.services.google_auth_service import google_login_user
 from app.services.auth_service import login_user, login_service
+from app.services.token_service import refresh_access_token, OFFLINE_ACCESS_SCOPE
 from app.schemas.user import (
     UserCreate,
     UserLogin,
     UserUpdate,
     ServiceLogin,
     UserGoogleUpdate,
+    UserFilters,
+    UserBatchRequest,
 )
 
 
-def handle_register_user(db: Session, user: UserCreate):
-    return register_user(db, user)
+async def handle_register_user(db: AsyncSession, user: UserCreate):
+    return await register_user(db, user)
 
 
-def handle_login_user(db: Session, user: UserLogin):
-    return login_user(db, user)
+async def handle_login_user(db: AsyncSession, user: UserLogin, scopes: list[str]):
+    return await login_user(db, user, OFFLINE_ACCESS_SCOPE in scopes)
 
 
-def handle_get_users(db: Session):
-    return get_users(db)
+async def handle_refresh_token(db: AsyncSession, refresh_token: str):
+    return await refresh_access_token(db, refresh_token)
 
 
-def handle_get_user(db: Session, user_id: int):
-    return get_user(db, user_id)
+async def handle_get_users(
+    db: AsyncSession, filters: UserFilters, cursor: int | None, limit: int
+):
+    return await get_users(db, filters, cursor, limit)
 
 
-def handle_edit_user(db: Session, user_id: int, user_data: UserUpdate):
-    return edit_user(db, user_id, user_data)
+def handle_export_users(session_factory: async_sessionmaker, format: str):
+    return export_users(session_factory, format)
 
 
-def handle_delete_user(db: Session, user_id: int):
-    return remove_user(db, user_id)
+async def handle_import_users(db: AsyncSession, records: list):
+    return await import_users(db, records)
+
+
+async def handle_get_users_batch(db: AsyncSession, request: UserBatchRequest):
+    return await get_users_batch(db, request)
+
+
+async def handle_get_user(db: AsyncSession, user_id: int):
+    return await get_user(db, user_id)
+
+
+async def handle_edit_user(db: AsyncSession, user_id: int, user_data: UserUpdate):
+    return await edit_user(db, user_id, user_data)
+
+
+async def handle_delete_user(db: AsyncSession, user_id: int):
+    return await remove_user(db, user_id)
 
 
 def handle_service_login(user: ServiceLogin):
     return login_service(user)
 
 
-def handle_google_login(db: Session, token: str):
-    return google_login_user(db, token)
+async def handle_google_login(db: AsyncSession, token: str, scopes: list[str]):
+    return await google_login_user(db, token, OFFLINE_ACCESS_SCOPE in scopes)
 
 
-def handle_link_google_login(db: Session, token: str):
-    return link_google_account(db, token)
+async def handle_link_google_login(db: AsyncSession, token: str, scopes: list[str]):
+    return await link_google_account(db, token, OFFLINE_ACCESS_SCOPE in scopes)
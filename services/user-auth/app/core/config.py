@@ -26,22 +26,110 @@ class Settings(BaseSettings):
     SERVICE_ACCESS_TOKEN_EXPIRE_MINUTES: int
     PGSSLMODE: str = "require"
 
+    # Pool de conexiones de cada worker: hasta DB_POOL_SIZE + DB_POOL_MAX_OVERFLOW
+    # conexiones; si no se libera ninguna en DB_POOL_TIMEOUT_SECONDS se responde
+    # 503. Reciclar y verificar (pre-ping) las conexiones evita usar una que el
+    # servidor ya cerró
+    DB_POOL_SIZE: int = 5
+    DB_POOL_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 5.0
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = True
+
     @property
     def DATABASE_URL(self) -> str:
         return f"postgresql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}?sslmode={self.PGSSLMODE}"
 
+    @property
+    def ASYNC_DATABASE_URL(self) -> str:
+        # asyncpg recibe el modo SSL como "ssl" en lugar de "sslmode"
+        return f"postgresql+asyncpg://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}?ssl={self.PGSSLMODE}"
+
     SECRET_KEY: str
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
 
+    # Firma asimétrica (ALGORITHM=RS256 o EdDSA): claves PEM en JWT_KEYS_DIR,
+    # una por archivo <kid>.pem, y la activa para firmar
+    JWT_KEYS_DIR: str = "keys"
+    JWT_ACTIVE_KID: str | None = None
+    JWKS_CACHE_MAX_AGE_SECONDS: int = 300
+
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 30
+    # Purga periódica de refresh tokens vencidos (en lotes)
+    REFRESH_TOKEN_PURGE_INTERVAL_SECONDS: float = 3600.0
+    REFRESH_TOKEN_PURGE_BATCH_SIZE: int = 1000
+
+    USERS_PAGE_DEFAULT_SIZE: int = 50
+    USERS_PAGE_MAX_SIZE: int = 200
+    USERS_EXPORT_BATCH_SIZE: int = 1000
+    USERS_IMPORT_MAX_ROWS: int = 200000
+    USERS_BATCH_MAX_SIZE: int = 500
+    USERS_IMPORT_CHUNK_SIZE: int = 1000
+
+    IDENTITY_CACHE_MAX_SIZE: int = 10000
+    IDENTITY_CACHE_TTL_SECONDS: float = 60.0
+
     MAX_FAILED_LOGIN_ATTEMPTS: int
     LOCK_TIME_LOGIN_WINDOW: int
     LOCK_USER_TIME: int
+    # "memory": ventana deslizante por proceso; "shared": almacén compartido
+    # entre workers (Redis en LOCKOUT_STORE_URL, o uno local si no se define)
+    LOCKOUT_BACKEND: str = "memory"
+    LOCKOUT_STORE_URL: str | None = None
+    LOCKOUT_MAX_KEYS: int = 100000
+
+    # Límites de los endpoints de login: por ruta, claves "ip" y/o "account"
+    # (username del formulario) con formato N/second|minute|hour. Se puede
+    # redefinir como JSON en la variable de entorno
+    RATE_LIMITS: dict[str, dict[str, str]] = {
+        "/api/v1/token": {"ip": "30/minute", "account": "10/minute"},
+        "/api/v1/token/service": {"ip": "30/minute", "account": "10/minute"},
+        "/api/v1/token/google": {"ip": "30/minute"},
+        "/api/v1/token/google/link": {"ip": "30/minute"},
+    }
+    RATE_LIMIT_MAX_KEYS: int = 100000
+    # Proxies confiables delante del servicio que agregan su salto a
+    # X-Forwarded-For (1 en Render). La IP del cliente es la entrada que
+    # agregó el proxy más externo, contando desde la derecha: las de más a la
+    # izquierda las controla el cliente. 0 = usar la IP de la conexión
+    RATE_LIMIT_TRUSTED_PROXY_HOPS: int = 0
+
+    # Pool de hilos para el trabajo bloqueante de autenticación (verificación
+    # de tokens de Google); por encima de workers + cola se responde 503
+    AUTH_EXECUTOR_MAX_WORKERS: int = 8
+    AUTH_EXECUTOR_MAX_QUEUE: int = 32
+
+    # Hash de contraseñas (scrypt): costo n (potencia de 2), r y p, y procesos
+    # del pool (0 = uno por núcleo)
+    PASSWORD_HASH_N: int = 16384
+    PASSWORD_HASH_R: int = 8
+    PASSWORD_HASH_P: int = 1
+    PASSWORD_HASH_WORKERS: int = 0
+    # Procesos aparte para las importaciones masivas, así no ocupan el pool
+    # que usan los logins
+    PASSWORD_HASH_BULK_WORKERS: int = 1
+    # Costo n de las contraseñas importadas: con PASSWORD_HASH_N una
+    # importación de 100k filas tardaría horas. Se suben a PASSWORD_HASH_N
+    # en el primer login (needs_rehash)
+    PASSWORD_HASH_IMPORT_N: int = 256
+    PASSWORD_HASH_MAX_QUEUE: int = 64
 
     DATADOG_API_KEY: str
     DATADOG_URL: str
+    METRICS_FLUSH_INTERVAL_SECONDS: float = 10.0
+    METRICS_MAX_SERIES: int = 1000
+    METRICS_HTTP_TIMEOUT_SECONDS: float = 5.0
 
     WEB_CLIENT_ID: str
+    # Certificados públicos para verificar los ID tokens de Google. Para
+    # pruebas locales se puede apuntar a un endpoint falso con certificados
+    # propios
+    GOOGLE_CERTS_URL: str = "https://www.googleapis.com/oauth2/v1/certs"
+    GOOGLE_CERTS_TIMEOUT_SECONDS: float = 5.0
+    GOOGLE_CERTS_MIN_REFRESH_SECONDS: int = 30
+    # Vigencia si la respuesta no trae Cache-Control: max-age
+    GOOGLE_CERTS_DEFAULT_MAX_AGE_SECONDS: int = 300
 
 
 try:
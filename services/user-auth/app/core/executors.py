@@ -0,0 +1,128 @@
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Callable
+from fastapi import HTTPException, status
+from prometheus_client import Counter, Gauge, Histogram
+from app.core.config import settings
+from app.core.metrics import LATENCY_BUCKETS
+import asyncio
+import logging
+import threading
+import time
+
+EXECUTOR_QUEUE_DEPTH = Gauge(
+    "user_auth_executor_queue_depth",
+    "Tareas esperando un worker libre en el executor",
+    ["executor"],
+    multiprocess_mode="livesum",
+)
+EXECUTOR_RUNNING = Gauge(
+    "user_auth_executor_running",
+    "Tareas ejecutándose en el executor",
+    ["executor"],
+    multiprocess_mode="livesum",
+)
+EXECUTOR_TASK_DURATION = Histogram(
+    "user_auth_executor_task_duration_seconds",
+    "Tiempo desde que se envía una tarea al executor hasta que termina (cola + ejecución)",
+    ["executor"],
+    buckets=LATENCY_BUCKETS,
+)
+EXECUTOR_REJECTED = Counter(
+    "user_auth_executor_rejected_total",
+    "Tareas rechazadas por executor saturado",
+    ["executor"],
+)
+
+
+class BoundedExecutor:
+    """
+    Ejecuta trabajo bloqueante fuera del event loop con una cola acotada.
+
+    Admite a lo sumo `max_workers + max_queue` tareas pendientes; más allá de
+    eso responde 503 en lugar de encolar: si Google o la base están lentos,
+    solo se degradan los endpoints que usan este executor y no todo el worker.
+
+    El executor subyacente (de hilos o de procesos) se crea en el primer uso,
+    así cada worker de gunicorn arma el suyo después del fork.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        executor_factory: Callable[[], Executor],
+        max_workers: int,
+        max_queue: int,
+    ):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max_workers + max_queue
+        self._executor_factory = executor_factory
+        self._executor: Executor | None = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._queue_depth = EXECUTOR_QUEUE_DEPTH.labels(name)
+        self._running = EXECUTOR_RUNNING.labels(name)
+        self._duration = EXECUTOR_TASK_DURATION.labels(name)
+        self._rejected = EXECUTOR_REJECTED.labels(name)
+
+    def _update_gauges(self):
+        # Las tareas se atienden en orden: mientras haya workers libres nada
+        # espera en la cola
+        self._running.set(min(self._pending, self.max_workers))
+        self._queue_depth.set(max(self._pending - self.max_workers, 0))
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._executor_factory()
+            return self._executor
+
+    async def run(self, func, *args):
+        """Ejecuta func(*args) en el executor; con procesos, func y args deben
+        poder serializarse con pickle"""
+        executor = self._get_executor()
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected.inc()
+                logging.warning(f"Executor {self.name} saturado, se rechaza la tarea")
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Servicio saturado, intente nuevamente en unos segundos",
+                    headers={"Retry-After": "1"},
+                )
+            self._pending += 1
+            self._update_gauges()
+
+        submitted_at = time.perf_counter()
+        try:
+            future = executor.submit(func, *args)
+        except BaseException:
+            self._release(submitted_at)
+            raise
+        # Se libera el lugar cuando la tarea termina de verdad, aunque quien
+        # la esperaba se haya cancelado (p. ej. el cliente cortó la conexión)
+        future.add_done_callback(lambda _: self._release(submitted_at))
+        return await asyncio.wrap_future(future)
+
+    def _release(self, submitted_at: float):
+        self._duration.observe(time.perf_counter() - submitted_at)
+        with self._lock:
+            self._pending -= 1
+            self._update_gauges()
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Trabajo de autenticación bloqueante (verificación de tokens de Google)
+auth_executor = BoundedExecutor(
+    "auth",
+    lambda: ThreadPoolExecutor(
+        max_workers=settings.AUTH_EXECUTOR_MAX_WORKERS, thread_name_prefix="auth"
+    ),
+    max_workers=settings.AUTH_EXECUTOR_MAX_WORKERS,
+    max_queue=settings.AUTH_EXECUTOR_MAX_QUEUE,
+)
@@ -0,0 +1,164 @@
+from google.auth import exceptions, transport
+from google.auth.transport.requests import Request as RequestsTransport
+from app.core.config import settings
+import asyncio
+import json
+import logging
+import re
+import threading
+import time
+import requests
+
+# URL fija que usa id_token.verify_oauth2_token para pedir los certificados
+GOOGLE_OAUTH2_CERTS_URL = "https://www.googleapis.com/oauth2/v1/certs"
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+class _CachedResponse(transport.Response):
+    def __init__(self, data: bytes):
+        self._data = data
+
+    @property
+    def status(self):
+        return 200
+
+    @property
+    def headers(self):
+        return {}
+
+    @property
+    def data(self):
+        return self._data
+
+
+class GoogleCertsCache(transport.Request):
+    """
+    Transporte de google-auth que sirve los certificados públicos de Google
+    desde memoria; la verificación de la firma del ID token es local.
+
+    Los certificados se guardan el tiempo que indica el Cache-Control
+    (max-age) de la respuesta de Google y una tarea de fondo los renueva antes
+    de que venzan, así que ningún login espera esa descarga. Si llega un token
+    firmado con una clave desconocida (rotación) se vuelven a pedir, como
+    mucho una vez cada `min_refresh_interval` segundos.
+
+    Usa una única sesión HTTP por proceso, también para cualquier otro pedido
+    que google-auth haga a través de este transporte.
+    """
+
+    def __init__(
+        self,
+        certs_url: str,
+        timeout: float,
+        min_refresh_interval: float,
+        default_max_age: float,
+        session: requests.Session | None = None,
+    ):
+        self.certs_url = certs_url
+        self.timeout = timeout
+        self.min_refresh_interval = min_refresh_interval
+        self.default_max_age = default_max_age
+        self.session = session or requests.Session()
+        self.expires_at = 0.0
+        self.fetched_at = 0.0
+        self._data: bytes | None = None
+        self._kids: frozenset[str] = frozenset()
+        self._lock = threading.Lock()
+        self._transport = RequestsTransport(session=self.session)
+        self._task: asyncio.Task | None = None
+
+    def _max_age(self, response: requests.Response) -> float:
+        match = _MAX_AGE.search(response.headers.get("Cache-Control", ""))
+        if not match:
+            return self.default_max_age
+        age = int(response.headers.get("Age", 0) or 0)
+        return max(int(match.group(1)) - age, 0)
+
+    def refresh(self):
+        """Descarga los certificados (una sola descarga aunque haya varios hilos)"""
+        requested_at = time.monotonic()
+        with self._lock:
+            if self.fetched_at >= requested_at:
+                # Otro hilo los descargó mientras se esperaba el lock
+                return
+            response = self.session.get(self.certs_url, timeout=self.timeout)
+            if response.status_code != 200:
+                raise exceptions.TransportError(
+                    f"No se pudieron obtener los certificados de {self.certs_url} "
+                    f"(status {response.status_code})"
+                )
+            certs = json.loads(response.content)
+            if "keys" in certs:
+                kids = frozenset(key.get("kid") for key in certs["keys"])
+            else:
+                kids = frozenset(certs)
+
+            now = time.monotonic()
+            self._data = response.content
+            self._kids = kids
+            self.fetched_at = now
+            self.expires_at = now + self._max_age(response)
+            logging.info(
+                f"Certificados de Google actualizados ({len(kids)} claves, "
+                f"vencen en {self.expires_at - now:.0f}s)"
+            )
+
+    def ensure_key(self, kid: str | None):
+        """Vuelve a pedir los certificados si `kid` no está entre los cacheados"""
+        if (
+            self._data is not None
+            and kid not in self._kids
+            and time.monotonic() - self.fetched_at >= self.min_refresh_interval
+        ):
+            logging.info(f"Clave de Google desconocida ({kid}), renovando certificados")
+            self.refresh()
+
+    def __call__(self, url, method="GET", body=None, headers=None, timeout=None, **kw):
+        if method == "GET" and url in (GOOGLE_OAUTH2_CERTS_URL, self.certs_url):
+            if self._data is None or time.monotonic() >= self.expires_at:
+                self.refresh()
+            return _CachedResponse(self._data)
+        return self._transport(
+            url, method=method, body=body, headers=headers, timeout=timeout, **kw
+        )
+
+    def _seconds_until_refresh(self) -> float:
+        # Se renueva al 90% de la vida útil para no servir nunca vencidos
+        remaining = self.expires_at - time.monotonic()
+        lifetime = self.expires_at - self.fetched_at
+        return max(remaining - lifetime * 0.1, self.min_refresh_interval)
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.refresh)
+                delay = self._seconds_until_refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Error al renovar certificados de Google: {str(e)}")
+                delay = self.min_refresh_interval
+            await asyncio.sleep(delay)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.session.close()
+
+
+google_certs = GoogleCertsCache(
+    certs_url=settings.GOOGLE_CERTS_URL,
+    timeout=settings.GOOGLE_CERTS_TIMEOUT_SECONDS,
+    min_refresh_interval=settings.GOOGLE_CERTS_MIN_REFRESH_SECONDS,
+    default_max_age=settings.GOOGLE_CERTS_DEFAULT_MAX_AGE_SECONDS,
+)
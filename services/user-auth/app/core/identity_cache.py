@@ -0,0 +1,67 @@
+from app.core.config import settings
+from app.utils.ttl_cache import TTLCache
+from app.schemas.user import CurrentUser
+from prometheus_client import Counter, Gauge
+import itertools
+import logging
+
+IDENTITY_CACHE_REQUESTS = Counter(
+    "user_auth_identity_cache_requests_total",
+    "Consultas al caché de identidades por resultado (hit/miss)",
+    ["result"],
+)
+IDENTITY_CACHE_SIZE = Gauge(
+    "user_auth_identity_cache_size",
+    "Cantidad de identidades en caché",
+    multiprocess_mode="livesum",
+)
+
+# Identidades de usuario (sin contraseña) indexadas por el email del token
+identity_cache = TTLCache(
+    maxsize=settings.IDENTITY_CACHE_MAX_SIZE, ttl=settings.IDENTITY_CACHE_TTL_SECONDS
+)
+
+# Generación de cada email invalidado hace poco. Un miss anota la generación
+# antes de leer la base y solo cachea la fila si no cambió: si una edición la
+# invalidó mientras tanto, la fila leída puede ser la anterior. Los valores
+# salen de un contador global y no se repiten, así que una entrada vencida no
+# puede coincidir con la de un miss en curso; duran lo mismo que una identidad
+_generations = TTLCache(
+    maxsize=settings.IDENTITY_CACHE_MAX_SIZE, ttl=settings.IDENTITY_CACHE_TTL_SECONDS
+)
+_next_generation = itertools.count(1)
+
+_cache_hits = IDENTITY_CACHE_REQUESTS.labels("hit")
+_cache_misses = IDENTITY_CACHE_REQUESTS.labels("miss")
+
+
+def get_cached_identity(email: str) -> CurrentUser | None:
+    current_user = identity_cache.get(email)
+    if current_user is None:
+        _cache_misses.inc()
+    else:
+        _cache_hits.inc()
+    return current_user
+
+
+def identity_generation(email: str) -> int:
+    return _generations.get(email) or 0
+
+
+def cache_identity(email: str, current_user: CurrentUser, generation: int):
+    """Cachea la identidad si el email no se invalidó desde `generation`"""
+    if identity_generation(email) != generation:
+        logging.debug(f"Identidad de {email} invalidada durante la lectura")
+        return
+    identity_cache.set(email, current_user)
+    IDENTITY_CACHE_SIZE.set(len(identity_cache))
+
+
+def invalidate_identity(*emails: str | None):
+    """Descarta la identidad cacheada de los emails indicados"""
+    for email in emails:
+        if email:
+            logging.debug(f"Invalidando identidad cacheada de: {email}")
+            identity_cache.invalidate(email)
+            _generations.set(email, next(_next_generation))
+    IDENTITY_CACHE_SIZE.set(len(identity_cache))
@@ -0,0 +1,158 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from app.core.config import settings
+import logging
+import threading
+import time
+
+
+class LockoutStore(ABC):
+    """
+    Registro de intentos de login fallidos por cuenta.
+
+    Los fallos no se escriben en la tabla users: solo cuando se alcanza el
+    máximo de intentos dentro de la ventana se persiste el bloqueo.
+    """
+
+    @abstractmethod
+    async def register_failure(self, key: str) -> int:
+        """Registra un fallo y devuelve cuántos hay dentro de la ventana"""
+
+    @abstractmethod
+    async def reset(self, key: str):
+        """Olvida los fallos registrados de la cuenta"""
+
+
+class InMemoryLockoutStore(LockoutStore):
+    """
+    Ventana deslizante en memoria: por cuenta se guardan a lo sumo
+    `max_attempts` marcas de tiempo, y a lo sumo `max_keys` cuentas (se
+    desaloja la de actividad más antigua).
+
+    Cada proceso (worker) lleva su propio registro, así que con N workers un
+    atacante puede llegar a N * max_attempts intentos antes del bloqueo. Para
+    un límite exacto entre workers usar el backend compartido.
+    """
+
+    def __init__(self, max_attempts: int, window: float, max_keys: int):
+        self.max_attempts = max_attempts
+        self.window = window
+        self.max_keys = max_keys
+        self._failures: OrderedDict[str, deque[float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def register_failure(self, key: str) -> int:
+        now = time.monotonic()
+        with self._lock:
+            failures = self._failures.get(key)
+            if failures is None:
+                failures = deque(maxlen=self.max_attempts)
+                self._failures[key] = failures
+            else:
+                self._failures.move_to_end(key)
+            while failures and failures[0] <= now - self.window:
+                failures.popleft()
+            failures.append(now)
+            while len(self._failures) > self.max_keys:
+                self._failures.popitem(last=False)
+            return len(failures)
+
+    async def reset(self, key: str):
+        with self._lock:
+            self._failures.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._failures.clear()
+
+    def __len__(self) -> int:
+        return len(self._failures)
+
+
+class SharedLockoutStore(LockoutStore):
+    """
+    Adaptador para un almacén compartido entre workers con la interfaz de
+    redis.asyncio (incr / expire / delete).
+
+    Usa una ventana fija que arranca con el primer fallo, igual que las
+    columnas first_login_failure / failed_login_attempts: un contador atómico
+    por cuenta que expira solo.
+    """
+
+    def __init__(self, client, window: float, prefix: str = "lockout:"):
+        self.client = client
+        self.window = window
+        self.prefix = prefix
+
+    async def register_failure(self, key: str) -> int:
+        name = self.prefix + key
+        count = await self.client.incr(name)
+        if count == 1:
+            await self.client.expire(name, int(self.window))
+        return count
+
+    async def reset(self, key: str):
+        await self.client.delete(self.prefix + key)
+
+
+class LocalSharedClient:
+    """
+    Reemplazo local del almacén compartido (mismo subconjunto de comandos que
+    usa SharedLockoutStore), para desarrollo y tests sin un servidor Redis.
+    No comparte nada entre procesos.
+    """
+
+    def __init__(self):
+        self._values: dict[str, tuple[int, float | None]] = {}
+
+    def _get(self, name: str) -> tuple[int, float | None] | None:
+        entry = self._values.get(name)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            del self._values[name]
+            return None
+        return entry
+
+    async def incr(self, name: str) -> int:
+        value, expires_at = self._get(name) or (0, None)
+        self._values[name] = (value + 1, expires_at)
+        return value + 1
+
+    async def expire(self, name: str, seconds: int) -> bool:
+        entry = self._get(name)
+        if entry is None:
+            return False
+        self._values[name] = (entry[0], time.monotonic() + seconds)
+        return True
+
+    async def delete(self, *names: str) -> int:
+        return sum(self._values.pop(name, None) is not None for name in names)
+
+    def clear(self):
+        self._values.clear()
+
+
+def build_lockout_store() -> LockoutStore:
+    window = settings.LOCK_TIME_LOGIN_WINDOW * 60
+    if settings.LOCKOUT_BACKEND == "memory":
+        return InMemoryLockoutStore(
+            max_attempts=settings.MAX_FAILED_LOGIN_ATTEMPTS,
+            window=window,
+            max_keys=settings.LOCKOUT_MAX_KEYS,
+        )
+    if settings.LOCKOUT_BACKEND == "shared":
+        if not settings.LOCKOUT_STORE_URL:
+            logging.warning(
+                "LOCKOUT_STORE_URL no configurada: se usa un almacén local "
+                "que no se comparte entre workers"
+            )
+            return SharedLockoutStore(LocalSharedClient(), window=window)
+        # Dependencia opcional: solo se necesita con el backend compartido
+        import redis.asyncio as redis
+
+        return SharedLockoutStore(
+            redis.from_url(settings.LOCKOUT_STORE_URL), window=window
+        )
+    raise ValueError(f"LOCKOUT_BACKEND desconocido: {settings.LOCKOUT_BACKEND}")
+
+
+lockout_store = build_lockout_store()
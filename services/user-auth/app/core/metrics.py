@@ -1,45 +1,307 @@
 from functools import wraps
 from app.core.config import settings
-import requests
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+import asyncio
+import httpx
+import inspect
+import logging
+import os
+import threading
 import time
 
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Con PROMETHEUS_MULTIPROC_DIR definido, cada worker escribe sus valores en
+# archivos mmap propios y /metrics los agrega al momento del scrape
+REQUEST_LATENCY = Histogram(
+    "user_auth_http_request_duration_seconds",
+    "Latencia de las peticiones HTTP por endpoint",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "user_auth_http_requests_in_progress",
+    "Peticiones HTTP en curso",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+ACTION_LATENCY = Histogram(
+    "user_auth_action_duration_seconds",
+    "Latencia de las acciones de servicio (login_user, get_users, edit_user, ...)",
+    ["action", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_CALL_LATENCY = Histogram(
+    "user_auth_db_call_duration_seconds",
+    "Latencia de las llamadas al repositorio de usuarios",
+    ["operation"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_POOL_SIZE = Gauge(
+    "user_auth_db_pool_size",
+    "Tamaño configurado del pool de conexiones",
+    multiprocess_mode="livesum",
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "user_auth_db_pool_checked_out",
+    "Conexiones del pool actualmente en uso",
+    multiprocess_mode="livesum",
+)
+DB_POOL_MAX_OVERFLOW = Gauge(
+    "user_auth_db_pool_max_overflow",
+    "Conexiones adicionales que el pool puede abrir por encima de su tamaño",
+    multiprocess_mode="livesum",
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "user_auth_db_pool_checkout_wait_seconds",
+    "Tiempo hasta obtener una conexión del pool (espera + conexión nueva)",
+    buckets=(0.001, 0.0025) + LATENCY_BUCKETS,
+)
+DB_POOL_TIMEOUTS = Counter(
+    "user_auth_db_pool_timeouts_total",
+    "Peticiones rechazadas con 503 por pool de conexiones agotado",
+)
+
+
+class MetricsAggregator:
+    """
+    Acumula contadores en memoria y los envía a Datadog en lotes.
+
+    Registrar una métrica solo incrementa un contador; el envío HTTP ocurre en
+    una tarea de fondo cada `flush_interval` segundos, con un único payload
+    para todas las series. La cantidad de series es acotada: si se supera
+    `max_series`, las series nuevas se descartan y se cuentan en `dropped`.
+    """
+
+    def __init__(self, flush_interval: float, max_series: int, timeout: float):
+        self.flush_interval = flush_interval
+        self.max_series = max_series
+        self.timeout = timeout
+        self.dropped = 0
+        self._counts: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._client: httpx.AsyncClient | None = None
+        self._task: asyncio.Task | None = None
+
+    def increment(self, metric: str, value: int = 1):
+        with self._lock:
+            if metric in self._counts:
+                self._counts[metric] += value
+            elif len(self._counts) < self.max_series:
+                self._counts[metric] = value
+            else:
+                self.dropped += 1
+
+    def drain(self) -> dict[str, int]:
+        """Devuelve los contadores acumulados y reinicia el acumulador"""
+        with self._lock:
+            counts, self._counts = self._counts, {}
+        return counts
+
+    def build_payload(self, counts: dict[str, int], timestamp: int) -> dict:
+        return {
+            "series": [
+                {
+                    "metric": metric,
+                    "points": [[timestamp, value]],
+                    "type": "count",
+                    "interval": int(self.flush_interval),
+                    "tags": ["env:production", "service:auth-service"],
+                    "host": "auth-service",
+                }
+                for metric, value in counts.items()
+            ]
+        }
+
+    async def flush(self):
+        counts = self.drain()
+        if not counts or self._client is None:
+            return
+
+        try:
+            response = await self._client.post(
+                settings.DATADOG_URL,
+                json=self.build_payload(counts, int(time.time())),
+            )
+            if response.status_code >= 400:
+                logging.warning(
+                    f"Datadog rechazó el lote de métricas: {response.status_code}"
+                )
+        except Exception as e:
+            # Las métricas del lote se descartan para mantener la memoria acotada
+            logging.warning(f"No se pudieron enviar métricas a Datadog: {str(e)}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._client = httpx.AsyncClient(
+            headers={
+                "Content-Type": "application/json",
+                "DD-API-KEY": settings.DATADOG_API_KEY,
+            },
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=2, max_keepalive_connections=1),
+        )
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+metrics_aggregator = MetricsAggregator(
+    flush_interval=settings.METRICS_FLUSH_INTERVAL_SECONDS,
+    max_series=settings.METRICS_MAX_SERIES,
+    timeout=settings.METRICS_HTTP_TIMEOUT_SECONDS,
+)
+
 
 def send_metric(metric):
-    url = settings.DATADOG_URL
-    headers = {
-        "Content-Type": "application/json",
-        "DD-API-KEY": settings.DATADOG_API_KEY,
-    }
-
-    payload = {
-        "series": [
-            {
-                "metric": metric,
-                "points": [[int(time.time()), 1]],
-                "type": "count",
-                "interval": 1,
-                "tags": ["env:production", "service:auth-service"],
-                "host": "auth-service",
-            }
-        ]
-    }
-
-    requests.post(url, headers=headers, json=payload)
+    metrics_aggregator.increment(metric)
 
 
 def metric_trace(action_name):
     def decorator(func):
+        success_latency = ACTION_LATENCY.labels(action_name, "success")
+        error_latency = ACTION_LATENCY.labels(action_name, "error")
+
+        if inspect.iscoroutinefunction(func):
+
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                send_metric(f"user_service.{action_name}_attempt")
+                start = time.perf_counter()
+                try:
+                    result = await func(*args, **kwargs)
+                    success_latency.observe(time.perf_counter() - start)
+                    send_metric(f"user_service.{action_name}_success")
+                    return result
+                except Exception:
+                    error_latency.observe(time.perf_counter() - start)
+                    send_metric(f"user_service.{action_name}_error")
+                    raise
+
+            return async_wrapper
+
         @wraps(func)
         def wrapper(*args, **kwargs):
             send_metric(f"user_service.{action_name}_attempt")
+            start = time.perf_counter()
             try:
                 result = func(*args, **kwargs)
+                success_latency.observe(time.perf_counter() - start)
                 send_metric(f"user_service.{action_name}_success")
                 return result
             except Exception:
+                error_latency.observe(time.perf_counter() - start)
                 send_metric(f"user_service.{action_name}_error")
                 raise
 
         return wrapper
 
     return decorator
+
+
+def db_trace(operation):
+    """Registra la latencia de una función asincrónica del repositorio"""
+
+    def decorator(func):
+        latency = DB_CALL_LATENCY.labels(operation)
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                latency.observe(time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def set_pool_gauges(pool):
+    """Publica la capacidad configurada del pool"""
+    DB_POOL_SIZE.set(pool.size())
+    DB_POOL_MAX_OVERFLOW.set(pool._max_overflow)
+
+
+def instrument_pool(engine):
+    """Mantiene los gauges del pool a partir de los eventos checkout/checkin"""
+    set_pool_gauges(engine.pool)
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_POOL_CHECKED_OUT.inc()
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        DB_POOL_CHECKED_OUT.dec()
+
+
+class PrometheusMiddleware:
+    """Middleware ASGI que mide latencia y peticiones en curso por endpoint"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_progress = REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_progress.dec()
+            # Se usa la plantilla de la ruta (/user/{user_id}) para acotar la
+            # cardinalidad; las rutas inexistentes se agrupan en "unmatched"
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_LATENCY.labels(method, route, str(status_code)).observe(
+                time.perf_counter() - start
+            )
+
+
+def render_metrics() -> tuple[bytes, str]:
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
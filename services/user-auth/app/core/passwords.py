@@ -0,0 +1,124 @@
+from concurrent.futures import ProcessPoolExecutor
+from app.core.config import settings
+from app.core.executors import BoundedExecutor
+from app.utils import password_hashing
+import asyncio
+import multiprocessing
+import os
+import secrets
+
+
+def _process_pool(workers: int):
+    # "spawn" evita heredar hilos y conexiones del proceso que hace fork
+    return lambda: ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+class PasswordHasher:
+    """
+    Hash y verificación de contraseñas en un pool de procesos.
+
+    scrypt consume decenas de milisegundos de CPU por llamada: en el event
+    loop frenaría todas las peticiones del worker. En un pool de procesos el
+    costo se reparte entre los núcleos sin competir con el event loop.
+
+    Las importaciones masivas usan un pool aparte (`bulk_workers` procesos):
+    un lote de miles de contraseñas ocupa sus procesos durante segundos, y en
+    el pool de login haría esperar o rechazar (503) a todos los logins. Además
+    hashean con un costo `import_n` más bajo, que needs_rehash detecta y sube
+    al costo normal en el primer login.
+    """
+
+    def __init__(
+        self,
+        n: int,
+        r: int,
+        p: int,
+        workers: int,
+        bulk_workers: int,
+        import_n: int,
+        max_queue: int,
+    ):
+        self.n = n
+        self.r = r
+        self.p = p
+        self.workers = workers
+        self.bulk_workers = bulk_workers
+        self.import_n = import_n
+        self.executor = BoundedExecutor(
+            "password_hash",
+            _process_pool(workers),
+            max_workers=workers,
+            max_queue=max_queue,
+        )
+        self.bulk_executor = BoundedExecutor(
+            "password_hash_bulk",
+            _process_pool(bulk_workers),
+            max_workers=bulk_workers,
+            max_queue=max_queue,
+        )
+        self._dummy_hash: str | None = None
+
+    async def hash(self, password: str) -> str:
+        return await self.executor.run(
+            password_hashing.hash_password, password, self.n, self.r, self.p
+        )
+
+    async def hash_many(self, passwords: list[str]) -> list[str]:
+        """Reparte un lote entre los procesos de importación, una tarea por proceso"""
+        if not passwords:
+            return []
+        size = -(-len(passwords) // self.bulk_workers)
+        slices = await asyncio.gather(
+            *(
+                self.bulk_executor.run(
+                    password_hashing.hash_passwords,
+                    passwords[start : start + size],
+                    self.import_n,
+                    self.r,
+                    self.p,
+                )
+                for start in range(0, len(passwords), size)
+            )
+        )
+        return [hashed for chunk in slices for hashed in chunk]
+
+    async def verify(self, password: str, stored: str) -> bool:
+        if not password_hashing.is_hashed(stored):
+            # Texto plano heredado o cuenta sin contraseña: no hay nada costoso
+            return password_hashing.verify_password(password, stored)
+        return await self.executor.run(
+            password_hashing.verify_password, password, stored
+        )
+
+    async def verify_dummy(self, password: str):
+        """
+        Verificación contra un hash descartable, para que un email inexistente
+        tarde lo mismo que uno registrado y no se pueda saber cuál existe
+        """
+        if self._dummy_hash is None:
+            self._dummy_hash = await self.hash(secrets.token_urlsafe(16))
+        await self.verify(password, self._dummy_hash)
+
+    def needs_rehash(self, stored: str) -> bool:
+        return password_hashing.needs_rehash(stored, self.n, self.r, self.p)
+
+    async def start(self):
+        # Crea el pool de login y el hash descartable antes del primer login
+        self._dummy_hash = await self.hash(secrets.token_urlsafe(16))
+
+    def shutdown(self):
+        self.executor.shutdown()
+        self.bulk_executor.shutdown()
+
+
+password_hasher = PasswordHasher(
+    n=settings.PASSWORD_HASH_N,
+    r=settings.PASSWORD_HASH_R,
+    p=settings.PASSWORD_HASH_P,
+    workers=settings.PASSWORD_HASH_WORKERS or os.cpu_count() or 1,
+    bulk_workers=settings.PASSWORD_HASH_BULK_WORKERS,
+    import_n=settings.PASSWORD_HASH_IMPORT_N,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+)
@@ -0,0 +1,233 @@
+from collections import OrderedDict
+from urllib.parse import parse_qs
+from starlette.requests import Request
+from prometheus_client import Counter
+from app.core.config import settings
+from app.utils.problem_details import problem_detail_response
+import logging
+import math
+import threading
+import time
+
+RATE_LIMITED_REQUESTS = Counter(
+    "user_auth_rate_limited_requests_total",
+    "Peticiones rechazadas por el rate limiter, por ruta y tipo de clave",
+    ["route", "key"],
+)
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600}
+
+# Los formularios de login son chicos: no se bufferean cuerpos más grandes
+MAX_FORM_BODY_BYTES = 64 * 1024
+
+
+def parse_limit(limit: str) -> tuple[int, float]:
+    """Convierte "10/minute" en (capacidad, segundos del período)"""
+    amount, _, period = limit.partition("/")
+    if period not in PERIODS:
+        raise ValueError(f"Límite inválido: {limit!r} (se espera N/second|minute|hour)")
+    return int(amount), PERIODS[period]
+
+
+class TokenBucketLimiter:
+    """
+    Token bucket por clave: hasta `capacity` peticiones seguidas y luego
+    `capacity / period` por segundo.
+
+    Cada clave activa ocupa un par (tokens, último acceso). Las claves se
+    mantienen en orden de uso: un bucket que ya se rellenó por completo es
+    equivalente a no tenerlo, así que se descarta al recorrer las más viejas,
+    y nunca hay más de `max_keys`.
+    """
+
+    def __init__(self, capacity: int, period: float, max_keys: int):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.refill_time = period
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, list[float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str) -> float:
+        """Consume un token. Devuelve 0 si se permite, o los segundos a esperar"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = [float(self.capacity), now]
+                self._buckets[key] = bucket
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(
+                    self.capacity, bucket[0] + (now - bucket[1]) * self.rate
+                )
+                bucket[1] = now
+            self._evict(now)
+
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            return (1 - bucket[0]) / self.rate
+
+    def _evict(self, now: float):
+        while self._buckets:
+            oldest_key, (_, last_seen) = next(iter(self._buckets.items()))
+            if (
+                len(self._buckets) <= self.max_keys
+                and now - last_seen < self.refill_time
+            ):
+                break
+            del self._buckets[oldest_key]
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class RateLimiter:
+    """Límites por ruta, cada uno con buckets por IP y/o por cuenta"""
+
+    def __init__(self, rules: dict[str, dict[str, str]], max_keys: int):
+        for limits in rules.values():
+            unknown = set(limits) - {"ip", "account"}
+            if unknown:
+                raise ValueError(f"Tipo de clave de rate limit desconocido: {unknown}")
+        self.rules = {
+            path: {
+                kind: TokenBucketLimiter(*parse_limit(limit), max_keys=max_keys)
+                for kind, limit in limits.items()
+            }
+            for path, limits in rules.items()
+        }
+
+    def limits_for(self, path: str) -> dict[str, TokenBucketLimiter] | None:
+        return self.rules.get(path)
+
+    def clear(self):
+        for limits in self.rules.values():
+            for limiter in limits.values():
+                limiter.clear()
+
+
+rate_limiter = RateLimiter(settings.RATE_LIMITS, settings.RATE_LIMIT_MAX_KEYS)
+
+
+def client_ip(scope, trusted_hops: int | None = None) -> str:
+    """
+    IP del cliente para el límite por IP. Con `trusted_hops` proxies
+    confiables, cada uno agrega a X-Forwarded-For la IP desde la que recibió
+    la conexión: la del cliente es la entrada número `trusted_hops` desde la
+    derecha. Las anteriores las puede inventar el cliente.
+    """
+    if trusted_hops is None:
+        trusted_hops = settings.RATE_LIMIT_TRUSTED_PROXY_HOPS
+    if trusted_hops > 0:
+        forwarded = [
+            entry.strip()
+            for name, value in scope["headers"]
+            if name == b"x-forwarded-for"
+            for entry in value.decode("latin-1").split(",")
+        ]
+        if len(forwarded) >= trusted_hops:
+            return forwarded[-trusted_hops]
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+class RateLimitMiddleware:
+    """
+    Middleware ASGI de admisión para los endpoints de login: responde 429 con
+    Retry-After antes de tocar la base o Google.
+
+    La clave de cuenta es el campo `username` del formulario; para leerlo se
+    bufferea el cuerpo y se vuelve a entregar intacto a la aplicación.
+    """
+
+    def __init__(self, app, limiter: RateLimiter = rate_limiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        limits = None
+        if scope["type"] == "http" and scope["method"] == "POST":
+            limits = self.limiter.limits_for(scope["path"])
+        if not limits:
+            await self.app(scope, receive, send)
+            return
+
+        if "ip" in limits:
+            retry_after = limits["ip"].acquire(client_ip(scope))
+            if retry_after:
+                await self._reject(scope, receive, send, "ip", retry_after)
+                return
+
+        if "account" in limits:
+            body, receive = await self._buffer_body(scope, receive)
+            account = self._form_username(scope, body)
+            if account:
+                retry_after = limits["account"].acquire(account.lower())
+                if retry_after:
+                    await self._reject(scope, receive, send, "account", retry_after)
+                    return
+
+        await self.app(scope, receive, send)
+
+    async def _buffer_body(self, scope, receive):
+        chunks = []
+        size = 0
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] != "http.request":
+                # Cliente desconectado: se reenvía tal cual
+                return b"", self._replay([message], receive)
+            chunks.append(message)
+            size += len(message.get("body", b""))
+            more_body = message.get("more_body", False)
+            if size > MAX_FORM_BODY_BYTES:
+                return None, self._replay(chunks, receive)
+        return b"".join(m.get("body", b"") for m in chunks), self._replay(
+            chunks, receive
+        )
+
+    @staticmethod
+    def _replay(messages, receive):
+        pending = list(messages)
+
+        async def replay():
+            if pending:
+                return pending.pop(0)
+            return await receive()
+
+        return replay
+
+    @staticmethod
+    def _form_username(scope, body: bytes | None) -> str | None:
+        if not body:
+            return None
+        for name, value in scope["headers"]:
+            if name == b"content-type":
+                if not value.startswith(b"application/x-www-form-urlencoded"):
+                    return None
+                break
+        else:
+            return None
+        values = parse_qs(body.decode("latin-1")).get("username")
+        return values[0] if values else None
+
+    async def _reject(self, scope, receive, send, key: str, retry_after: float):
+        route = scope["path"]
+        RATE_LIMITED_REQUESTS.labels(route, key).inc()
+        logging.warning(f"Rate limit excedido ({key}) en {route}")
+        response = problem_detail_response(
+            status_code=429,
+            title="Demasiadas Solicitudes",
+            detail="Demasiados intentos, vuelva a intentar más tarde",
+            instance=str(Request(scope).url),
+            # Los headers CORS los agrega CORSMiddleware, que envuelve a este
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+        await response(scope, receive, send)
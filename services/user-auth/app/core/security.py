@@ -5,12 +5,18 @@ from datetime import datetime, timedelta, timezone
 from pydantic import ValidationError
 from app.schemas.user import CurrentService, Identity, UserInDB, TokenData, CurrentUser
 from app.core.config import settings
-from sqlalchemy.orm import Session
+from app.core.signing_keys import key_ring
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends, HTTPException, status
 from jwt.exceptions import InvalidTokenError
 from fastapi.security import OAuth2PasswordBearer, SecurityScopes
 from app.db.dependencies import get_db
 from app.repositories.user_repository import get_user_by_email
+from app.core.identity_cache import (
+    cache_identity,
+    get_cached_identity,
+    identity_generation,
+)
 from app.schemas.user import Token
 
 oauth2_scheme = OAuth2PasswordBearer(
@@ -29,12 +35,29 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=15)
     to_encode.update({"exp": expire})
+    if key_ring is not None:
+        kid, private_key = key_ring.signing_key()
+        return jwt.encode(
+            to_encode, private_key, algorithm=settings.ALGORITHM, headers={"kid": kid}
+        )
     encoded_jwt = jwt.encode(
         to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM
     )
     return encoded_jwt
 
 
+def decode_access_token(token: str) -> dict:
+    if key_ring is not None:
+        # El kid del header elige la clave pública, incluidas las anteriores
+        # a una rotación mientras sigan publicadas
+        kid = jwt.get_unverified_header(token).get("kid")
+        public_key = key_ring.public_key(kid)
+        if public_key is None:
+            raise InvalidTokenError("kid desconocido")
+        return jwt.decode(token, public_key, algorithms=[settings.ALGORITHM])
+    return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+
+
 def create_service_jwt(service_name: str) -> Token:
     access_token_expires = timedelta(
         minutes=settings.SERVICE_ACCESS_TOKEN_EXPIRE_MINUTES
@@ -50,11 +73,13 @@ def create_service_jwt(service_name: str) -> Token:
     return Token(access_token=access_token, token_type="bearer")
 
 
-def create_user_jwt(user_email: str) -> Token:
+def create_user_jwt(user_email: str, user_id: int) -> Token:
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={
             "sub": user_email,
+            # Id del usuario, para que otros servicios autoricen sin consultarlo
+            "uid": user_id,
             "scopes": ["user"],
             "role": "user",
         },
@@ -63,13 +88,25 @@ def create_user_jwt(user_email: str) -> Token:
     return Token(access_token=access_token, token_type="bearer")
 
 
-def get_user(db, email: str):
-    user = get_user_by_email(db, email=email)
+async def get_user(db: AsyncSession, email: str):
+    user = await get_user_by_email(db, email=email)
     if user:
         return UserInDB(**user.__dict__)
     return None
 
 
+async def get_current_user_identity(db: AsyncSession, email: str):
+    current_user = get_cached_identity(email)
+    if current_user is None:
+        generation = identity_generation(email)
+        user = await get_user(db, email=email)
+        if user is None:
+            return None
+        current_user = CurrentUser(**user.__dict__)
+        cache_identity(email, current_user, generation)
+    return current_user
+
+
 def create_credentials_exception():
     return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -81,7 +118,7 @@ def create_credentials_exception():
 async def get_current_identity(
     security_scopes: SecurityScopes,
     token: Annotated[str, Depends(oauth2_scheme)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     if security_scopes.scopes:
         authenticate_value = f'Bearer scope="{security_scopes.scope_str}"'
@@ -89,9 +126,7 @@ async def get_current_identity(
         authenticate_value = "Bearer"
 
     try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
+        payload = decode_access_token(token)
 
         username = payload.get("sub")
         if username is None:
@@ -106,8 +141,10 @@ async def get_current_identity(
     if role == "service":
         user = Identity(role=role, identity=CurrentService(name=username))
     elif role == "user":
-        current_user = get_user(db, email=token_data.username)
-        user = Identity(role=role, identity=CurrentUser(**current_user.__dict__))
+        current_user = await get_current_user_identity(db, token_data.username)
+        if current_user is None:
+            raise create_credentials_exception()
+        user = Identity(role=role, identity=current_user)
 
     if user is None:
         raise create_credentials_exception()
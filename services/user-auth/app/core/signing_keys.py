@@ -0,0 +1,106 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+from jwt.algorithms import OKPAlgorithm, RSAAlgorithm
+from app.core.config import settings
+
+
+def is_asymmetric(algorithm: str) -> bool:
+    return not algorithm.upper().startswith("HS")
+
+
+def public_jwk(kid: str, public_key, algorithm: str) -> dict:
+    if isinstance(public_key, ed25519.Ed25519PublicKey):
+        jwk = OKPAlgorithm.to_jwk(public_key, as_dict=True)
+    else:
+        jwk = RSAAlgorithm.to_jwk(public_key, as_dict=True)
+    return {**jwk, "kid": kid, "alg": algorithm, "use": "sig"}
+
+
+class SigningKeyRing:
+    """
+    Claves privadas para firmar tokens, identificadas por `kid`.
+
+    Los tokens nuevos se firman con la clave activa; las demás se siguen
+    publicando en el JWKS para validar los tokens que firmaron hasta que
+    expiren. Para rotar: agregar la clave nueva, publicarla (esperar al menos
+    JWKS_CACHE_MAX_AGE_SECONDS), activarla y quitar la anterior cuando ya no
+    queden tokens vigentes firmados con ella.
+    """
+
+    def __init__(self, private_keys: dict, active_kid: str, algorithm: str):
+        if active_kid not in private_keys:
+            raise ValueError(f"No existe la clave activa '{active_kid}'")
+        self.algorithm = algorithm
+        self.active_kid = active_kid
+        self._private_keys = private_keys
+        self._public_keys = {kid: key.public_key() for kid, key in private_keys.items()}
+        # El JWKS es fijo mientras el proceso vive: se serializa una sola vez
+        self.jwks_body = json.dumps(
+            {
+                "keys": [
+                    public_jwk(kid, key, algorithm)
+                    for kid, key in self._public_keys.items()
+                ]
+            }
+        ).encode()
+        self.jwks_etag = f'"{hashlib.sha256(self.jwks_body).hexdigest()[:32]}"'
+
+    def signing_key(self) -> tuple[str, object]:
+        return self.active_kid, self._private_keys[self.active_kid]
+
+    def public_key(self, kid: str):
+        return self._public_keys.get(kid)
+
+
+def load_key_ring(keys_dir: str, active_kid: str, algorithm: str) -> SigningKeyRing:
+    """Carga las claves PEM de `keys_dir`; el nombre de cada archivo es su kid"""
+    private_keys = {}
+    for filename in sorted(os.listdir(keys_dir)):
+        if not filename.endswith(".pem"):
+            continue
+        with open(os.path.join(keys_dir, filename), "rb") as key_file:
+            private_keys[filename[: -len(".pem")]] = serialization.load_pem_private_key(
+                key_file.read(), password=None
+            )
+    logging.info(f"Claves de firma cargadas: {', '.join(private_keys)}")
+    return SigningKeyRing(private_keys, active_kid, algorithm)
+
+
+def generate_private_key(algorithm: str):
+    if algorithm == "EdDSA":
+        return ed25519.Ed25519PrivateKey.generate()
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+key_ring = (
+    load_key_ring(settings.JWT_KEYS_DIR, settings.JWT_ACTIVE_KID, settings.ALGORITHM)
+    if is_asymmetric(settings.ALGORITHM)
+    else None
+)
+
+
+if __name__ == "__main__":
+    # Genera una clave nueva para rotar:
+    #   python -m app.core.signing_keys --algorithm RS256 --kid 2025-06 --dir keys
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--algorithm", choices=["RS256", "EdDSA"], default="RS256")
+    parser.add_argument("--kid", required=True)
+    parser.add_argument("--dir", required=True)
+    args = parser.parse_args()
+
+    key = generate_private_key(args.algorithm)
+    pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    os.makedirs(args.dir, exist_ok=True)
+    path = os.path.join(args.dir, f"{args.kid}.pem")
+    with open(path, "wb") as key_file:
+        key_file.write(pem)
+    print(path)
@@ -1,12 +1,12 @@
-from app.db.session import SessionLocal
+from app.db.session import AsyncSessionLocal
 from fastapi import HTTPException
 import logging
 
 
-def get_db():
+async def get_db():
     db = None
     try:
-        db = SessionLocal()
+        db = AsyncSessionLocal()
         yield db
     except HTTPException:
         raise
@@ -18,6 +18,14 @@ def get_db():
     finally:
         if db:
             try:
-                db.close()
+                await db.close()
             except Exception as e:
                 logging.error(f"Error al cerrar conexión DB: {str(e)}")
+
+
+def get_session_factory():
+    """
+    Fábrica de sesiones para respuestas en streaming, que necesitan una sesión
+    propia que viva mientras se envía el cuerpo de la respuesta.
+    """
+    return AsyncSessionLocal
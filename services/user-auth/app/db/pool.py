@@ -0,0 +1,35 @@
+from fastapi import HTTPException, status
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.core.metrics import DB_POOL_CHECKOUT_WAIT, DB_POOL_TIMEOUTS
+import logging
+import time
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Pool del engine asincrónico que mide cuánto espera cada petición por una
+    conexión.
+
+    Si el pool está agotado y no se libera una conexión dentro de
+    `pool_timeout`, responde 503 en lugar de dejar la petición colgada. Se
+    lanza HTTPException porque los servicios la propagan tal cual, mientras
+    que la TimeoutError de SQLAlchemy terminaría convertida en un 500.
+    """
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            DB_POOL_TIMEOUTS.inc()
+            logging.warning(
+                f"Pool de conexiones agotado ({self.status()}), se rechaza la petición"
+            )
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Base de datos saturada, intente nuevamente en unos segundos",
+                headers={"Retry-After": "1"},
+            )
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start)
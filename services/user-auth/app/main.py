@@ -1,19 +1,58 @@
-from fastapi import FastAPI, Request, HTTPException
+from fastapi import FastAPI, Request, HTTPException, Response
 from app.routers.user_router import router as user_router
 from app.db.base import Base
-from app.db.session import engine
+from app.db.session import engine, async_engine
+from app.core.metrics import (
+    PrometheusMiddleware,
+    instrument_pool,
+    metrics_aggregator,
+    render_metrics,
+)
 from app.utils.problem_details import problem_detail_response
-from sqlalchemy import text
+from app.core.config import settings
+from app.core.signing_keys import key_ring
+from app.core.rate_limit import RateLimitMiddleware
+from app.core.google_certs import google_certs
+from app.core.executors import auth_executor
+from app.core.passwords import password_hasher
+from app.services.token_service import refresh_token_purger
+from app.utils.password_hashing import UNUSABLE_PASSWORD
+from sqlalchemy import text, update
 import logging
 import traceback
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
 
 # Importar todos los modelos para que SQLAlchemy los registre
-from app.models.user import User
-
-app = FastAPI()
+from app.models.user import AuthProvider, User
+from app.models.refresh_token import RefreshToken
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Arranca las tareas de fondo y libera recursos al apagar"""
+    await metrics_aggregator.start()
+    await google_certs.start()
+    await password_hasher.start()
+    await refresh_token_purger.start()
+    yield
+    await refresh_token_purger.stop()
+    await google_certs.stop()
+    auth_executor.shutdown()
+    password_hasher.shutdown()
+    await metrics_aggregator.stop()
+    await async_engine.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
+
+# Primero el rate limiter: queda por dentro de las métricas, que también
+# registran los 429
+app.add_middleware(RateLimitMiddleware)
+app.add_middleware(PrometheusMiddleware)
+instrument_pool(async_engine.sync_engine)
 
 # Configurar CORS para permitir peticiones desde el frontend
 app.add_middleware(
@@ -27,9 +66,34 @@ app.add_middleware(
 
 logging.getLogger("urllib3").setLevel(logging.WARNING)
 
+
+def migrate_legacy_google_passwords() -> int:
+    """
+    Las cuentas de Google creadas antes del hash guardaban el ID token de
+    Google como contraseña: se reemplaza por una contraseña inutilizable
+    """
+    with engine.begin() as connection:
+        migrated = connection.execute(
+            update(User)
+            .where(
+                User.auth_provider == AuthProvider.GOOGLE,
+                ~User.password.startswith("scrypt$"),
+                User.password.like("%.%.%"),
+            )
+            .values(password=UNUSABLE_PASSWORD)
+        ).rowcount
+    if migrated:
+        logging.info(f"Contraseñas de cuentas de Google migradas: {migrated}")
+    return migrated
+
+
 # Crear todas las tablas al iniciar la aplicación
 try:
     Base.metadata.create_all(bind=engine)
+    # create_all no agrega índices nuevos a tablas ya existentes
+    for index in User.__table__.indexes | RefreshToken.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+    migrate_legacy_google_passwords()
     logging.info("Tablas creadas correctamente en la base de datos")
 except Exception as e:
     logging.error(f"Error al crear tablas en la base de datos: {str(e)}")
@@ -136,9 +200,35 @@ async def generic_exception_handler(request: Request, exc: Exception):
 @app.get("/health")
 async def health_check():
     try:
-        with engine.connect() as connection:
-            connection.execute(text("SELECT 1"))
+        async with async_engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
         return {"status": "healthy", "database": "connected"}
     except Exception as e:
         logging.error(f"Error en health check: {str(e)}")
         return {"status": "unhealthy", "error": str(e)}
+
+
+@app.get("/metrics")
+async def metrics():
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
+
+
+@app.get("/.well-known/jwks.json")
+async def jwks(request: Request):
+    """Claves públicas para validar tokens sin consultar a user-auth"""
+    headers = {
+        "Cache-Control": f"public, max-age={settings.JWKS_CACHE_MAX_AGE_SECONDS}"
+    }
+    if key_ring is None:
+        # Con firma simétrica (HS256) no hay claves públicas para publicar
+        return Response(
+            content=b'{"keys": []}', media_type="application/json", headers=headers
+        )
+
+    headers["ETag"] = key_ring.jwks_etag
+    if request.headers.get("if-none-match") == key_ring.jwks_etag:
+        return Response(status_code=304, headers=headers)
+    return Response(
+        content=key_ring.jwks_body, media_type="application/json", headers=headers
+    )
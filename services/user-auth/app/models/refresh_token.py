@@ -0,0 +1,20 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String
+from app.db.base import Base
+
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    # El token entregado al cliente es "<id>.<secreto>": el id es la clave de
+    # búsqueda y del secreto solo se guarda su hash SHA-256
+    id = Column(String(32), primary_key=True)
+    token_hash = Column(String(64), nullable=False)
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    # Todos los tokens obtenidos por rotación a partir de un mismo login
+    family_id = Column(String(32), nullable=False, index=True)
+    # Indexado para la purga periódica de tokens vencidos
+    expires_at = Column(DateTime, nullable=False, index=True)
+    revoked_at = Column(DateTime, nullable=True)
+    replaced_by = Column(String(32), nullable=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Enum
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Enum, Index
 from app.db.base import Base
 import enum
 
@@ -11,6 +11,14 @@ class AuthProvider(str, enum.Enum):
 
 class User(Base):
     __tablename__ = "users"
+    # Índices compuestos (filtro, id) para la paginación por cursor de GET /users
+    __table_args__ = (
+        Index("ix_users_is_teacher_id", "is_teacher", "id"),
+        Index("ix_users_academic_level_id", "academic_level", "id"),
+        Index("ix_users_location_id", "location", "id"),
+        Index("ix_users_is_blocked_id", "is_blocked", "id"),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
     email = Column(String, unique=True, nullable=False)
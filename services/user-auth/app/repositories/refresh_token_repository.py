@@ -0,0 +1,86 @@
+from datetime import datetime
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.refresh_token import RefreshToken
+from app.models.user import User
+from app.core.metrics import db_trace
+
+
+@db_trace("get_refresh_token")
+async def get_refresh_token(db: AsyncSession, token_id: str):
+    """Devuelve (token, email, is_blocked) con una única consulta por clave primaria"""
+    statement = (
+        select(RefreshToken, User.email, User.is_blocked)
+        .join(User, User.id == RefreshToken.user_id)
+        .where(RefreshToken.id == token_id)
+    )
+    return (await db.execute(statement)).first()
+
+
+def add_refresh_token(
+    db: AsyncSession,
+    token_id: str,
+    token_hash: str,
+    user_id: int,
+    family_id: str,
+    expires_at: datetime,
+):
+    db.add(
+        RefreshToken(
+            id=token_id,
+            token_hash=token_hash,
+            user_id=user_id,
+            family_id=family_id,
+            expires_at=expires_at,
+        )
+    )
+
+
+@db_trace("revoke_refresh_token")
+async def revoke_refresh_token(
+    db: AsyncSession, token_id: str, replaced_by: str, now: datetime
+) -> bool:
+    """
+    Marca el token como usado si todavía no lo estaba. Devuelve False si otro
+    pedido lo usó primero (el UPDATE condicional evita la carrera).
+    """
+    result = await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.id == token_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=now, replaced_by=replaced_by)
+        .returning(RefreshToken.id)
+    )
+    return result.scalar_one_or_none() is not None
+
+
+@db_trace("revoke_refresh_token_family")
+async def revoke_refresh_token_family(db: AsyncSession, family_id: str, now: datetime):
+    await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=now)
+    )
+
+
+@db_trace("revoke_user_refresh_tokens")
+async def revoke_user_refresh_tokens(db: AsyncSession, user_id: int, now: datetime):
+    """Revoca todas las familias del usuario; lo confirma quien llama"""
+    await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.user_id == user_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=now)
+    )
+
+
+@db_trace("delete_expired_refresh_tokens")
+async def delete_expired_refresh_tokens(
+    db: AsyncSession, now: datetime, limit: int
+) -> int:
+    """Borra hasta `limit` tokens vencidos y devuelve cuántos borró"""
+    expired = select(RefreshToken.id).where(RefreshToken.expires_at < now).limit(limit)
+    result = await db.execute(
+        delete(RefreshToken)
+        .where(RefreshToken.id.in_(expired.scalar_subquery()))
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
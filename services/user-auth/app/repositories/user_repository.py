@@ -1,100 +1,278 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from sqlalchemy import (
+    Integer,
+    String,
+    any_,
+    bindparam,
+    delete,
+    or_,
+    select,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
 from app.models.user import User
-from app.schemas.user import UserCreate, UserUpdate, UserCreateGoogle
+from app.schemas.user import UserCreate, UserUpdate, UserCreateGoogle, UserFilters
 from fastapi import HTTPException, status
+from app.core.metrics import db_trace
+from app.core.identity_cache import invalidate_identity
 
 
-def get_user_by_email(db: Session, email: str) -> User | None:
-    return db.scalar(select(User).where(User.email == email))
+@db_trace("get_user_by_email")
+async def get_user_by_email(db: AsyncSession, email: str) -> User | None:
+    return await db.scalar(select(User).where(User.email == email))
 
 
-def get_user_by_id(db: Session, user_id: int) -> User | None:
-    return db.get(User, user_id)
+@db_trace("get_user_by_id")
+async def get_user_by_id(db: AsyncSession, user_id: int) -> User | None:
+    return await db.get(User, user_id)
 
 
-def get_all_users(db: Session) -> list[User]:
-    return db.scalars(select(User)).all()
+@db_trace("get_users_by_ids")
+async def get_users_by_ids(db: AsyncSession, ids: list[int]) -> list[User]:
+    # = ANY(array) en lugar de IN (...): una única sentencia preparada sin
+    # importar cuántos ids se pidan
+    ids_param = bindparam("ids", value=ids, type_=ARRAY(Integer))
+    return (await db.scalars(select(User).where(User.id == any_(ids_param)))).all()
 
 
-def create_user(db: Session, user_data: UserCreate):
-    existing_user = get_user_by_email(db, user_data.email)
-    if existing_user:
+@db_trace("get_users_by_emails")
+async def get_users_by_emails(db: AsyncSession, emails: list[str]) -> list[User]:
+    emails_param = bindparam("emails", value=emails, type_=ARRAY(String))
+    return (
+        await db.scalars(select(User).where(User.email == any_(emails_param)))
+    ).all()
+
+
+@db_trace("get_users_page")
+async def get_users_page(
+    db: AsyncSession, filters: UserFilters, after_id: int | None, limit: int
+) -> list[User]:
+    # Paginación por cursor (keyset) sobre id: el costo no depende de la página
+    query = select(User).order_by(User.id).limit(limit)
+    if after_id is not None:
+        query = query.where(User.id > after_id)
+    for field, value in filters.model_dump(exclude_none=True).items():
+        query = query.where(getattr(User, field) == value)
+    return (await db.scalars(query)).all()
+
+
+# Columnas exportadas; se seleccionan columnas (no entidades) para que las filas
+# no queden retenidas en el identity map de la sesión durante el streaming
+EXPORT_COLUMNS = (
+    User.id,
+    User.name,
+    User.email,
+    User.location,
+    User.is_teacher,
+    User.academic_level,
+    User.is_blocked,
+    User.failed_login_attempts,
+    User.first_login_failure,
+    User.blocked_until,
+)
+
+
+async def stream_users(db: AsyncSession, batch_size: int):
+    """Recorre la tabla con un cursor del lado del servidor, de a `batch_size`"""
+    result = await db.stream(
+        select(*EXPORT_COLUMNS)
+        .order_by(User.id)
+        .execution_options(yield_per=batch_size)
+    )
+    async for partition in result.mappings().partitions():
+        yield partition
+
+
+async def _insert_user(db: AsyncSession, values: dict) -> User:
+    # INSERT ... ON CONFLICT (email) DO NOTHING RETURNING: una sola sentencia,
+    # sin lectura previa y sin carrera entre dos registros con el mismo email
+    statement = (
+        insert(User)
+        .values(**values)
+        .on_conflict_do_nothing(index_elements=[User.email])
+        .returning(User)
+    )
+    new_user = (await db.execute(statement)).scalar_one_or_none()
+    await db.commit()
+    if new_user is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="El email ya está registrado",
         )
+    return new_user
+
 
-    new_user = User(
-        name=user_data.name,
-        email=user_data.email,
-        password=user_data.password,
-        location=user_data.location,
-        is_teacher=user_data.is_teacher,
-        academic_level=user_data.academic_level,
+@db_trace("create_user")
+async def create_user(db: AsyncSession, user_data: UserCreate):
+    return await _insert_user(
+        db,
+        {
+            "name": user_data.name,
+            "email": user_data.email,
+            "password": user_data.password,
+            "location": user_data.location,
+            "is_teacher": user_data.is_teacher,
+            "academic_level": user_data.academic_level,
+        },
     )
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    return new_user
 
 
-def create_user_google(db: Session, user_data: UserCreateGoogle):
-    existing_user = get_user_by_email(db, user_data.email)
-    if existing_user:
+@db_trace("create_user_google")
+async def create_user_google(db: AsyncSession, user_data: UserCreateGoogle):
+    return await _insert_user(
+        db,
+        {
+            "name": user_data.name,
+            "email": user_data.email,
+            "password": user_data.password,
+            "auth_provider": user_data.auth_provider,
+        },
+    )
+
+
+@db_trace("bulk_insert_users")
+async def bulk_insert_users(db: AsyncSession, rows: list[dict]) -> dict[str, int]:
+    """
+    Inserta un lote de filas. Devuelve {email: id} de las filas creadas; las
+    que faltan ya estaban registradas.
+    """
+    # Se ejecuta como executemany sobre la tabla: SQLAlchemy lo agrupa en
+    # INSERT multi-fila ("insertmanyvalues") reutilizando la sentencia compilada
+    statement = (
+        insert(User.__table__)
+        .on_conflict_do_nothing(index_elements=[User.email])
+        .returning(User.id, User.email)
+    )
+    result = await db.execute(statement, rows)
+    created = {email: user_id for user_id, email in result}
+    await db.commit()
+    return created
+
+
+@db_trace("update_user")
+async def update_user(db: AsyncSession, user_id: int, user_data: UserUpdate):
+    # Actualizar solo los campos proporcionados
+    update_data = user_data.model_dump(exclude_none=True)
+    if not update_data:
+        user = await get_user_by_id(db, user_id)
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Usuario no encontrado",
+            )
+        return user
+
+    # Un único UPDATE ... FROM ... RETURNING: la subconsulta conserva el email
+    # previo (para invalidar la identidad cacheada) y la unicidad del email la
+    # garantiza la restricción de la tabla en lugar de una consulta previa
+    previous = (
+        select(User.id, User.email.label("previous_email"))
+        .where(User.id == user_id)
+        .subquery()
+    )
+    statement = (
+        update(User)
+        .where(User.id == previous.c.id)
+        .values(**update_data)
+        .returning(User, previous.c.previous_email)
+        .execution_options(synchronize_session=False, populate_existing=True)
+    )
+    try:
+        row = (await db.execute(statement)).first()
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="El email ya está registrado",
         )
 
-    new_user = User(
-        name=user_data.name,
-        email=user_data.email,
-        password=user_data.password,
-        auth_provider=user_data.auth_provider,
-    )
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    return new_user
-
-
-def update_user(db: Session, user_id: int, user_data: UserUpdate):
-    user = get_user_by_id(db, user_id)
-    if not user:
+    if row is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Usuario no encontrado",
         )
 
-    # Si se está actualizando el email, verificar que no exista
-    if user_data.email and user_data.email != user.email:
-        existing_user = get_user_by_email(db, user_data.email)
-        if existing_user:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="El email ya está registrado",
-            )
+    user, previous_email = row
+    invalidate_identity(previous_email, user.email)
+    return user
 
-    # Actualizar solo los campos proporcionados
-    update_data = user_data.model_dump(exclude_none=True)
-    for field, value in update_data.items():
-        setattr(user, field, value)
 
-    db.add(user)
-    db.commit()
-    db.refresh(user)
-    return user
+@db_trace("clear_failed_attempts")
+async def clear_failed_attempts(db: AsyncSession, user_id: int):
+    # Condicional: si otro pedido ya los limpió, el UPDATE no modifica filas
+    await db.execute(
+        update(User)
+        .where(
+            User.id == user_id,
+            or_(User.failed_login_attempts != 0, User.first_login_failure.isnot(None)),
+        )
+        .values(failed_login_attempts=0, first_login_failure=None)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+
+@db_trace("unblock_user")
+async def unblock_user(db: AsyncSession, user_id: int, now: datetime):
+    """Desbloquea al usuario solo si su bloqueo ya venció"""
+    await db.execute(
+        update(User)
+        .where(
+            User.id == user_id,
+            User.is_blocked.is_(True),
+            User.blocked_until < now,
+        )
+        .values(is_blocked=False, failed_login_attempts=0, first_login_failure=None)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+
+@db_trace("block_user")
+async def block_user(db: AsyncSession, user_id: int, blocked_until: datetime):
+    await db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(
+            is_blocked=True,
+            blocked_until=blocked_until,
+            failed_login_attempts=0,
+            first_login_failure=None,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+
+@db_trace("update_password_hash")
+async def update_password_hash(
+    db: AsyncSession, user_id: int, previous: str, new_hash: str
+):
+    # Condicional: si la contraseña cambió mientras se calculaba el hash, no
+    # se pisa
+    await db.execute(
+        update(User)
+        .where(User.id == user_id, User.password == previous)
+        .values(password=new_hash)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
 
 
-def delete_user(db: Session, user_id: int):
-    user = get_user_by_id(db, user_id)
+@db_trace("delete_user")
+async def delete_user(db: AsyncSession, user_id: int):
+    user = await get_user_by_id(db, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Usuario no encontrado",
         )
 
-    db.delete(user)
-    db.commit()
+    await db.delete(user)
+    await db.commit()
+    invalidate_identity(user.email)
     return user
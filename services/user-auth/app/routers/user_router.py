@@ -1,6 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, Security, status
-from sqlalchemy.orm import Session
-from app.db.session import SessionLocal
+from fastapi import (
+    APIRouter,
+    Depends,
+    Form,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    Security,
+    status,
+)
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from app.schemas.user import (
     Identity,
     UserCreate,
@@ -9,11 +19,20 @@ from app.schemas.user import (
     User,
     UserUpdate,
     UserGoogleUpdate,
+    UserFilters,
+    UserImportResponse,
+    UserBatchRequest,
+    UserBatchResponse,
+    RefreshTokenRequest,
 )
 from app.controllers.user_controller import (
     handle_register_user,
     handle_login_user,
+    handle_refresh_token,
     handle_get_users,
+    handle_export_users,
+    handle_import_users,
+    handle_get_users_batch,
     handle_get_user,
     handle_edit_user,
     handle_delete_user,
@@ -22,10 +41,12 @@ from app.controllers.user_controller import (
     handle_link_google_login,
 )
 from app.core.security import get_current_identity
-from app.db.dependencies import get_db
-from typing import Annotated, List
+from app.db.dependencies import get_db, get_session_factory
+from app.core.config import settings
+from typing import Annotated, List, Literal
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import ValidationError
+import json
 import logging
 import traceback
 
@@ -37,9 +58,9 @@ oauth2_scheme = OAuth2PasswordBearer(
 
 
 @router.post("/register", response_model=dict)
-def register_user(user: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
     try:
-        user_data = handle_register_user(db, user)
+        user_data = await handle_register_user(db, user)
         return {
             "status": "success",
             "data": {
@@ -64,17 +85,157 @@ def register_user(user: UserCreate, db: Session = Depends(get_db)):
 
 @router.get("/users", response_model=List[User])
 async def get_users(
+    response: Response,
+    identity: Annotated[
+        Identity, Security(get_current_identity, scopes=["user", "service"])
+    ],
+    cursor: int | None = None,
+    limit: Annotated[
+        int, Query(ge=1, le=settings.USERS_PAGE_MAX_SIZE)
+    ] = settings.USERS_PAGE_DEFAULT_SIZE,
+    is_teacher: bool | None = None,
+    academic_level: int | None = None,
+    location: str | None = None,
+    is_blocked: bool | None = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Obtener una página de usuarios ordenados por ID.
+    Se puede filtrar por is_teacher, academic_level, location e is_blocked.
+    Si hay más resultados, el header X-Next-Cursor trae el valor de `cursor`
+    para pedir la página siguiente.
+    Requiere autenticación.
+    """
+    try:
+        filters = UserFilters(
+            is_teacher=is_teacher,
+            academic_level=academic_level,
+            location=location,
+            is_blocked=is_blocked,
+        )
+        users, next_cursor = await handle_get_users(db, filters, cursor, limit)
+        if next_cursor is not None:
+            response.headers["X-Next-Cursor"] = str(next_cursor)
+        return users
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error interno del servidor: {str(e)}",
+        )
+
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+@router.get("/users/export")
+async def export_users(
+    identity: Annotated[Identity, Security(get_current_identity, scopes=["service"])],
+    format: Literal["ndjson", "csv"] = "ndjson",
+    session_factory: async_sessionmaker = Depends(get_session_factory),
+):
+    """
+    Exportar todos los usuarios en NDJSON o CSV.
+    La respuesta se envía en streaming a medida que se leen los lotes, con
+    memoria constante sin importar el tamaño de la tabla.
+    Requiere autenticación de servicio.
+    """
+    return StreamingResponse(
+        handle_export_users(session_factory, format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f"attachment; filename=users.{format}"},
+    )
+
+
+async def read_import_records(request: Request) -> list:
+    """
+    Lee las filas a importar: un array JSON, o NDJSON (una fila por línea)
+    leído en streaming. Las líneas que no son JSON válido quedan como None.
+    """
+    max_rows = settings.USERS_IMPORT_MAX_ROWS
+    too_many_rows = HTTPException(
+        status_code=413,
+        detail=f"Se pueden importar como máximo {max_rows} usuarios por petición",
+    )
+
+    if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        records = []
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        records.append(None)
+            if len(records) > max_rows:
+                raise too_many_rows
+        if buffer.strip():
+            try:
+                records.append(json.loads(buffer))
+            except ValueError:
+                records.append(None)
+    else:
+        try:
+            records = await request.json()
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="JSON inválido"
+            )
+        if not isinstance(records, list):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Se esperaba una lista de usuarios",
+            )
+
+    if len(records) > max_rows:
+        raise too_many_rows
+    return records
+
+
+@router.post("/users/import", response_model=UserImportResponse)
+async def import_users(
+    request: Request,
+    identity: Annotated[Identity, Security(get_current_identity, scopes=["service"])],
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Alta masiva de usuarios (por ejemplo, un curso completo).
+    Acepta un array JSON o NDJSON (Content-Type: application/x-ndjson) con
+    los mismos campos que /register y devuelve el resultado de cada fila.
+    Requiere autenticación de servicio.
+    """
+    try:
+        records = await read_import_records(request)
+        return await handle_import_users(db, records)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logging.error(f"Exception en import_users: {str(e)}")
+        logging.error(traceback.format_exc())
+        raise HTTPException(
+            status_code=500, detail=f"Error interno del servidor: {str(e)}"
+        )
+
+
+@router.post("/users/batch", response_model=UserBatchResponse)
+async def get_users_batch(
+    batch: UserBatchRequest,
     identity: Annotated[
         Identity, Security(get_current_identity, scopes=["user", "service"])
     ],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
-    Obtener lista de todos los usuarios.
+    Obtener varios usuarios por ID o email en una sola llamada.
+    Devuelve los usuarios en el orden pedido y la lista de los que no existen.
     Requiere autenticación.
     """
     try:
-        return handle_get_users(db)
+        return await handle_get_users_batch(db, batch)
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -90,14 +251,14 @@ async def get_user(
     identity: Annotated[
         Identity, Security(get_current_identity, scopes=["user", "service"])
     ],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Obtener información de un usuario específico por ID.
     Requiere autenticación.
     """
     try:
-        return handle_get_user(db, user_id)
+        return await handle_get_user(db, user_id)
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -114,14 +275,14 @@ async def edit_user(
     identity: Annotated[
         Identity, Security(get_current_identity, scopes=["user", "service"])
     ],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Actualizar información de un usuario específico por ID.
     Requiere autenticación.
     """
     try:
-        return handle_edit_user(db, user_id, user_data)
+        return await handle_edit_user(db, user_id, user_data)
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -137,14 +298,14 @@ async def delete_user(
     identity: Annotated[
         Identity, Security(get_current_identity, scopes=["user", "service"])
     ],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Eliminar un usuario específico por ID.
     Requiere autenticación.
     """
     try:
-        return handle_delete_user(db, user_id)
+        return await handle_delete_user(db, user_id)
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -157,12 +318,16 @@ async def delete_user(
 @router.post("/token")
 async def login_for_access_token(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
+    """
+    Login con email y contraseña. Con scope=offline_access se devuelve además
+    un refresh token (POST /token/refresh)
+    """
     try:
         logging.info(f"Intento de login para usuario: {form_data.username}")
         credentials = UserLogin(email=form_data.username, password=form_data.password)
-        return handle_login_user(db, credentials)
+        return await handle_login_user(db, credentials, form_data.scopes)
 
     except ValidationError as e:
         error_detail = "Formato de email o contraseña inválido"
@@ -190,6 +355,31 @@ async def login_for_access_token(
         )
 
 
+@router.post("/token/refresh")
+async def refresh_access_token(
+    body: RefreshTokenRequest,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Renovar el token de acceso con un refresh token, sin volver a validar
+    credenciales. El refresh token usado se invalida y se devuelve uno nuevo.
+    """
+    try:
+        return await handle_refresh_token(db, body.refresh_token)
+
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        logging.error(f"Exception no manejada en refresh token: {str(e)}")
+        logging.error(traceback.format_exc())
+
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor",
+        )
+
+
 @router.post("/token/service")
 async def login_for_access_service_token(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
@@ -215,11 +405,12 @@ async def login_for_access_service_token(
 @router.post("/token/google")
 async def login_for_access_token_google(
     google_token: Annotated[str, Depends(oauth2_scheme)],
-    db: Session = Depends(get_db),
+    scope: Annotated[str, Form()] = "",
+    db: AsyncSession = Depends(get_db),
 ):
     try:
         logging.info(f"Intento de login con Google")
-        return handle_google_login(db, google_token)
+        return await handle_google_login(db, google_token, scope.split())
 
     except HTTPException as e:
         raise e
@@ -233,11 +424,12 @@ async def login_for_access_token_google(
 @router.post("/token/google/link")
 async def login_for_access_token_google(
     google_token: Annotated[str, Depends(oauth2_scheme)],
-    db: Session = Depends(get_db),
+    scope: Annotated[str, Form()] = "",
+    db: AsyncSession = Depends(get_db),
 ):
     try:
         logging.info(f"Intento de combinar cuentas con Google")
-        return handle_link_google_login(db, google_token)
+        return await handle_link_google_login(db, google_token, scope.split())
 
     except HTTPException as e:
         raise e
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr, field_validator, ConfigDict
+from pydantic import BaseModel, EmailStr, field_validator, model_validator, ConfigDict
 from app.models.user import AuthProvider
 from typing import Literal, Union
 from datetime import datetime
@@ -81,6 +81,44 @@ class User(UserBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class UserFilters(BaseModel):
+    is_teacher: bool | None = None
+    academic_level: int | None = None
+    location: str | None = None
+    is_blocked: bool | None = None
+
+
+class UserBatchRequest(BaseModel):
+    ids: list[int] | None = None
+    emails: list[EmailStr] | None = None
+
+    @model_validator(mode="after")
+    def check_ids_or_emails(self):
+        if (self.ids is None) == (self.emails is None):
+            raise ValueError("Se debe enviar 'ids' o 'emails', pero no ambos.")
+        return self
+
+
+class UserBatchResponse(BaseModel):
+    users: list[User]
+    missing: list[int | str]
+
+
+class UserImportResult(BaseModel):
+    index: int
+    status: Literal["created", "duplicate", "invalid"]
+    id: int | None = None
+    email: str | None = None
+    detail: str | None = None
+
+
+class UserImportResponse(BaseModel):
+    created: int
+    duplicates: int
+    invalid: int
+    results: list[UserImportResult]
+
+
 class UserLogin(BaseModel):
     email: EmailStr
     password: str
@@ -117,6 +155,11 @@ class UserInDB(CurrentUser):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: str | None = None
+
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
 
 
 class TokenData(BaseModel):
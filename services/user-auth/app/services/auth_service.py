@@ -1,12 +1,22 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta, datetime
 from fastapi import HTTPException, status
-from app.repositories.user_repository import get_user_by_email
+from app.repositories.user_repository import (
+    get_user_by_email,
+    clear_failed_attempts,
+    unblock_user,
+    block_user,
+    update_password_hash,
+)
 from app.schemas.user import UserLogin, ServiceLogin
 from app.models.user import User
-from app.core.security import create_user_jwt, create_service_jwt
+from app.core.security import create_service_jwt
+from app.services.token_service import create_user_tokens
 from app.core.metrics import metric_trace
 from app.core.config import settings
+from app.core.identity_cache import invalidate_identity
+from app.core.lockout import lockout_store
+from app.core.passwords import password_hasher
 import logging
 import traceback
 
@@ -14,26 +24,22 @@ LOCK_TIME_LOGIN_WINDOW = timedelta(minutes=settings.LOCK_TIME_LOGIN_WINDOW)
 LOCK_USER_TIME = timedelta(minutes=settings.LOCK_USER_TIME)
 
 
-def reset_failed_attempts(user: User, db: Session):
-    user.failed_login_attempts = 0
-    user.first_login_failure = None
-    db.add(user)
-    db.commit()
+async def reset_failed_attempts(user: User, db: AsyncSession):
+    await lockout_store.reset(user.email)
+    # Contadores heredados de cuando los fallos se guardaban en la fila; el
+    # caso más común (cuenta sin fallos previos) no escribe nada
+    if not user.failed_login_attempts and user.first_login_failure is None:
+        return
+    await clear_failed_attempts(db, user.id)
 
 
-def block_user(user: User, db: Session):
-    user.is_blocked = True
-    user.blocked_until = datetime.now() + LOCK_USER_TIME
-    user.failed_login_attempts = 0
-    db.add(user)
-    db.commit()
-
-
-def authenticate_user(db: Session, email: str, password: str):
+async def authenticate_user(db: AsyncSession, email: str, password: str):
     try:
         logging.info(f"Intentando autenticar usuario con email: {email}")
         try:
-            user = get_user_by_email(db, email)
+            user = await get_user_by_email(db, email)
+        except HTTPException as e:
+            raise e
         except Exception as db_error:
             logging.error(f"Error de base de datos: {str(db_error)}")
             logging.error(traceback.format_exc())
@@ -45,17 +51,23 @@ def authenticate_user(db: Session, email: str, password: str):
 
         if not user:
             logging.info(f"Usuario con email {email} no encontrado")
+            # Mismo costo que con un email registrado: la demora de la
+            # respuesta no debe revelar qué emails existen
+            await password_hasher.verify_dummy(password)
             return False
 
         if user.is_blocked:
             if user.blocked_until and user.blocked_until < datetime.now():
                 try:
                     logging.info(f"Desbloqueando usuario: {email}")
-                    user.is_blocked = False
-                    reset_failed_attempts(user, db)
+                    await unblock_user(db, user.id, datetime.now())
+                    user.failed_login_attempts = 0
+                    user.first_login_failure = None
+                except HTTPException as e:
+                    raise e
                 except Exception as e:
                     logging.error(f"Error al desbloquear usuario: {str(e)}")
-                    db.rollback()
+                    await db.rollback()
                     raise HTTPException(
                         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                         detail="Error al procesar la solicitud",
@@ -69,32 +81,19 @@ def authenticate_user(db: Session, email: str, password: str):
                     headers={"WWW-Authenticate": "Bearer"},
                 )
 
-        if not user.password == password:
+        if not await password_hasher.verify(password, user.password):
             try:
                 logging.info(f"Contraseña incorrecta para: {email}")
-                if (
-                    (not user.first_login_failure)
-                    or user.first_login_failure + LOCK_TIME_LOGIN_WINDOW
-                    < datetime.now()
-                ):
-                    user.failed_login_attempts = 0
-                    user.first_login_failure = datetime.now()
-                    logging.info(
-                        f"Primer intento fallido o fuera de ventana para: {email}"
-                    )
-
-                user.failed_login_attempts += 1
-                logging.info(
-                    f"Incrementando intentos fallidos para {email}: {user.failed_login_attempts}"
-                )
-                db.add(user)
-                db.commit()
-
-                if user.failed_login_attempts >= settings.MAX_FAILED_LOGIN_ATTEMPTS:
+                # Los fallos se cuentan fuera de la base: solo el bloqueo se
+                # escribe en la fila del usuario
+                failures = await lockout_store.register_failure(user.email)
+                if failures >= settings.MAX_FAILED_LOGIN_ATTEMPTS:
+                    await block_user(db, user.id, datetime.now() + LOCK_USER_TIME)
+                    await lockout_store.reset(user.email)
                     logging.warning(
                         f"Bloqueando usuario por múltiples intentos: {email}"
                     )
-                    block_user(user, db)
+                    invalidate_identity(user.email)
                     raise HTTPException(
                         status_code=status.HTTP_403_FORBIDDEN,
                         detail="Usuario bloqueado por múltiples intentos fallidos",
@@ -104,7 +103,7 @@ def authenticate_user(db: Session, email: str, password: str):
                 raise e
             except Exception as e:
                 logging.error(f"Error al registrar intento fallido: {str(e)}")
-                db.rollback()
+                await db.rollback()
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     detail="Error al procesar la solicitud",
@@ -115,11 +114,22 @@ def authenticate_user(db: Session, email: str, password: str):
 
         try:
             logging.info(f"Login exitoso para: {email}")
-            reset_failed_attempts(user, db)
+            await reset_failed_attempts(user, db)
         except Exception as e:
-            db.rollback()
+            await db.rollback()
             logging.error(f"Error al resetear intentos fallidos: {str(e)}")
 
+        if password_hasher.needs_rehash(user.password):
+            # Filas en texto plano o con un costo anterior: se actualizan ahora
+            # que se conoce la contraseña
+            try:
+                new_hash = await password_hasher.hash(password)
+                await update_password_hash(db, user.id, user.password, new_hash)
+                logging.info(f"Contraseña re-hasheada para: {email}")
+            except Exception as e:
+                await db.rollback()
+                logging.error(f"Error al re-hashear contraseña: {str(e)}")
+
         return user
     except HTTPException as e:
         raise e
@@ -134,9 +144,11 @@ def authenticate_user(db: Session, email: str, password: str):
 
 
 @metric_trace("login_user")
-def login_user(db: Session, credentials: UserLogin):
+async def login_user(
+    db: AsyncSession, credentials: UserLogin, offline_access: bool = False
+):
     try:
-        user = authenticate_user(db, credentials.email, credentials.password)
+        user = await authenticate_user(db, credentials.email, credentials.password)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -145,7 +157,9 @@ def login_user(db: Session, credentials: UserLogin):
             )
 
         try:
-            return create_user_jwt(user.email)
+            return await create_user_tokens(db, user.email, user.id, offline_access)
+        except HTTPException as e:
+            raise e
         except Exception as e:
             logging.error(f"Error al generar token: {str(e)}")
             raise HTTPException(
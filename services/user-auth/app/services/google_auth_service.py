@@ -1,23 +1,47 @@
 from fastapi import HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.repositories.user_repository import get_user_by_email, create_user_google
-from app.core.security import create_user_jwt
+from app.services.token_service import create_user_tokens
 from app.schemas.user import UserCreateGoogle
 from google.oauth2 import id_token
-from google.auth.transport import requests
+from google.auth import exceptions as google_exceptions
 from app.models.user import AuthProvider
+from app.core.google_certs import google_certs
+from app.core.executors import auth_executor
+from app.utils.password_hashing import UNUSABLE_PASSWORD
+import jwt
 import logging
+import requests
 from app.core.config import settings
 
 
+def _unverified_kid(token: str) -> str | None:
+    try:
+        return jwt.get_unverified_header(token).get("kid")
+    except jwt.PyJWTError:
+        # Token mal formado: lo rechaza la verificación
+        return None
+
+
 def validate_google_token(token: str):
     try:
         logging.info(f"Validando google token")
+        kid = _unverified_kid(token)
+        if kid:
+            google_certs.ensure_key(kid)
+        # La firma se verifica localmente con los certificados cacheados
         idinfo = id_token.verify_oauth2_token(
-            token, requests.Request(), settings.WEB_CLIENT_ID
+            token, google_certs, settings.WEB_CLIENT_ID
         )
         return idinfo["name"], idinfo["email"]
-    except ValueError as e:
+    except (google_exceptions.TransportError, requests.RequestException) as e:
+        logging.error(f"Error al obtener los certificados de Google: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="No se pudo validar el token con Google",
+            headers={"Retry-After": str(settings.GOOGLE_CERTS_MIN_REFRESH_SECONDS)},
+        )
+    except (ValueError, google_exceptions.GoogleAuthError) as e:
         logging.error(f"Error al validar el token de Google: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -26,30 +50,33 @@ def validate_google_token(token: str):
         )
 
 
-def google_login_user(db: Session, token: str):
+async def google_login_user(db: AsyncSession, token: str, offline_access: bool = False):
     try:
-        user_name, user_email = validate_google_token(token)
+        # La verificación puede bloquear (descarga de certificados, RSA): se
+        # ejecuta fuera del event loop
+        user_name, user_email = await auth_executor.run(validate_google_token, token)
 
         logging.info(f"Intentando autenticar usuario google con email: {user_email}")
 
-        user = get_user_by_email(db, user_email)
+        user = await get_user_by_email(db, user_email)
 
         if not user:
             logging.info(f"Email: {user_email} no registrado, creando cuenta")
-            create_user_google(
+            new_user = await create_user_google(
                 db,
                 UserCreateGoogle(
                     name=user_name,
                     email=user_email,
-                    password=token,
+                    # Sin contraseña local: solo puede entrar con Google
+                    password=UNUSABLE_PASSWORD,
                     auth_provider=AuthProvider.GOOGLE,
                 ),
             )
-            return create_user_jwt(user_email)
+            return await create_user_tokens(db, user_email, new_user.id, offline_access)
 
         if user.auth_provider in (AuthProvider.GOOGLE, AuthProvider.LOCAL_GOOGLE):
             logging.info(f"Login con google exitoso para: {user_email}")
-            return create_user_jwt(user_email)
+            return await create_user_tokens(db, user_email, user.id, offline_access)
         else:
             logging.info(
                 f"Email: {user_email} registrado, sin login con google, combinar informacion"
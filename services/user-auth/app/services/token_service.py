@@ -0,0 +1,192 @@
+import asyncio
+import hashlib
+import hmac
+import logging
+import secrets
+from datetime import datetime, timedelta
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from app.core.config import settings
+from app.core.metrics import metric_trace
+from app.core.security import create_user_jwt
+from app.db.session import AsyncSessionLocal
+from app.repositories.refresh_token_repository import (
+    add_refresh_token,
+    delete_expired_refresh_tokens,
+    get_refresh_token,
+    revoke_refresh_token,
+    revoke_refresh_token_family,
+    revoke_user_refresh_tokens,
+)
+from app.schemas.user import Token
+
+# Scope que el cliente pide para recibir un refresh token junto al de acceso
+OFFLINE_ACCESS_SCOPE = "offline_access"
+
+
+def _hash_secret(secret: str) -> str:
+    # El secreto tiene 256 bits aleatorios: alcanza con SHA-256, sin un hash lento
+    return hashlib.sha256(secret.encode()).hexdigest()
+
+
+def _new_refresh_token(
+    db: AsyncSession, user_id: int, family_id: str | None = None
+) -> tuple[str, str]:
+    """Agrega un refresh token a la sesión y devuelve (id, token para el cliente)"""
+    token_id = secrets.token_hex(16)
+    secret = secrets.token_urlsafe(32)
+    add_refresh_token(
+        db,
+        token_id=token_id,
+        token_hash=_hash_secret(secret),
+        user_id=user_id,
+        family_id=family_id or token_id,
+        expires_at=datetime.now() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+    )
+    return token_id, f"{token_id}.{secret}"
+
+
+def create_refresh_token_credentials_exception():
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Refresh token inválido",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+async def create_user_tokens(
+    db: AsyncSession, user_email: str, user_id: int, offline_access: bool = False
+) -> Token:
+    """
+    Token de acceso y, si el cliente pidió OFFLINE_ACCESS_SCOPE, un refresh
+    token que inicia una familia nueva. Sin ese scope el login no escribe en
+    la base.
+    """
+    token = create_user_jwt(user_email, user_id)
+    if offline_access:
+        _, token.refresh_token = _new_refresh_token(db, user_id)
+        await db.commit()
+    return token
+
+
+@metric_trace("refresh_token")
+async def refresh_access_token(db: AsyncSession, refresh_token: str) -> Token:
+    """
+    Canjea un refresh token por un token de acceso y un refresh token nuevo
+    (rotación). Si se presenta un refresh token ya usado se revoca toda su
+    familia: alguien más tiene una copia.
+    """
+    token_id, _, secret = refresh_token.partition(".")
+    if not token_id or not secret:
+        raise create_refresh_token_credentials_exception()
+
+    row = await get_refresh_token(db, token_id)
+    if row is None:
+        raise create_refresh_token_credentials_exception()
+    stored, email, is_blocked = row
+
+    if not hmac.compare_digest(stored.token_hash, _hash_secret(secret)):
+        raise create_refresh_token_credentials_exception()
+
+    now = datetime.now()
+    if stored.revoked_at is not None:
+        logging.warning(f"Reuso de refresh token detectado para: {email}")
+        await revoke_refresh_token_family(db, stored.family_id, now)
+        await db.commit()
+        raise create_refresh_token_credentials_exception()
+
+    if stored.expires_at < now:
+        raise create_refresh_token_credentials_exception()
+
+    if is_blocked:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Usuario bloqueado",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    new_id, new_refresh_token = _new_refresh_token(db, stored.user_id, stored.family_id)
+    if not await revoke_refresh_token(db, stored.id, new_id, now):
+        # Otro pedido rotó este mismo token en paralelo: se trata como reuso
+        await db.rollback()
+        await revoke_refresh_token_family(db, stored.family_id, now)
+        await db.commit()
+        raise create_refresh_token_credentials_exception()
+    await db.commit()
+
+    token = create_user_jwt(email, stored.user_id)
+    token.refresh_token = new_refresh_token
+    return token
+
+
+async def revoke_user_sessions(db: AsyncSession, user_id: int):
+    """
+    Revoca todos los refresh tokens del usuario (cambio de contraseña,
+    vinculación con Google). No confirma: se aplica junto con el cambio que
+    lo motiva, en la misma transacción.
+    """
+    await revoke_user_refresh_tokens(db, user_id, datetime.now())
+
+
+async def purge_expired_refresh_tokens(
+    session_factory: async_sessionmaker, batch_size: int
+) -> int:
+    """Borra los refresh tokens vencidos en lotes y devuelve cuántos borró"""
+    deleted = 0
+    async with session_factory() as db:
+        while True:
+            count = await delete_expired_refresh_tokens(db, datetime.now(), batch_size)
+            await db.commit()
+            deleted += count
+            if count < batch_size:
+                return deleted
+
+
+class RefreshTokenPurger:
+    """
+    Tarea de fondo que cada `interval` segundos borra los refresh tokens
+    vencidos: cada login agrega una fila y los usados o revocados solo sirven
+    hasta su vencimiento (para detectar reuso).
+    """
+
+    def __init__(
+        self, session_factory: async_sessionmaker, interval: float, batch_size: int
+    ):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.batch_size = batch_size
+        self._task: asyncio.Task | None = None
+
+    async def _purge_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                deleted = await purge_expired_refresh_tokens(
+                    self.session_factory, self.batch_size
+                )
+                if deleted:
+                    logging.info(f"Refresh tokens vencidos eliminados: {deleted}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Error al purgar refresh tokens vencidos: {str(e)}")
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._purge_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+refresh_token_purger = RefreshTokenPurger(
+    AsyncSessionLocal,
+    interval=settings.REFRESH_TOKEN_PURGE_INTERVAL_SECONDS,
+    batch_size=settings.REFRESH_TOKEN_PURGE_BATCH_SIZE,
+)
@@ -1,44 +1,233 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from fastapi import HTTPException
+from datetime import datetime
+import asyncio
+import csv
+import io
+import json
+import logging
 from app.repositories.user_repository import (
     create_user,
-    get_all_users,
+    get_users_page,
     get_user_by_id,
     update_user,
     delete_user,
     get_user_by_email,
+    stream_users,
+    bulk_insert_users,
+    get_users_by_ids,
+    get_users_by_emails,
+    EXPORT_COLUMNS,
 )
+from app.core.config import settings
 from app.services.google_auth_service import validate_google_token
 from app.core.metrics import metric_trace
-from app.core.security import create_user_jwt
-from app.schemas.user import UserCreate, UserUpdate, UserGoogleUpdate
+from app.services.token_service import create_user_tokens, revoke_user_sessions
+from app.core.identity_cache import invalidate_identity
+from app.core.executors import auth_executor
+from app.core.passwords import password_hasher
+from app.schemas.user import (
+    UserCreate,
+    UserUpdate,
+    UserGoogleUpdate,
+    UserFilters,
+    UserImportResult,
+    UserImportResponse,
+    UserBatchRequest,
+    UserBatchResponse,
+)
+from pydantic import ValidationError
 
 
 @metric_trace("register_user")
-def register_user(db: Session, user: UserCreate):
+async def register_user(db: AsyncSession, user: UserCreate):
     try:
-        return create_user(db, user)
+        hashed = await password_hasher.hash(user.password)
+        return await create_user(db, user.model_copy(update={"password": hashed}))
     except HTTPException:
         raise
     except Exception:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail="El email ya está registrado")
 
 
+@metric_trace("import_users")
+async def import_users(db: AsyncSession, records: list) -> UserImportResponse:
+    """
+    Alta masiva de usuarios. Valida todas las filas en una pasada, descarta las
+    inválidas y los emails repetidos dentro del lote, e inserta el resto en
+    lotes de USERS_IMPORT_CHUNK_SIZE filas.
+    """
+    results: list[UserImportResult | None] = [None] * len(records)
+    pending: list[tuple[int, dict]] = []
+    seen_emails: set[str] = set()
+
+    for index, record in enumerate(records):
+        try:
+            if not isinstance(record, dict):
+                raise ValueError("Se esperaba un objeto JSON")
+            user = UserCreate.model_validate(record)
+        except (ValidationError, ValueError) as e:
+            detail = (
+                "; ".join(err["msg"] for err in e.errors())
+                if isinstance(e, ValidationError)
+                else str(e)
+            )
+            results[index] = UserImportResult(
+                index=index, status="invalid", detail=detail
+            )
+            continue
+
+        if user.email in seen_emails:
+            results[index] = UserImportResult(
+                index=index,
+                status="duplicate",
+                email=user.email,
+                detail="Email repetido en la importación",
+            )
+            continue
+        seen_emails.add(user.email)
+        pending.append((index, user.model_dump()))
+
+    chunk_size = settings.USERS_IMPORT_CHUNK_SIZE
+    chunks = [
+        pending[start : start + chunk_size]
+        for start in range(0, len(pending), chunk_size)
+    ]
+
+    def hash_chunk(position: int):
+        return asyncio.ensure_future(
+            password_hasher.hash_many([row["password"] for _, row in chunks[position]])
+        )
+
+    # El lote siguiente se hashea en el pool mientras se inserta el actual
+    hashing = hash_chunk(0) if chunks else None
+    try:
+        for position, chunk in enumerate(chunks):
+            hashes = await hashing
+            hashing = hash_chunk(position + 1) if position + 1 < len(chunks) else None
+            for (_, row), hashed in zip(chunk, hashes):
+                row["password"] = hashed
+            created = await bulk_insert_users(db, [row for _, row in chunk])
+            for index, row in chunk:
+                user_id = created.get(row["email"])
+                results[index] = UserImportResult(
+                    index=index,
+                    status="created" if user_id is not None else "duplicate",
+                    id=user_id,
+                    email=row["email"],
+                    detail=(
+                        None if user_id is not None else "El email ya está registrado"
+                    ),
+                )
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        logging.error(f"Error en la importación de usuarios: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail=f"Error al importar usuarios: {str(e)}"
+        )
+    finally:
+        # Si un insert falló, el hash del lote siguiente ya no se usa
+        if hashing is not None:
+            hashing.cancel()
+
+    return UserImportResponse(
+        created=sum(r.status == "created" for r in results),
+        duplicates=sum(r.status == "duplicate" for r in results),
+        invalid=sum(r.status == "invalid" for r in results),
+        results=results,
+    )
+
+
 @metric_trace("get_users")
-def get_users(db: Session):
+async def get_users(
+    db: AsyncSession, filters: UserFilters, cursor: int | None, limit: int
+):
+    """Devuelve una página de usuarios y el cursor de la siguiente (o None)"""
+    try:
+        # Se pide un registro extra para saber si hay una página siguiente
+        users = await get_users_page(db, filters, cursor, limit + 1)
+        if len(users) > limit:
+            users = users[:limit]
+            return users, users[-1].id
+        return users, None
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error al obtener usuarios: {str(e)}"
+        )
+
+
+def _export_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+async def export_users(session_factory: async_sessionmaker, format: str):
+    """Genera el export de usuarios en NDJSON o CSV, un bloque por lote"""
+    try:
+        async with session_factory() as db:
+            if format == "csv":
+                yield ",".join(column.key for column in EXPORT_COLUMNS) + "\n"
+
+            async for rows in stream_users(db, settings.USERS_EXPORT_BATCH_SIZE):
+                if format == "csv":
+                    buffer = io.StringIO()
+                    writer = csv.writer(buffer, lineterminator="\n")
+                    writer.writerows(
+                        [_export_value(v) for v in row.values()] for row in rows
+                    )
+                    yield buffer.getvalue()
+                else:
+                    yield "".join(
+                        json.dumps({k: _export_value(v) for k, v in row.items()}) + "\n"
+                        for row in rows
+                    )
+    except Exception as e:
+        # Los headers ya se enviaron: solo queda cortar el stream
+        logging.error(f"Error al exportar usuarios: {str(e)}")
+        raise
+
+
+@metric_trace("get_users_batch")
+async def get_users_batch(db: AsyncSession, request: UserBatchRequest):
+    """Resuelve varios usuarios por id o email en una sola consulta"""
+    if request.ids is not None:
+        keys = list(dict.fromkeys(request.ids))
+    else:
+        keys = list(dict.fromkeys(request.emails))
+
+    if len(keys) > settings.USERS_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Se pueden pedir como máximo {settings.USERS_BATCH_MAX_SIZE} usuarios",
+        )
+
     try:
-        return get_all_users(db)
+        if request.ids is not None:
+            found = {user.id: user for user in await get_users_by_ids(db, keys)}
+        else:
+            found = {user.email: user for user in await get_users_by_emails(db, keys)}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Error al obtener usuarios: {str(e)}"
         )
 
+    # Se respeta el orden del pedido e informa los que no existen
+    return UserBatchResponse(
+        users=[found[key] for key in keys if key in found],
+        missing=[key for key in keys if key not in found],
+    )
+
 
 @metric_trace("get_user")
-def get_user(db: Session, user_id: int):
+async def get_user(db: AsyncSession, user_id: int):
     try:
-        user = get_user_by_id(db, user_id)
+        user = await get_user_by_id(db, user_id)
         if not user:
             raise HTTPException(status_code=404, detail="Usuario no encontrado")
         return user
@@ -51,46 +240,57 @@ def get_user(db: Session, user_id: int):
 
 
 @metric_trace("edit_user")
-def edit_user(db: Session, user_id: int, user_data: UserUpdate):
+async def edit_user(db: AsyncSession, user_id: int, user_data: UserUpdate):
     try:
-        return update_user(db, user_id, user_data)
+        if user_data.password is not None:
+            user_data = user_data.model_copy(
+                update={"password": await password_hasher.hash(user_data.password)}
+            )
+            # Un refresh token robado no debe sobrevivir al cambio de
+            # contraseña; update_user confirma ambos cambios juntos
+            await revoke_user_sessions(db, user_id)
+        return await update_user(db, user_id, user_data)
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=500, detail=f"Error al actualizar usuario: {str(e)}"
         )
 
 
 @metric_trace("remove_user")
-def remove_user(db: Session, user_id: int):
+async def remove_user(db: AsyncSession, user_id: int):
     try:
-        return delete_user(db, user_id)
+        return await delete_user(db, user_id)
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=500, detail=f"Error al eliminar usuario: {str(e)}"
         )
 
 
-def link_google_account(db: Session, token: str):
+async def link_google_account(
+    db: AsyncSession, token: str, offline_access: bool = False
+):
     try:
-        user_name, user_email = validate_google_token(token)
+        user_name, user_email = await auth_executor.run(validate_google_token, token)
         google_user_data = UserGoogleUpdate(name=user_name, email=user_email)
-        user = get_user_by_email(db, user_email)
+        user = await get_user_by_email(db, user_email)
         if not user:
             raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
-        update_user(db, user.id, google_user_data)
+        await revoke_user_sessions(db, user.id)
+        await update_user(db, user.id, google_user_data)
+        invalidate_identity(user_email)
 
-        return create_user_jwt(user_email)
+        return await create_user_tokens(db, user_email, user.id, offline_access)
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=500, detail=f"Error al vincular cuenta de Google: {str(e)}"
         )
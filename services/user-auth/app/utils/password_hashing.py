@@ -0,0 +1,91 @@
+"""
+Hash de contraseñas con scrypt (memory-hard, incluido en hashlib).
+
+Formato almacenado: scrypt$<n>$<r>$<p>$<salt base64>$<hash base64>. Las
+filas anteriores guardan la contraseña en texto plano; se reconocen por no
+tener el prefijo y se migran en el siguiente login exitoso.
+
+Este módulo no importa nada de la aplicación: sus funciones se ejecutan en
+los procesos del pool de hashing.
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+
+SCHEME = "scrypt"
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+# Contraseña de las cuentas creadas con Google: no coincide con ninguna
+UNUSABLE_PASSWORD = "!"
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii").rstrip("=")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.b64decode(data + "=" * (-len(data) % 4))
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(
+        password.encode("utf-8"),
+        salt=salt,
+        n=n,
+        r=r,
+        p=p,
+        # La memoria necesaria es ~128 * r * n bytes; el límite por defecto
+        # de OpenSSL (32 MiB) no alcanza para costos más altos
+        maxmem=128 * r * (n + p + 2) + 1024 * 1024,
+        dklen=KEY_BYTES,
+    )
+
+
+def hash_password(password: str, n: int, r: int, p: int) -> str:
+    salt = os.urandom(SALT_BYTES)
+    key = _scrypt(password, salt, n, r, p)
+    return f"{SCHEME}${n}${r}${p}${_b64encode(salt)}${_b64encode(key)}"
+
+
+def hash_passwords(passwords: list[str], n: int, r: int, p: int) -> list[str]:
+    return [hash_password(password, n, r, p) for password in passwords]
+
+
+def is_hashed(stored: str) -> bool:
+    return stored.startswith(SCHEME + "$")
+
+
+def is_legacy_google_token(stored: str) -> bool:
+    """
+    Las cuentas de Google creadas antes del hash guardaban el ID token (un
+    JWT) como contraseña. Las contraseñas de usuario son alfanuméricas, así
+    que un valor en texto plano con puntos no puede ser una de ellas.
+    """
+    return not is_hashed(stored) and stored.count(".") == 2
+
+
+def verify_password(password: str, stored: str) -> bool:
+    if stored == UNUSABLE_PASSWORD or is_legacy_google_token(stored):
+        return False
+    if not is_hashed(stored):
+        # Fila heredada en texto plano
+        return hmac.compare_digest(password.encode("utf-8"), stored.encode("utf-8"))
+    try:
+        _, n, r, p, salt, key = stored.split("$")
+        expected = _b64decode(key)
+        actual = _scrypt(password, _b64decode(salt), int(n), int(r), int(p))
+    except ValueError:
+        return False
+    return hmac.compare_digest(actual, expected)
+
+
+def needs_rehash(stored: str, n: int, r: int, p: int) -> bool:
+    """True si la contraseña está en texto plano o con otros parámetros de costo"""
+    if stored == UNUSABLE_PASSWORD or is_legacy_google_token(stored):
+        return False
+    if not is_hashed(stored):
+        return True
+    return stored.split("$")[1:4] != [str(n), str(r), str(p)]
@@ -0,0 +1,105 @@
+"""
+Benchmark del bloqueo del event loop durante el login con Google.
+
+Mientras se ejecutan N validaciones de token de Google concurrentes contra un
+endpoint de certificados lento (que simula a Google con problemas), una
+tarea mide cada cuánto logra correr el event loop: ese retraso lo sufren
+todos los demás endpoints del worker. Compara la validación en línea (como
+antes) con la ejecución en auth_executor.
+
+Uso (desde services/user-auth, con las variables de .env.example cargadas):
+    PYTHONPATH=. python benchmarks/bench_event_loop_lag.py --rtt-ms 200
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+from unittest.mock import patch
+
+from fastapi import HTTPException
+
+from app.core.executors import auth_executor
+from app.core.google_certs import GoogleCertsCache
+from app.services.google_auth_service import validate_google_token
+
+
+def start_slow_cert_server(rtt: float):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(rtt)
+            body = json.dumps({}).encode()
+            self.send_response(200)
+            # Sin caché: cada validación vuelve a pedir los certificados
+            self.send_header("Cache-Control", "max-age=0")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/certs"
+
+
+async def measure_lag(stop: asyncio.Event, interval: float = 0.005) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+
+async def run(name, validate, token: str, logins: int):
+    stop = asyncio.Event()
+    lag = asyncio.create_task(measure_lag(stop))
+
+    async def one():
+        try:
+            await validate(token)
+        except HTTPException:
+            pass
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    print(
+        f"{name:>8}: {elapsed * 1000:.0f}ms total, "
+        f"peor retraso del event loop={await lag * 1000:.0f}ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=8)
+    parser.add_argument("--rtt-ms", type=float, default=200)
+    args = parser.parse_args()
+
+    server, url = start_slow_cert_server(args.rtt_ms / 1000)
+    certs = GoogleCertsCache(
+        certs_url=url, timeout=5, min_refresh_interval=0, default_max_age=0
+    )
+
+    async def inline(token):
+        return validate_google_token(token)
+
+    async def offloaded(token):
+        return await auth_executor.run(validate_google_token, token)
+
+    # Un token con kid fuerza la descarga de certificados en cada validación
+    token_with_kid = "eyJhbGciOiJSUzI1NiIsImtpZCI6ImsifQ.e30.c2ln"
+    with patch("app.services.google_auth_service.google_certs", certs):
+        for name, validate in (("inline", inline), ("executor", offloaded)):
+            await run(name, validate, token_with_kid, args.logins)
+
+    server.shutdown()
+    auth_executor.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,133 @@
+"""
+Benchmark de la verificación de ID tokens de Google: camino anterior (un
+transporte nuevo por llamada, que descarga los certificados cada vez) contra
+GoogleCertsCache (sesión única y certificados en memoria).
+
+Levanta un endpoint local de certificados con una demora configurable que
+simula el viaje de ida y vuelta a Google, y reporta latencias p50/p99 y la
+cantidad de descargas de certificados.
+
+Uso (desde services/user-auth, con las variables de .env.example cargadas):
+    PYTHONPATH=. python benchmarks/bench_google_verify.py --rtt-ms 50
+"""
+
+import argparse
+import json
+import statistics
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import jwt
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from google.auth.transport import requests as google_requests
+from google.oauth2 import id_token
+
+from app.core.google_certs import GoogleCertsCache
+
+AUDIENCE = "bench-client-id"
+
+
+def make_key_and_certificate():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "fake-google")])
+    now = datetime.now(timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - timedelta(days=1))
+        .not_valid_after(now + timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    return key, certificate.public_bytes(serialization.Encoding.PEM).decode()
+
+
+def start_cert_server(certificate: str, rtt: float, counter: dict):
+    body = json.dumps({"bench-key": certificate}).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            counter["fetches"] += 1
+            time.sleep(rtt)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Cache-Control", "public, max-age=3600")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/oauth2/v1/certs"
+
+
+def run(name, verify, token: str, iterations: int, counter: dict):
+    counter["fetches"] = 0
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        verify(token)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    print(
+        f"{name:>7}: p50={statistics.median(latencies) * 1000:.2f}ms "
+        f"p99={latencies[int(len(latencies) * 0.99) - 1] * 1000:.2f}ms "
+        f"descargas={counter['fetches']}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--rtt-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    key, certificate = make_key_and_certificate()
+    counter = {"fetches": 0}
+    server, certs_url = start_cert_server(certificate, args.rtt_ms / 1000, counter)
+
+    now = int(time.time())
+    token = jwt.encode(
+        {
+            "iss": "https://accounts.google.com",
+            "aud": AUDIENCE,
+            "sub": "1",
+            "email": "bench@example.com",
+            "name": "Bench",
+            "iat": now,
+            "exp": now + 3600,
+        },
+        key,
+        algorithm="RS256",
+        headers={"kid": "bench-key"},
+    )
+
+    def legacy_verify(token):
+        # Como antes: transporte (y sesión HTTP) nuevo en cada login
+        return id_token.verify_token(
+            token, google_requests.Request(), AUDIENCE, certs_url=certs_url
+        )
+
+    certs = GoogleCertsCache(
+        certs_url=certs_url, timeout=5, min_refresh_interval=30, default_max_age=300
+    )
+
+    def cached_verify(token):
+        return id_token.verify_oauth2_token(token, certs, AUDIENCE)
+
+    run("legacy", legacy_verify, token, args.iterations, counter)
+    run("cached", cached_verify, token, args.iterations, counter)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
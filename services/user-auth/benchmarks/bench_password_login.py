@@ -0,0 +1,88 @@
+"""
+Benchmark de la verificación de contraseñas con scrypt: logins/s y logins/s
+por núcleo, verificando en el event loop (en línea) y en el pool de procesos
+con distinta cantidad de procesos.
+
+También mide el peor retraso del event loop durante la carga, que en el caso
+en línea sufren todas las demás peticiones del worker.
+
+Uso (desde services/user-auth, con las variables de .env.example cargadas):
+    PYTHONPATH=. python benchmarks/bench_password_login.py --logins 200
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from app.core.config import settings
+from app.core.passwords import PasswordHasher
+from app.utils.password_hashing import hash_password, verify_password
+
+
+async def measure_lag(stop: asyncio.Event, interval: float = 0.005) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+
+async def run(name: str, verify, stored: str, logins: int, cores: int):
+    stop = asyncio.Event()
+    lag = asyncio.create_task(measure_lag(stop))
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(verify("password123", stored) for _ in range(logins))
+    )
+    elapsed = time.perf_counter() - start
+    stop.set()
+    assert all(results)
+    print(
+        f"{name:>12}: {logins / elapsed:.1f} logins/s, "
+        f"{logins / elapsed / cores:.1f} logins/s por núcleo, "
+        f"peor retraso del event loop={await lag * 1000:.0f}ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=200)
+    args = parser.parse_args()
+
+    cost = (
+        settings.PASSWORD_HASH_N,
+        settings.PASSWORD_HASH_R,
+        settings.PASSWORD_HASH_P,
+    )
+    stored = hash_password("password123", *cost)
+    cpus = os.cpu_count() or 1
+    print(f"scrypt n={cost[0]} r={cost[1]} p={cost[2]}, {cpus} núcleos")
+
+    async def inline(password, stored):
+        return verify_password(password, stored)
+
+    await run("en línea", inline, stored, args.logins, 1)
+
+    for workers in sorted({1, max(cpus // 2, 1), cpus}):
+        hasher = PasswordHasher(
+            *cost,
+            workers=workers,
+            bulk_workers=1,
+            import_n=cost[0],
+            max_queue=args.logins,
+        )
+        await hasher.start()
+        await run(
+            f"{workers} procesos",
+            hasher.verify,
+            stored,
+            args.logins,
+            min(workers, cpus),
+        )
+        hasher.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,126 @@
+"""
+Benchmark de throughput del entrypoint: un único proceso de uvicorn (como
+antes) contra gunicorn con 1 y N workers (gunicorn.conf.py).
+
+Levanta el servidor con cada configuración, genera carga HTTP desde varios
+procesos y reporta req/s y latencia p50/p99. Sirve para ambos servicios:
+ejecutarlo desde el directorio del servicio a medir.
+
+Uso (con las variables de entorno del servicio cargadas):
+    # user-auth: endpoint sin base de datos
+    PYTHONPATH=. python benchmarks/bench_workers.py --path /.well-known/jwks.json
+    # user-profile
+    cd ../user-profile && PYTHONPATH=. python ../user-auth/benchmarks/bench_workers.py --path /health
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+
+def wait_until_ready(url: str, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"El servidor no respondió en {url}")
+
+
+async def client_load(url: str, concurrency: int, duration: float) -> list[float]:
+    latencies = []
+    deadline = time.monotonic() + duration
+    async with httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=concurrency)
+    ) as client:
+
+        async def worker():
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                response = await client.get(url)
+                if response.status_code < 500:
+                    latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+
+def load_process(url, concurrency, duration, queue):
+    queue.put(asyncio.run(client_load(url, concurrency, duration)))
+
+
+def run_load(url: str, clients: int, concurrency: int, duration: float):
+    queue = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(
+            target=load_process, args=(url, concurrency, duration, queue)
+        )
+        for _ in range(clients)
+    ]
+    for process in processes:
+        process.start()
+    latencies = [latency for _ in processes for latency in queue.get()]
+    for process in processes:
+        process.join()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--path", default="/.well-known/jwks.json")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--clients", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    url = f"http://127.0.0.1:{args.port}{args.path}"
+    env = {**os.environ, "HOST": "127.0.0.1", "PORT": str(args.port)}
+    uvicorn = [sys.executable, "-m", "uvicorn", "app.main:app"]
+    uvicorn += [
+        "--host",
+        "127.0.0.1",
+        "--port",
+        str(args.port),
+        "--log-level",
+        "warning",
+    ]
+    gunicorn = [sys.executable, "-m", "gunicorn", "app.main:app"]
+    gunicorn += ["--config", "gunicorn.conf.py", "--log-level", "warning"]
+
+    setups = [("uvicorn", uvicorn, {})]
+    for workers in sorted({1, args.workers}):
+        setups.append(
+            (f"gunicorn x{workers}", gunicorn, {"WEB_CONCURRENCY": str(workers)})
+        )
+
+    for name, command, extra_env in setups:
+        server = subprocess.Popen(command, env={**env, **extra_env})
+        try:
+            wait_until_ready(url)
+            latencies = run_load(url, args.clients, args.concurrency, args.duration)
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=60)
+
+        latencies.sort()
+        print(
+            f"{name:>13}: {len(latencies) / args.duration:.0f} req/s, "
+            f"p50={statistics.median(latencies) * 1000:.1f}ms "
+            f"p99={latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
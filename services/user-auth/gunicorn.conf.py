@@ -0,0 +1,118 @@
+# Configuración de gunicorn para producción: N workers de uvicorn con la
+# aplicación precargada en el proceso maestro.
+#
+# Variables de entorno:
+#   WEB_CONCURRENCY          workers (por defecto, uno por núcleo disponible)
+#   GUNICORN_MAX_REQUESTS    peticiones antes de reciclar un worker (0 = nunca)
+#   GUNICORN_MAX_REQUESTS_JITTER, GUNICORN_TIMEOUT, GUNICORN_GRACEFUL_TIMEOUT,
+#   GUNICORN_KEEPALIVE
+#   UVICORN_LOOP             auto | asyncio | uvloop (auto usa uvloop si está)
+#   UVICORN_HTTP             auto | h11 | httptools (auto usa httptools si está)
+#   PROMETHEUS_MULTIPROC_DIR directorio para las métricas de todos los workers
+
+import math
+import os
+import shutil
+
+from uvicorn_worker import UvicornWorker
+
+
+def available_cpus() -> int:
+    """Núcleos utilizables, respetando la afinidad y la cuota de CPU del cgroup"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(math.ceil(int(quota) / int(period)), 1))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+class Worker(UvicornWorker):
+    CONFIG_KWARGS = {
+        "loop": os.getenv("UVICORN_LOOP", "auto"),
+        "http": os.getenv("UVICORN_HTTP", "auto"),
+    }
+
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+worker_class = Worker
+workers = int(os.getenv("WEB_CONCURRENCY", available_cpus()))
+
+# Cada worker tiene su propio pool de hashing: repartir los núcleos entre
+# ellos en lugar de lanzar núcleos x workers procesos de scrypt (0 = auto)
+if int(os.getenv("PASSWORD_HASH_WORKERS", 0)) == 0:
+    os.environ["PASSWORD_HASH_WORKERS"] = str(max(available_cpus() // workers, 1))
+
+# La aplicación se importa una vez en el maestro y los workers la heredan
+# con fork: arrancan más rápido y comparten memoria de solo lectura
+preload_app = True
+
+# Reciclar workers de a poco (el jitter evita que se reinicien todos juntos)
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 10000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 1000))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 60))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+
+accesslog = None
+errorlog = "-"
+
+
+# prometheus_client necesita el directorio al importar la aplicación, que con
+# preload ocurre antes de on_starting
+if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+
+def on_starting(server):
+    # Las métricas de una ejecución anterior no deben sumarse a las nuevas
+    directory = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+
+
+def when_ready(server):
+    # La aplicación ya está precargada: se puede leer su configuración
+    from app.core.config import settings
+
+    if server.cfg.workers <= 1:
+        return
+    if settings.LOCKOUT_BACKEND != "shared" or not settings.LOCKOUT_STORE_URL:
+        server.log.warning(
+            f"{server.cfg.workers} workers sin LOCKOUT_BACKEND=shared y "
+            "LOCKOUT_STORE_URL: cada worker cuenta sus fallos de login, una "
+            f"cuenta admite hasta {server.cfg.workers * settings.MAX_FAILED_LOGIN_ATTEMPTS} "
+            "intentos antes de bloquearse"
+        )
+    server.log.warning(
+        "Rate limits y caché de identidades son por worker: los límites se "
+        "multiplican por la cantidad de workers y un usuario bloqueado o "
+        "borrado sigue autorizado en los demás workers hasta "
+        f"IDENTITY_CACHE_TTL_SECONDS ({settings.IDENTITY_CACHE_TTL_SECONDS:g}s)"
+    )
+
+
+def post_fork(server, worker):
+    from app.core.metrics import set_pool_gauges
+    from app.db.session import async_engine, engine
+
+    # El maestro usó el engine sincrónico al precargar (creación de tablas):
+    # cada worker abre sus propias conexiones
+    engine.dispose(close=False)
+    # Los valores multiproceso son por pid: el gauge fijado al importar
+    # quedó en el maestro
+    set_pool_gauges(async_engine.sync_engine.pool)
+
+
+def child_exit(server, worker):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,126 @@
+import asyncio
+import os
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from app.main import app
+from app.core.rate_limit import rate_limiter
+from app.db.pool import InstrumentedQueuePool
+from app.routers.user_router import get_db
+
+TEST_DATABASE_URL = os.getenv(
+    "DATABASE_URL",
+    f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}?sslmode=require",
+)
+
+
+def create_small_engine():
+    # Una sola conexión y sin overflow: la segunda petición ya no tiene lugar
+    return create_async_engine(
+        TEST_DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://").replace(
+            "sslmode=", "ssl="
+        ),
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.1,
+        pool_pre_ping=True,
+    )
+
+
+def sample(name: str) -> float:
+    return REGISTRY.get_sample_value(name) or 0
+
+
+def test_checkout_wait_is_recorded():
+    engine = create_small_engine()
+    waits_before = sample("user_auth_db_pool_checkout_wait_seconds_count")
+
+    async def scenario():
+        for _ in range(2):
+            async with engine.connect() as connection:
+                assert await connection.scalar(text("SELECT 1")) == 1
+        await engine.dispose()
+
+    asyncio.run(scenario())
+    assert sample("user_auth_db_pool_checkout_wait_seconds_count") == waits_before + 2
+
+
+def test_exhausted_pool_raises_503():
+    engine = create_small_engine()
+    timeouts_before = sample("user_auth_db_pool_timeouts_total")
+
+    async def scenario():
+        async with engine.connect():
+            with pytest.raises(HTTPException) as exc_info:
+                await engine.connect().start()
+            assert exc_info.value.status_code == 503
+            assert exc_info.value.headers["Retry-After"] == "1"
+
+        # Al devolverse la conexión, el pool vuelve a atender
+        async with engine.connect() as connection:
+            assert await connection.scalar(text("SELECT 1")) == 1
+        await engine.dispose()
+
+    asyncio.run(scenario())
+    assert sample("user_auth_db_pool_timeouts_total") == timeouts_before + 1
+
+
+def test_pre_ping_replaces_connection_closed_by_server():
+    engine = create_small_engine()
+    admin = create_small_engine()
+
+    async def scenario():
+        async with engine.connect() as connection:
+            pid = await connection.scalar(text("SELECT pg_backend_pid()"))
+        # El servidor corta la conexión que quedó inactiva en el pool
+        async with admin.connect() as connection:
+            await connection.execute(
+                text("SELECT pg_terminate_backend(:pid)"), {"pid": pid}
+            )
+        await asyncio.sleep(0.1)
+
+        async with engine.connect() as connection:
+            new_pid = await connection.scalar(text("SELECT pg_backend_pid()"))
+        assert new_pid != pid
+        await engine.dispose()
+        await admin.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_login_with_exhausted_pool_returns_503():
+    # Con el pool agotado el login responde 503 con Retry-After, no un 500
+    engine = create_small_engine()
+    sessions = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+    async def override_get_db():
+        async with sessions() as db:
+            yield db
+
+    previous_override = app.dependency_overrides.get(get_db)
+    app.dependency_overrides[get_db] = override_get_db
+    rate_limiter.clear()
+    try:
+        with TestClient(app) as client:
+            held = client.portal.call(engine.connect().start)
+            try:
+                response = client.post(
+                    "/api/v1/token",
+                    data={"username": "test@example.com", "password": "password123"},
+                )
+            finally:
+                client.portal.call(held.close)
+                client.portal.call(engine.dispose)
+    finally:
+        if previous_override is None:
+            app.dependency_overrides.pop(get_db, None)
+        else:
+            app.dependency_overrides[get_db] = previous_override
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert response.headers["content-type"] == "application/problem+json"
@@ -0,0 +1,62 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from fastapi import HTTPException
+from prometheus_client import REGISTRY
+from app.core.executors import BoundedExecutor
+
+
+def sample(name: str, executor: str) -> float:
+    return REGISTRY.get_sample_value(name, {"executor": executor}) or 0
+
+
+def test_runs_blocking_work_off_the_event_loop():
+    executor = BoundedExecutor(
+        "test-run",
+        lambda: ThreadPoolExecutor(max_workers=2),
+        max_workers=2,
+        max_queue=0,
+    )
+
+    async def scenario():
+        loop_thread = threading.get_ident()
+        worker_thread = await executor.run(threading.get_ident)
+        assert worker_thread != loop_thread
+        with pytest.raises(ValueError):
+            await executor.run(int, "no-es-un-numero")
+
+    asyncio.run(scenario())
+    assert sample("user_auth_executor_queue_depth", "test-run") == 0
+    executor.shutdown()
+
+
+def test_rejects_work_when_saturated():
+    executor = BoundedExecutor(
+        "test-saturated",
+        lambda: ThreadPoolExecutor(max_workers=1),
+        max_workers=1,
+        max_queue=1,
+    )
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(executor.run(release.wait))
+        queued = asyncio.ensure_future(executor.run(release.wait))
+        await asyncio.sleep(0.05)
+        assert sample("user_auth_executor_running", "test-saturated") == 1
+        assert sample("user_auth_executor_queue_depth", "test-saturated") == 1
+
+        with pytest.raises(HTTPException) as exc_info:
+            await executor.run(release.wait)
+        assert exc_info.value.status_code == 503
+        assert exc_info.value.headers["Retry-After"] == "1"
+
+        release.set()
+        await asyncio.gather(running, queued)
+        # Con lugar libre se vuelve a aceptar trabajo
+        assert await executor.run(sum, [1, 2]) == 3
+
+    asyncio.run(scenario())
+    assert sample("user_auth_executor_rejected_total", "test-saturated") == 1
+    executor.shutdown()
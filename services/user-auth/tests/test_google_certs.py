@@ -0,0 +1,151 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import jwt
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.core.google_certs import GoogleCertsCache
+from app.services.google_auth_service import validate_google_token
+
+
+def make_signing_key(kid: str) -> dict:
+    """Clave RSA con un certificado autofirmado, como los que publica Google"""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "fake-google")])
+    now = datetime.now(timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - timedelta(days=1))
+        .not_valid_after(now + timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    return {
+        "kid": kid,
+        "private_key": key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        ),
+        "certificate": certificate.public_bytes(serialization.Encoding.PEM).decode(),
+    }
+
+
+def make_google_token(signing_key: dict, email="john@example.com", **claims) -> str:
+    now = int(time.time())
+    payload = {
+        "iss": "https://accounts.google.com",
+        "aud": settings.WEB_CLIENT_ID,
+        "sub": "1234567890",
+        "email": email,
+        "name": "John Doe",
+        "iat": now,
+        "exp": now + 3600,
+        **claims,
+    }
+    return jwt.encode(
+        payload,
+        signing_key["private_key"],
+        algorithm="RS256",
+        headers={"kid": signing_key["kid"]},
+    )
+
+
+@pytest.fixture
+def fake_google():
+    """Endpoint local que publica certificados en el formato de Google"""
+    state = {"keys": [make_signing_key("key-1")], "requests": 0, "max_age": 3600}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            state["requests"] += 1
+            body = json.dumps(
+                {key["kid"]: key["certificate"] for key in state["keys"]}
+            ).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header(
+                "Cache-Control", f"public, max-age={state['max_age']}, must-revalidate"
+            )
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    state["url"] = f"http://127.0.0.1:{server.server_port}/oauth2/v1/certs"
+    state["certs"] = GoogleCertsCache(
+        certs_url=state["url"],
+        timeout=5,
+        min_refresh_interval=0,
+        default_max_age=300,
+    )
+    with patch("app.services.google_auth_service.google_certs", state["certs"]):
+        yield state
+    server.shutdown()
+    state["certs"].session.close()
+
+
+def test_certs_are_fetched_once_and_reused(fake_google):
+    signing_key = fake_google["keys"][0]
+    for i in range(5):
+        token = make_google_token(signing_key, email=f"user{i}@example.com")
+        assert validate_google_token(token) == ("John Doe", f"user{i}@example.com")
+    assert fake_google["requests"] == 1
+    assert fake_google["certs"].expires_at - time.monotonic() > 3500
+
+
+def test_certs_expire_with_max_age(fake_google):
+    fake_google["max_age"] = 60
+    token = make_google_token(fake_google["keys"][0])
+    validate_google_token(token)
+    later = time.monotonic() + 61
+    with patch("app.core.google_certs.time.monotonic", return_value=later):
+        validate_google_token(token)
+    assert fake_google["requests"] == 2
+
+
+def test_unknown_key_triggers_refresh(fake_google):
+    validate_google_token(make_google_token(fake_google["keys"][0]))
+    # Google rota las claves: el nuevo kid obliga a renovar antes de verificar
+    fake_google["keys"].append(make_signing_key("key-2"))
+    assert validate_google_token(make_google_token(fake_google["keys"][1]))
+    assert fake_google["requests"] == 2
+
+
+def test_invalid_google_tokens_are_rejected(fake_google):
+    signing_key = fake_google["keys"][0]
+    other_key = make_signing_key("key-1")
+    for token in (
+        make_google_token(signing_key, aud="another-client"),
+        make_google_token(signing_key, iss="https://evil.example.com"),
+        make_google_token(signing_key, exp=int(time.time()) - 3600),
+        make_google_token(other_key),
+        "not-a-token",
+    ):
+        with pytest.raises(HTTPException) as exc_info:
+            validate_google_token(token)
+        assert exc_info.value.status_code == 401
+
+
+def test_unreachable_cert_endpoint_returns_503(fake_google):
+    fake_google["certs"].certs_url = "http://127.0.0.1:9/certs"
+    with pytest.raises(HTTPException) as exc_info:
+        validate_google_token(make_google_token(fake_google["keys"][0]))
+    assert exc_info.value.status_code == 503
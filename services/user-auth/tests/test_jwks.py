@@ -0,0 +1,83 @@
+import jwt
+import pytest
+from contextlib import contextmanager
+from unittest.mock import patch
+from fastapi import HTTPException
+from fastapi.security import SecurityScopes
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.security import create_service_jwt, get_current_identity
+from app.core.signing_keys import SigningKeyRing, generate_private_key
+
+client = TestClient(app)
+
+
+@contextmanager
+def use_key_ring(key_ring, algorithm):
+    """Configura firma asimétrica con `key_ring` durante la prueba"""
+    with patch("app.core.security.key_ring", key_ring), patch(
+        "app.main.key_ring", key_ring
+    ), patch("app.core.security.settings.ALGORITHM", algorithm):
+        yield
+
+
+@pytest.mark.parametrize("algorithm", ["RS256", "EdDSA"])
+@pytest.mark.asyncio
+async def test_asymmetric_token_has_kid_and_validates(algorithm):
+    # El token se firma con la clave activa y se valida con su clave pública
+    key_ring = SigningKeyRing({"k1": generate_private_key(algorithm)}, "k1", algorithm)
+    with use_key_ring(key_ring, algorithm):
+        token = create_service_jwt("test-service").access_token
+        identity = await get_current_identity(
+            SecurityScopes(scopes=["service"]), token, db=None
+        )
+
+    assert jwt.get_unverified_header(token)["kid"] == "k1"
+    assert identity.role == "service"
+
+
+@pytest.mark.asyncio
+async def test_rotation_keeps_previous_key_valid():
+    # Tras activar una clave nueva, los tokens firmados con la anterior
+    # siguen siendo válidos mientras la anterior siga publicada
+    old_key, new_key = generate_private_key("RS256"), generate_private_key("RS256")
+    before = SigningKeyRing({"old": old_key}, "old", "RS256")
+    after = SigningKeyRing({"old": old_key, "new": new_key}, "new", "RS256")
+    retired = SigningKeyRing({"new": new_key}, "new", "RS256")
+
+    with use_key_ring(before, "RS256"):
+        old_token = create_service_jwt("test-service").access_token
+
+    with use_key_ring(after, "RS256"):
+        identity = await get_current_identity(
+            SecurityScopes(scopes=["service"]), old_token, db=None
+        )
+        assert identity.role == "service"
+
+    with use_key_ring(retired, "RS256"):
+        with pytest.raises(HTTPException) as exc_info:
+            await get_current_identity(
+                SecurityScopes(scopes=["service"]), old_token, db=None
+            )
+    assert exc_info.value.status_code == 401
+
+
+def test_jwks_endpoint_publishes_keys_with_cache_headers():
+    # El JWKS se sirve con Cache-Control y ETag, y responde 304 si no cambió
+    key_ring = SigningKeyRing(
+        {"k1": generate_private_key("RS256"), "k2": generate_private_key("RS256")},
+        "k2",
+        "RS256",
+    )
+    with use_key_ring(key_ring, "RS256"):
+        response = client.get("/.well-known/jwks.json")
+        cached = client.get(
+            "/.well-known/jwks.json",
+            headers={"If-None-Match": response.headers["etag"]},
+        )
+
+    assert response.status_code == 200
+    assert "max-age=" in response.headers["cache-control"]
+    assert {key["kid"] for key in response.json()["keys"]} == {"k1", "k2"}
+    assert all("d" not in key for key in response.json()["keys"])
+    assert cached.status_code == 304
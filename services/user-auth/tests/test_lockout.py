@@ -0,0 +1,57 @@
+import asyncio
+from unittest.mock import patch
+from app.core.lockout import (
+    InMemoryLockoutStore,
+    LocalSharedClient,
+    SharedLockoutStore,
+)
+
+
+def test_in_memory_store_counts_failures_within_window():
+    store = InMemoryLockoutStore(max_attempts=3, window=60, max_keys=10)
+
+    async def scenario():
+        with patch("app.core.lockout.time.monotonic", return_value=1000.0):
+            assert await store.register_failure("a@example.com") == 1
+            assert await store.register_failure("a@example.com") == 2
+        # Los fallos fuera de la ventana dejan de contar
+        with patch("app.core.lockout.time.monotonic", return_value=1061.0):
+            assert await store.register_failure("a@example.com") == 1
+        await store.reset("a@example.com")
+        assert len(store) == 0
+
+    asyncio.run(scenario())
+
+
+def test_in_memory_store_is_bounded():
+    store = InMemoryLockoutStore(max_attempts=3, window=60, max_keys=2)
+
+    async def scenario():
+        for _ in range(10):
+            await store.register_failure("a@example.com")
+        assert len(store._failures["a@example.com"]) == 3
+        await store.register_failure("b@example.com")
+        await store.register_failure("c@example.com")
+        # Se desaloja la cuenta con la actividad más antigua
+        assert len(store) == 2
+        assert await store.register_failure("a@example.com") == 1
+
+    asyncio.run(scenario())
+
+
+def test_shared_store_with_local_client():
+    client = LocalSharedClient()
+    store = SharedLockoutStore(client, window=60)
+
+    async def scenario():
+        with patch("app.core.lockout.time.monotonic", return_value=1000.0):
+            assert await store.register_failure("a@example.com") == 1
+            assert await store.register_failure("a@example.com") == 2
+            assert await store.register_failure("b@example.com") == 1
+        # El contador expira junto con la ventana iniciada por el primer fallo
+        with patch("app.core.lockout.time.monotonic", return_value=1061.0):
+            assert await store.register_failure("a@example.com") == 1
+            await store.reset("a@example.com")
+            assert await store.register_failure("a@example.com") == 1
+
+    asyncio.run(scenario())
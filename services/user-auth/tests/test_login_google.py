@@ -4,10 +4,13 @@ import logging
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
 from sqlalchemy.exc import OperationalError
 from sqlalchemy.sql import text
 from app.main import app, Base
 from app.routers.user_router import get_db
+from app.core.rate_limit import rate_limiter
 from unittest.mock import patch, MagicMock
 
 # Configurar logging para suprimir mensajes de FastAPI
@@ -22,6 +25,18 @@ TEST_DATABASE_URL = os.getenv(
 engine = create_engine(TEST_DATABASE_URL)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Las rutas usan sesiones asincrónicas; NullPool evita reutilizar conexiones
+# entre los distintos event loops que levanta el TestClient
+async_engine = create_async_engine(
+    TEST_DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://").replace(
+        "sslmode=", "ssl="
+    ),
+    poolclass=NullPool,
+)
+TestingAsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+
 
 def create_test_database():
     try:
@@ -42,12 +57,9 @@ create_test_database()
 Base.metadata.create_all(bind=engine)
 
 
-def override_get_db():
-    db = TestingSessionLocal()
-    try:
+async def override_get_db():
+    async with TestingAsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
 app.dependency_overrides[get_db] = override_get_db
@@ -62,6 +74,7 @@ def client():
 def setup_test_db():
     Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
+    rate_limiter.clear()
     yield
     Base.metadata.drop_all(bind=engine)
 
@@ -106,6 +119,38 @@ def test_login_success_user_not_registered_in_db(
     assert "access_token" in data
     assert data["token_type"] == "bearer"
 
+    # La cuenta creada no tiene contraseña local utilizable
+    from app.models.user import User
+
+    db = TestingSessionLocal()
+    stored = db.query(User.password).filter(User.email == valid_user_email).scalar()
+    db.close()
+    assert stored == "!"
+
+
+@patch(
+    "app.services.google_auth_service.id_token.verify_oauth2_token",
+    new_callable=MagicMock,
+)
+def test_login_google_refresh_token_only_with_offline_access(
+    mock_verify_token, client, setup_test_db
+):
+    # El refresh token se emite solo si el cliente pide scope=offline_access
+    mock_verify_token.return_value = valid_user_data
+
+    without_scope = client.post(
+        "/api/v1/token/google",
+        headers={"Authorization": f"Bearer valid_token"},
+    ).json()
+    with_scope = client.post(
+        "/api/v1/token/google",
+        headers={"Authorization": f"Bearer valid_token"},
+        data={"scope": "offline_access"},
+    ).json()
+
+    assert without_scope["refresh_token"] is None
+    assert with_scope["refresh_token"]
+
 
 @patch(
     "app.services.google_auth_service.id_token.verify_oauth2_token",
@@ -248,3 +293,40 @@ def test_login_success_user_registered_in_db_with_auth_provider_local_and_link(
     data = link_response.json()
     assert "access_token" in data
     assert data["token_type"] == "bearer"
+
+
+def test_legacy_google_token_passwords_are_migrated(setup_test_db):
+    # Las cuentas de Google viejas guardaban el ID token como contraseña
+    from app.main import migrate_legacy_google_passwords
+    from app.models.user import User, AuthProvider
+
+    legacy_token = "eyJhbGciOiJSUzI1NiJ9.eyJzdWIiOiIxMjMifQ.firma"
+    db = TestingSessionLocal()
+    db.add_all(
+        [
+            User(
+                name="Legacy",
+                email="legacy@example.com",
+                password=legacy_token,
+                auth_provider=AuthProvider.GOOGLE,
+            ),
+            User(
+                name="Local",
+                email="local@example.com",
+                password="password123",
+                auth_provider=AuthProvider.LOCAL,
+            ),
+        ]
+    )
+    db.commit()
+    db.close()
+
+    assert migrate_legacy_google_passwords() == 1
+
+    db = TestingSessionLocal()
+    passwords = dict(db.query(User.email, User.password).all())
+    db.close()
+    assert passwords == {
+        "legacy@example.com": "!",
+        "local@example.com": "password123",
+    }
@@ -1,3 +1,4 @@
+import asyncio
 import pytest
 import os
 import logging
@@ -5,13 +6,22 @@ import jwt
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
 from sqlalchemy.exc import OperationalError
 from sqlalchemy.sql import text
-from sqlalchemy import select
+from sqlalchemy import select, event
+from sqlalchemy.engine import Engine
 from app.main import app, Base
+from app.core.identity_cache import identity_cache
+from app.core.lockout import lockout_store
 from app.core.config import settings
 from app.routers.user_router import get_db
+from app.core.rate_limit import rate_limiter
+from app.services.token_service import purge_expired_refresh_tokens
 from datetime import datetime, timedelta
+from unittest.mock import patch
+from prometheus_client import REGISTRY
 
 # Configurar logging para suprimir mensajes de FastAPI
 logging.getLogger("uvicorn").setLevel(logging.WARNING)
@@ -25,6 +35,18 @@ TEST_DATABASE_URL = os.getenv(
 engine = create_engine(TEST_DATABASE_URL)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Las rutas usan sesiones asincrónicas; NullPool evita reutilizar conexiones
+# entre los distintos event loops que levanta el TestClient
+async_engine = create_async_engine(
+    TEST_DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://").replace(
+        "sslmode=", "ssl="
+    ),
+    poolclass=NullPool,
+)
+TestingAsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+
 
 def create_test_database():
     try:
@@ -45,12 +67,9 @@ create_test_database()
 Base.metadata.create_all(bind=engine)
 
 
-def override_get_db():
-    db = TestingSessionLocal()
-    try:
+async def override_get_db():
+    async with TestingAsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
 app.dependency_overrides[get_db] = override_get_db
@@ -65,6 +84,9 @@ def client():
 def setup_test_db():
     Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
+    identity_cache.clear()
+    lockout_store.clear()
+    rate_limiter.clear()
     yield
     Base.metadata.drop_all(bind=engine)
 
@@ -88,10 +110,10 @@ def register_user(
     )
 
 
-def login_user(client, email="john@example.com", password="password123"):
+def login_user(client, email="john@example.com", password="password123", scope=""):
     return client.post(
         "/api/v1/token",
-        data={"username": email, "password": password},
+        data={"username": email, "password": password, "scope": scope},
         headers={"Content-Type": "application/x-www-form-urlencoded"},
     )
 
@@ -223,6 +245,184 @@ def test_account_locks_after_failed_attempts(client, setup_test_db):
     expect_error_response(response, 403)
 
 
+def test_failed_logins_only_write_the_block(client, setup_test_db):
+    # Los intentos fallidos no escriben la fila; solo el bloqueo final
+    register_user(client)
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", record)
+    try:
+        for _ in range(settings.MAX_FAILED_LOGIN_ATTEMPTS - 1):
+            expect_error_response(login_user(client, password="wrongpassword"), 401)
+        assert not [s for s in statements if s.lstrip().startswith("UPDATE users")]
+
+        expect_error_response(login_user(client, password="wrongpassword"), 403)
+    finally:
+        event.remove(Engine, "before_cursor_execute", record)
+
+    assert len([s for s in statements if s.lstrip().startswith("UPDATE users")]) == 1
+    # El bloqueo quedó persistido: la contraseña correcta también es rechazada
+    expect_error_response(login_user(client), 403)
+
+
+def login_writes(client, **kwargs):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", record)
+    try:
+        response = login_user(client, **kwargs)
+    finally:
+        event.remove(Engine, "before_cursor_execute", record)
+
+    assert response.status_code == 200
+    return response, [
+        s.lstrip()
+        for s in statements
+        if s.lstrip().upper().startswith(("INSERT", "UPDATE", "DELETE"))
+    ]
+
+
+def test_clean_login_does_not_write(client, setup_test_db):
+    # Un login exitoso sin fallos previos no escribe en la base ni emite un
+    # refresh token
+    register_user(client)
+
+    response, writes = login_writes(client)
+
+    assert writes == []
+    assert response.json()["refresh_token"] is None
+
+
+def test_offline_access_login_only_writes_the_refresh_token(client, setup_test_db):
+    # Con scope=offline_access la única escritura es el refresh token
+    register_user(client)
+
+    response, writes = login_writes(client, scope="offline_access")
+
+    assert len(writes) == 1
+    assert writes[0].startswith("INSERT INTO refresh_tokens")
+    assert response.json()["refresh_token"]
+
+
+def test_successful_login_resets_failed_attempts(client, setup_test_db):
+    # Un login exitoso reinicia el contador de intentos fallidos
+    register_user(client)
+    for _ in range(3):
+        expect_error_response(login_user(client, password="wrongpassword"), 401)
+    assert login_user(client).status_code == 200
+
+    for _ in range(3):
+        expect_error_response(login_user(client, password="wrongpassword"), 401)
+    assert login_user(client).status_code == 200
+
+
+def test_legacy_plain_password_is_rehashed_on_login(client, setup_test_db):
+    # Las filas con contraseña en texto plano se migran en el siguiente login
+    from app.models.user import User
+
+    db = TestingSessionLocal()
+    db.add(User(name="John Doe", email="john@example.com", password="password123"))
+    db.commit()
+    db.close()
+
+    expect_error_response(login_user(client, password="wrongpassword"), 401)
+    assert login_user(client).status_code == 200
+
+    db = TestingSessionLocal()
+    stored = db.query(User.password).filter(User.email == "john@example.com").scalar()
+    db.close()
+    assert stored.startswith("scrypt$")
+
+    # Con el hash ya migrado, la misma contraseña sigue funcionando
+    assert login_user(client).status_code == 200
+    expect_error_response(login_user(client, password="wrongpassword"), 401)
+
+
+def test_password_is_rehashed_when_cost_changes(client, setup_test_db):
+    # Subir el costo configurado re-hashea la contraseña en el próximo login
+    from app.models.user import User
+    from app.core.passwords import password_hasher
+
+    register_user(client)
+    with patch.object(password_hasher, "n", password_hasher.n * 2):
+        assert login_user(client).status_code == 200
+
+        db = TestingSessionLocal()
+        stored = (
+            db.query(User.password).filter(User.email == "john@example.com").scalar()
+        )
+        db.close()
+        assert stored.split("$")[1] == str(password_hasher.n)
+
+
+def test_login_rate_limited_per_account(client, setup_test_db):
+    # Superado el límite por cuenta se responde 429 sin consultar la base
+    register_user(client)
+    limit = rate_limiter.limits_for("/api/v1/token")["account"].capacity
+    for _ in range(limit):
+        assert login_user(client).status_code == 200
+
+    response = login_user(client)
+    expect_error_response(response, 429)
+    assert int(response.headers["Retry-After"]) >= 1
+
+    # Otra cuenta desde la misma IP no se ve afectada
+    register_user(client, email="jane@example.com")
+    assert login_user(client, email="jane@example.com").status_code == 200
+
+
+def test_login_rate_limited_per_ip(client, setup_test_db):
+    # El límite por IP alcanza a todas las cuentas
+    ip_limiter = rate_limiter.limits_for("/api/v1/token")["ip"]
+    limit = ip_limiter.capacity
+    # Sin reposición durante el test: cada login cuesta un hash scrypt
+    with patch.object(ip_limiter, "rate", 1e-6):
+        for i in range(limit):
+            response = login_user(client, email=f"user{i}@example.com")
+            expect_error_response(response, 401)
+
+        response = client.post(
+            "/api/v1/token",
+            data={"username": "other@example.com", "password": "password123"},
+            headers={"Origin": "http://frontend.example.com"},
+        )
+        expect_error_response(response, 429)
+        # Los headers CORS los pone CORSMiddleware, una sola vez
+        assert response.headers.get_list("access-control-allow-origin") == [
+            "http://frontend.example.com"
+        ]
+
+
+def test_login_rate_limited_per_forwarded_ip(client, setup_test_db):
+    # Detrás de un proxy, rotar la parte de X-Forwarded-For que controla el
+    # cliente no da un límite nuevo
+    ip_limiter = rate_limiter.limits_for("/api/v1/token")["ip"]
+    limit = ip_limiter.capacity
+    with patch.object(settings, "RATE_LIMIT_TRUSTED_PROXY_HOPS", 1), patch.object(
+        ip_limiter, "rate", 1e-6
+    ):
+        for i in range(limit + 1):
+            response = client.post(
+                "/api/v1/token",
+                data={"username": f"user{i}@example.com", "password": "password123"},
+                headers={"X-Forwarded-For": f"198.51.100.{i}, 203.0.113.7"},
+            )
+        expect_error_response(response, 429)
+
+        other_client = client.post(
+            "/api/v1/token",
+            data={"username": "other@example.com", "password": "password123"},
+            headers={"X-Forwarded-For": "203.0.113.8"},
+        )
+        expect_error_response(other_client, 401)
+
+
 def test_login_with_service_account(client, setup_test_db):
     # Iniciar sesión con una cuenta de servicio
     response = client.post(
@@ -257,3 +457,112 @@ def test_login_fail_with_service_account(client, setup_test_db):
     )
 
     expect_error_response(response, 401)
+
+
+def refresh(client, refresh_token):
+    return client.post("/api/v1/token/refresh", json={"refresh_token": refresh_token})
+
+
+def test_refresh_token_rotates(client, setup_test_db):
+    # El refresh token se canjea por un token de acceso y uno nuevo
+    register_user(client)
+    first = login_user(client, scope="offline_access").json()
+
+    response = refresh(client, first["refresh_token"])
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["token_type"] == "bearer"
+    assert data["refresh_token"] != first["refresh_token"]
+    payload = jwt.decode(
+        data["access_token"], settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+    )
+    assert payload["sub"] == "john@example.com"
+
+    me = client.get(
+        "/api/v1/me/", headers={"Authorization": f"Bearer {data['access_token']}"}
+    )
+    assert me.status_code == 200
+
+
+def test_refresh_token_reuse_revokes_family(client, setup_test_db):
+    # Reusar un refresh token ya rotado invalida también al que lo reemplazó
+    register_user(client)
+    first = login_user(client, scope="offline_access").json()
+    second = refresh(client, first["refresh_token"]).json()
+
+    reuse = refresh(client, first["refresh_token"])
+    expect_error_response(reuse, 401)
+
+    expect_error_response(refresh(client, second["refresh_token"]), 401)
+
+
+def test_refresh_token_invalid(client, setup_test_db):
+    # Un refresh token inexistente o con secreto incorrecto es rechazado
+    register_user(client)
+    token_id = (
+        login_user(client, scope="offline_access").json()["refresh_token"].split(".")[0]
+    )
+
+    expect_error_response(refresh(client, "no-es-un-token"), 401)
+    expect_error_response(refresh(client, f"{token_id}.secreto-incorrecto"), 401)
+
+
+def test_password_change_revokes_refresh_tokens(client, setup_test_db):
+    # Cambiar la contraseña invalida los refresh tokens emitidos antes
+    register_user(client)
+    tokens = login_user(client, scope="offline_access").json()
+
+    response = client.put(
+        "/api/v1/edituser/1",
+        headers={"Authorization": f"Bearer {tokens['access_token']}"},
+        json={"password": "newpassword123"},
+    )
+    assert response.status_code == 200
+
+    expect_error_response(refresh(client, tokens["refresh_token"]), 401)
+    new_tokens = login_user(
+        client, password="newpassword123", scope="offline_access"
+    ).json()
+    assert refresh(client, new_tokens["refresh_token"]).status_code == 200
+
+
+def test_expired_refresh_tokens_are_purged(client, setup_test_db):
+    # La purga borra solo los refresh tokens vencidos, en lotes
+    register_user(client)
+    for _ in range(3):
+        login_user(client, scope="offline_access")
+    kept = (
+        login_user(client, scope="offline_access").json()["refresh_token"].split(".")[0]
+    )
+    with engine.begin() as connection:
+        connection.execute(
+            text("UPDATE refresh_tokens SET expires_at = :past WHERE id != :kept"),
+            {"past": datetime.now() - timedelta(days=1), "kept": kept},
+        )
+
+    deleted = asyncio.run(
+        purge_expired_refresh_tokens(TestingAsyncSessionLocal, batch_size=2)
+    )
+
+    assert deleted == 3
+    with engine.connect() as connection:
+        remaining = connection.scalars(text("SELECT id FROM refresh_tokens")).all()
+    assert remaining == [kept]
+
+
+def test_unknown_email_pays_the_same_hash_cost(client, setup_test_db):
+    # Un email inexistente también pasa por scrypt: el tiempo de respuesta no
+    # revela qué emails están registrados
+    def verifications():
+        return (
+            REGISTRY.get_sample_value(
+                "user_auth_executor_task_duration_seconds_count",
+                {"executor": "password_hash"},
+            )
+            or 0
+        )
+
+    before = verifications()
+    expect_error_response(login_user(client, email="nobody@example.com"), 401)
+    assert verifications() == before + 1
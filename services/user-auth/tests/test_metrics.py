@@ -0,0 +1,82 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.metrics import MetricsAggregator, metric_trace
+
+
+def test_aggregator_counts_series_in_memory():
+    # Los contadores se acumulan por serie sin enviar nada
+    aggregator = MetricsAggregator(flush_interval=10, max_series=10, timeout=1)
+    aggregator.increment("user_service.login_user_attempt")
+    aggregator.increment("user_service.login_user_attempt")
+    aggregator.increment("user_service.login_user_success")
+
+    assert aggregator.drain() == {
+        "user_service.login_user_attempt": 2,
+        "user_service.login_user_success": 1,
+    }
+    assert aggregator.drain() == {}
+
+
+def test_aggregator_drops_new_series_on_overflow():
+    # Al superar el máximo de series, las nuevas se descartan
+    aggregator = MetricsAggregator(flush_interval=10, max_series=1, timeout=1)
+    aggregator.increment("a")
+    aggregator.increment("b")
+    aggregator.increment("a")
+
+    assert aggregator.drain() == {"a": 2}
+    assert aggregator.dropped == 1
+
+
+@pytest.mark.asyncio
+async def test_flush_sends_single_batched_payload():
+    # Un flush envía todas las series en un único POST
+    aggregator = MetricsAggregator(flush_interval=10, max_series=10, timeout=1)
+    aggregator._client = MagicMock()
+    aggregator._client.post = AsyncMock(return_value=MagicMock(status_code=202))
+
+    aggregator.increment("a")
+    aggregator.increment("b", 3)
+    await aggregator.flush()
+
+    aggregator._client.post.assert_awaited_once()
+    payload = aggregator._client.post.call_args.kwargs["json"]
+    points = {s["metric"]: s["points"][0][1] for s in payload["series"]}
+    assert points == {"a": 1, "b": 3}
+
+
+@pytest.mark.asyncio
+async def test_metric_trace_records_async_errors():
+    # metric_trace registra intento y error en funciones asincrónicas
+    from app.core.metrics import metrics_aggregator
+
+    metrics_aggregator.drain()
+
+    @metric_trace("test_action")
+    async def failing():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        await failing()
+
+    counts = metrics_aggregator.drain()
+    assert counts["user_service.test_action_attempt"] == 1
+    assert counts["user_service.test_action_error"] == 1
+
+
+def test_metrics_endpoint_exposes_latency_histograms():
+    # /metrics expone los histogramas en formato Prometheus
+    client = TestClient(app)
+    client.get("/api/v1/users")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert "user_auth_http_request_duration_seconds_bucket" in body
+    assert '/users",status="401"' in body
+    assert "user_auth_http_requests_in_progress" in body
+    assert "user_auth_db_pool_checked_out" in body
@@ -0,0 +1,39 @@
+from app.utils.password_hashing import (
+    UNUSABLE_PASSWORD,
+    hash_password,
+    needs_rehash,
+    verify_password,
+)
+
+# Costo bajo: estos tests validan el formato, no la resistencia del hash
+N, R, P = 1024, 8, 1
+
+
+def test_hash_and_verify():
+    stored = hash_password("password123", N, R, P)
+    assert stored.startswith(f"scrypt${N}${R}${P}$")
+    assert stored != hash_password("password123", N, R, P)
+    assert verify_password("password123", stored)
+    assert not verify_password("password124", stored)
+    assert not needs_rehash(stored, N, R, P)
+    assert needs_rehash(stored, N * 2, R, P)
+
+
+def test_legacy_and_unusable_passwords():
+    assert verify_password("password123", "password123")
+    assert not verify_password("password124", "password123")
+    assert needs_rehash("password123", N, R, P)
+
+    assert not verify_password(UNUSABLE_PASSWORD, UNUSABLE_PASSWORD)
+    assert not needs_rehash(UNUSABLE_PASSWORD, N, R, P)
+
+
+def test_legacy_google_token_is_not_a_password():
+    # Filas viejas de Google con el ID token guardado como contraseña
+    token = "eyJhbGciOiJSUzI1NiJ9.eyJzdWIiOiIxMjMifQ.firma"
+    assert not verify_password(token, token)
+    assert not needs_rehash(token, N, R, P)
+
+
+def test_malformed_hash_is_rejected():
+    assert not verify_password("password123", "scrypt$1024$8$nope")
@@ -0,0 +1,65 @@
+from unittest.mock import patch
+import pytest
+from app.core.rate_limit import (
+    RateLimiter,
+    TokenBucketLimiter,
+    client_ip,
+    parse_limit,
+)
+
+
+def test_parse_limit():
+    assert parse_limit("10/minute") == (10, 60)
+    with pytest.raises(ValueError):
+        parse_limit("10/week")
+    with pytest.raises(ValueError):
+        RateLimiter({"/api/v1/token": {"email": "10/minute"}}, max_keys=10)
+
+
+def test_token_bucket_refills_over_time():
+    limiter = TokenBucketLimiter(capacity=2, period=60, max_keys=10)
+    with patch("app.core.rate_limit.time.monotonic", return_value=1000.0):
+        assert limiter.acquire("a") == 0
+        assert limiter.acquire("a") == 0
+        assert limiter.acquire("a") == pytest.approx(30)
+    # Cada 30 segundos se repone un token
+    with patch("app.core.rate_limit.time.monotonic", return_value=1030.0):
+        assert limiter.acquire("a") == 0
+        assert limiter.acquire("a") > 0
+
+
+def test_token_bucket_evicts_idle_and_excess_keys():
+    limiter = TokenBucketLimiter(capacity=2, period=60, max_keys=2)
+    with patch("app.core.rate_limit.time.monotonic", return_value=1000.0):
+        for key in ("a", "b", "c"):
+            limiter.acquire(key)
+        # Nunca más de max_keys: se descarta la de uso más antiguo
+        assert len(limiter) == 2
+    # Los buckets que ya se rellenaron por completo se descartan solos
+    with patch("app.core.rate_limit.time.monotonic", return_value=1100.0):
+        limiter.acquire("d")
+        assert len(limiter) == 1
+
+
+def forwarded_scope(*values):
+    return {
+        "client": ("10.0.0.1", 1234),
+        "headers": [(b"x-forwarded-for", value.encode()) for value in values],
+    }
+
+
+def test_client_ip_takes_the_hop_added_by_the_trusted_proxy():
+    # El cliente puede mandar su propio X-Forwarded-For: solo vale la entrada
+    # que agregó el proxy confiable (la última con un salto)
+    scope = forwarded_scope("1.1.1.1, 2.2.2.2", "203.0.113.7")
+
+    assert client_ip(scope, trusted_hops=1) == "203.0.113.7"
+    assert client_ip(scope, trusted_hops=2) == "2.2.2.2"
+
+
+def test_client_ip_without_trusted_proxies_uses_the_connection():
+    scope = forwarded_scope("1.1.1.1")
+
+    assert client_ip(scope, trusted_hops=0) == "10.0.0.1"
+    # Menos entradas que proxies: el header no viene completo
+    assert client_ip(scope, trusted_hops=2) == "10.0.0.1"
@@ -1,9 +1,12 @@
+import asyncio
 import pytest
 import os
 import logging
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
 from sqlalchemy.exc import OperationalError
 from sqlalchemy.sql import text
 from app.main import app, Base
@@ -22,6 +25,18 @@ TEST_DATABASE_URL = os.getenv(
 engine = create_engine(TEST_DATABASE_URL)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Las rutas usan sesiones asincrónicas; NullPool evita reutilizar conexiones
+# entre los distintos event loops que levanta el TestClient
+async_engine = create_async_engine(
+    TEST_DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://").replace(
+        "sslmode=", "ssl="
+    ),
+    poolclass=NullPool,
+)
+TestingAsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+
 
 def create_test_database():
     try:
@@ -42,12 +57,9 @@ create_test_database()
 Base.metadata.create_all(bind=engine)
 
 
-def override_get_db():
-    db = TestingSessionLocal()
-    try:
+async def override_get_db():
+    async with TestingAsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
 app.dependency_overrides[get_db] = override_get_db
@@ -85,6 +97,27 @@ def test_register_user(client, setup_test_db):
     assert response.json()["data"]["location"] == "Buenos Aires"
 
 
+def test_register_user_stores_password_hash(client, setup_test_db):
+    # La contraseña se guarda hasheada, nunca en texto plano
+    response = client.post(
+        "/api/v1/register",
+        json={
+            "name": "John Doe",
+            "email": "john@example.com",
+            "password": "password123",
+        },
+    )
+    assert response.status_code == 200
+    assert "password" not in response.json()["data"]
+
+    with engine.connect() as connection:
+        stored = connection.execute(
+            text("SELECT password FROM users WHERE email = 'john@example.com'")
+        ).scalar_one()
+    assert stored.startswith("scrypt$")
+    assert "password123" not in stored
+
+
 def test_register_duplicate_user(client, setup_test_db):
     # Registrar primer usuario
     client.post(
@@ -256,3 +289,27 @@ def test_register_user_default_academic_level(client, setup_test_db):
     assert response.status_code == 200
     assert response.json()["status"] == "success"
     assert response.json()["data"]["academic_level"] == 0
+
+
+@pytest.mark.asyncio
+async def test_concurrent_registration_same_email(setup_test_db):
+    # Dos registros simultáneos con el mismo email: solo uno puede crearse
+    from fastapi import HTTPException
+    from app.repositories.user_repository import create_user
+    from app.schemas.user import UserCreate
+
+    user_data = UserCreate(
+        name="John Doe", email="john@example.com", password="password123"
+    )
+
+    async def register():
+        async with TestingAsyncSessionLocal() as db:
+            try:
+                await create_user(db, user_data)
+                return 200
+            except HTTPException as e:
+                return e.status_code
+
+    results = await asyncio.gather(register(), register())
+
+    assert sorted(results) == [200, 400]
@@ -2,10 +2,17 @@ import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
 from app.main import app, Base
-from app.routers.user_router import get_db
+from app.core.identity_cache import identity_cache
+from app.routers.user_router import get_db, get_session_factory
+from app.core.config import settings
 from app.models.user import User
+from app.core.rate_limit import rate_limiter
+from unittest.mock import patch
 import os
+import json
 
 # Usar la URL de la base de datos desde las variables de entorno
 TEST_DATABASE_URL = os.getenv(
@@ -16,16 +23,26 @@ TEST_DATABASE_URL = os.getenv(
 engine = create_engine(TEST_DATABASE_URL)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Las rutas usan sesiones asincrónicas; NullPool evita reutilizar conexiones
+# entre los distintos event loops que levanta el TestClient
+async_engine = create_async_engine(
+    TEST_DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://").replace(
+        "sslmode=", "ssl="
+    ),
+    poolclass=NullPool,
+)
+TestingAsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+
 
-def override_get_db():
-    db = TestingSessionLocal()
-    try:
+async def override_get_db():
+    async with TestingAsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_session_factory] = lambda: TestingAsyncSessionLocal
 
 
 @pytest.fixture
@@ -37,6 +54,8 @@ def client():
 def setup_test_db():
     Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
+    identity_cache.clear()
+    rate_limiter.clear()
     yield
     Base.metadata.drop_all(bind=engine)
 
@@ -231,3 +250,331 @@ def test_read_users_me(client, setup_test_db):
     assert user["name"] == "Test Teacher"
     assert user["location"] == "Buenos Aires"
     assert user["is_teacher"] is True
+
+
+def test_read_users_me_after_edit_returns_updated_identity(client, setup_test_db):
+    # La identidad cacheada se invalida al editar el usuario
+    token = register_and_login_user(client)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    assert client.get("/api/v1/me/", headers=headers).json()["name"] == "Test User"
+
+    client.put(
+        "/api/v1/edituser/1",
+        headers=headers,
+        json={"name": "Updated Name", "location": "Updated Location"},
+    )
+
+    user = client.get("/api/v1/me/", headers=headers).json()
+    assert user["name"] == "Updated Name"
+    assert user["location"] == "Updated Location"
+
+
+def test_identity_read_before_an_edit_is_not_cached(client, setup_test_db):
+    # Una edición que termina mientras un miss del caché lee la base invalida
+    # la fila leída: no queda cacheada la identidad anterior
+    from app.core import security
+
+    token = register_and_login_user(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    real_get_user = security.get_user
+    edit = {}
+
+    async def get_user_then_edit(db, email):
+        user = await real_get_user(db, email)
+        if not edit:
+            # La edición también pasa por aquí: se marca antes para no repetirla
+            edit["pending"] = True
+            edit["response"] = client.put(
+                "/api/v1/edituser/1", headers=headers, json={"name": "Updated Name"}
+            )
+        return user
+
+    with patch.object(security, "get_user", get_user_then_edit):
+        stale = client.get("/api/v1/me/", headers=headers).json()
+
+    assert edit["response"].status_code == 200
+    assert stale["name"] == "Test User"
+    assert client.get("/api/v1/me/", headers=headers).json()["name"] == "Updated Name"
+
+
+def test_get_users_paginated_with_cursor(client, setup_test_db):
+    # La lista de usuarios se pagina por cursor sobre el id
+    token = register_and_login_user(client)
+    register_and_login_user(client, name="Second User", email="second@example.com")
+    register_and_login_user(client, name="Third User", email="third@example.com")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = client.get("/api/v1/users", params={"limit": 2}, headers=headers)
+
+    assert response.status_code == 200
+    assert [u["id"] for u in response.json()] == [1, 2]
+    next_cursor = response.headers["X-Next-Cursor"]
+
+    response = client.get(
+        "/api/v1/users", params={"limit": 2, "cursor": next_cursor}, headers=headers
+    )
+
+    assert response.status_code == 200
+    assert [u["id"] for u in response.json()] == [3]
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_get_users_filtered(client, setup_test_db):
+    # Se puede filtrar la lista de usuarios
+    token = register_and_login_user(client)
+    register_and_login_user(
+        client, name="Teacher User", email="teacher@example.com", is_teacher=True
+    )
+
+    response = client.get(
+        "/api/v1/users",
+        params={"is_teacher": True},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 200
+    users = response.json()
+    assert len(users) == 1
+    assert users[0]["email"] == "teacher@example.com"
+
+
+def test_get_users_page_size_cap(client, setup_test_db):
+    # El tamaño de página está acotado
+    token = register_and_login_user(client)
+
+    response = client.get(
+        "/api/v1/users",
+        params={"limit": 100000},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 422
+
+
+def get_service_token(client):
+    response = client.post(
+        "/api/v1/token/service",
+        data={
+            "username": settings.SERVICE_USERNAME,
+            "password": settings.SERVICE_PASSWORD,
+        },
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    return response.json()["access_token"]
+
+
+def test_export_users_ndjson(client, setup_test_db):
+    # Export en streaming de todos los usuarios en NDJSON
+    register_and_login_user(client)
+    register_and_login_user(client, name="Second User", email="second@example.com")
+    token = get_service_token(client)
+
+    response = client.get(
+        "/api/v1/users/export", headers={"Authorization": f"Bearer {token}"}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["email"] for row in rows] == ["test@example.com", "second@example.com"]
+    assert "password" not in rows[0]
+
+
+def test_export_users_csv(client, setup_test_db):
+    # Export en streaming de todos los usuarios en CSV
+    register_and_login_user(client)
+    token = get_service_token(client)
+
+    response = client.get(
+        "/api/v1/users/export",
+        params={"format": "csv"},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert lines[0].startswith("id,name,email")
+    assert "test@example.com" in lines[1]
+
+
+def test_export_users_requires_service_token(client, setup_test_db):
+    # Un token de usuario no puede exportar el directorio completo
+    token = register_and_login_user(client)
+
+    response = client.get(
+        "/api/v1/users/export", headers={"Authorization": f"Bearer {token}"}
+    )
+
+    assert response.status_code == 401
+
+
+def test_edit_user_with_duplicate_email(client, setup_test_db):
+    # No se puede cambiar el email a uno ya registrado
+    token = register_and_login_user(client)
+    register_and_login_user(client, name="Second User", email="second@example.com")
+
+    response = client.put(
+        "/api/v1/edituser/1",
+        headers={"Authorization": f"Bearer {token}"},
+        json={"email": "second@example.com"},
+    )
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "El email ya está registrado"
+
+
+def test_import_users_reports_each_row(client, setup_test_db):
+    # Alta masiva: filas creadas, duplicadas e inválidas
+    register_and_login_user(client)
+    token = get_service_token(client)
+
+    response = client.post(
+        "/api/v1/users/import",
+        headers={"Authorization": f"Bearer {token}"},
+        json=[
+            {"name": "Alumno Uno", "email": "uno@example.com", "password": "pass123"},
+            {"name": "Alumno Dos", "email": "test@example.com", "password": "pass123"},
+            {"name": "Alumno Tres", "email": "invalid-email", "password": "pass123"},
+            {"name": "Alumno Uno", "email": "uno@example.com", "password": "pass123"},
+        ],
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["created"], data["duplicates"], data["invalid"]) == (1, 2, 1)
+    assert [r["status"] for r in data["results"]] == [
+        "created",
+        "duplicate",
+        "invalid",
+        "duplicate",
+    ]
+    assert data["results"][0]["id"] is not None
+
+
+def test_import_hashes_outside_the_login_pool(client, setup_test_db):
+    # Las contraseñas importadas se hashean en su propio pool: los logins no
+    # esperan detrás de una importación
+    from prometheus_client import REGISTRY
+
+    def tasks(executor):
+        return (
+            REGISTRY.get_sample_value(
+                "user_auth_executor_task_duration_seconds_count",
+                {"executor": executor},
+            )
+            or 0
+        )
+
+    token = get_service_token(client)
+    login_before, bulk_before = tasks("password_hash"), tasks("password_hash_bulk")
+
+    response = client.post(
+        "/api/v1/users/import",
+        headers={"Authorization": f"Bearer {token}"},
+        json=[
+            {"name": "Alumno", "email": f"alumno{i}@example.com", "password": "pass123"}
+            for i in range(5)
+        ],
+    )
+
+    assert response.json()["created"] == 5
+    assert tasks("password_hash") == login_before
+    assert tasks("password_hash_bulk") > bulk_before
+
+
+def test_imported_password_is_rehashed_on_first_login(client, setup_test_db):
+    # Las contraseñas importadas usan un costo bajo y suben al normal en el
+    # primer login
+    token = get_service_token(client)
+    client.post(
+        "/api/v1/users/import",
+        headers={"Authorization": f"Bearer {token}"},
+        json=[{"name": "Alumno", "email": "alumno@example.com", "password": "pass123"}],
+    )
+
+    def stored_cost():
+        with TestingSessionLocal() as db:
+            stored = db.query(User).filter_by(email="alumno@example.com").one().password
+        return int(stored.split("$")[1])
+
+    assert stored_cost() == settings.PASSWORD_HASH_IMPORT_N
+
+    response = client.post(
+        "/api/v1/token",
+        data={"username": "alumno@example.com", "password": "pass123"},
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+
+    assert response.status_code == 200
+    assert stored_cost() == settings.PASSWORD_HASH_N
+
+
+def test_import_users_ndjson(client, setup_test_db):
+    # Alta masiva enviando NDJSON
+    token = get_service_token(client)
+    body = "\n".join(
+        json.dumps(
+            {"name": "Alumno", "email": f"alumno{i}@example.com", "password": "pass123"}
+        )
+        for i in range(3)
+    )
+
+    response = client.post(
+        "/api/v1/users/import",
+        headers={
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/x-ndjson",
+        },
+        content=body + "\n{not json}\n",
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["created"], data["invalid"]) == (3, 1)
+
+
+def test_get_users_batch_by_ids(client, setup_test_db):
+    # Búsqueda de varios usuarios por id en una sola llamada
+    token = register_and_login_user(client)
+    register_and_login_user(client, name="Second User", email="second@example.com")
+
+    response = client.post(
+        "/api/v1/users/batch",
+        headers={"Authorization": f"Bearer {token}"},
+        json={"ids": [2, 999, 1]},
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert [u["id"] for u in data["users"]] == [2, 1]
+    assert data["missing"] == [999]
+
+
+def test_get_users_batch_by_emails(client, setup_test_db):
+    # Búsqueda de varios usuarios por email en una sola llamada
+    token = register_and_login_user(client)
+
+    response = client.post(
+        "/api/v1/users/batch",
+        headers={"Authorization": f"Bearer {token}"},
+        json={"emails": ["missing@example.com", "test@example.com"]},
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert [u["email"] for u in data["users"]] == ["test@example.com"]
+    assert data["missing"] == ["missing@example.com"]
+
+
+def test_get_users_batch_requires_ids_or_emails(client, setup_test_db):
+    # Se debe enviar ids o emails
+    token = register_and_login_user(client)
+
+    response = client.post(
+        "/api/v1/users/batch",
+        headers={"Authorization": f"Bearer {token}"},
+        json={},
+    )
+
+    assert response.status_code == 422
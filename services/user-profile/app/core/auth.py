@@ -1,63 +1,140 @@
-import httpx
+import asyncio
+import base64
+import json
 import logging
+import time
 from typing import Optional
 from functools import lru_cache
 from app.core.config import settings
+from app.core.resilience import call_auth_service
+
+
+def get_token_expiry(token: str) -> Optional[float]:
+    """
+    Devuelve el `exp` del JWT como timestamp. No verifica la firma: solo se usa
+    para decidir cuándo renovar un token emitido por user-auth.
+    """
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload)).get("exp")
+        return float(exp) if exp is not None else None
+    except Exception:
+        return None
 
 
 class ServiceAuth:
     def __init__(self):
         self.base_url = settings.AUTH_SERVICE_URL
         self.access_token: Optional[str] = None
+        self.expires_at: Optional[float] = None
+        self._login_lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
 
     async def initialize(self) -> None:
-        """Inicializa la autenticación del servicio"""
+        """Inicializa la autenticación del servicio y la renovación en segundo plano"""
         if not self.access_token:
             await self.login()
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def close(self) -> None:
+        """Detiene la renovación en segundo plano"""
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    def _seconds_until_refresh(self) -> float:
+        # Se renueva SERVICE_TOKEN_REFRESH_MARGIN_SECONDS antes del vencimiento,
+        # o a mitad de la vida restante si el token dura menos que eso
+        if self.expires_at is None:
+            return settings.SERVICE_TOKEN_RETRY_SECONDS
+        remaining = self.expires_at - time.time()
+        margin = min(settings.SERVICE_TOKEN_REFRESH_MARGIN_SECONDS, remaining / 2)
+        return max(remaining - margin, 0)
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            if self.access_token is not None and self.expires_at is None:
+                # Token sin `exp`: solo se renueva cuando user-auth responde 401
+                return
+            await asyncio.sleep(self._seconds_until_refresh())
+            if await self.login(force=True) is None:
+                await asyncio.sleep(settings.SERVICE_TOKEN_RETRY_SECONDS)
+
+    def _is_expired(self) -> bool:
+        return self.expires_at is not None and time.time() >= self.expires_at
+
+    async def login(
+        self, rejected_token: Optional[str] = None, force: bool = False
+    ) -> Optional[str]:
+        """
+        Obtiene un token nuevo. Los pedidos concurrentes se serializan en un
+        lock y solo el primero se autentica: el resto reutiliza su token.
+        Con `rejected_token` (un 401 de user-auth) no se vuelve a autenticar
+        si el token vigente ya es otro.
+        """
+        token_before_wait = self.access_token
+        async with self._login_lock:
+            if not force and self.access_token and not self._is_expired():
+                renewed_meanwhile = self.access_token != token_before_wait
+                already_replaced = (
+                    rejected_token is not None and self.access_token != rejected_token
+                )
+                if renewed_meanwhile or already_replaced:
+                    return self.access_token
+            return await self._login()
 
-    async def login(self) -> Optional[str]:
+    async def get_token(self) -> Optional[str]:
+        """Retorna el token actual; solo se autentica si no hay uno vigente"""
+        if self.access_token is None or self._is_expired():
+            return await self.login()
+        return self.access_token
+
+    async def _login(self) -> Optional[str]:
         """Obtiene un token de acceso usando las credenciales del servicio"""
         try:
-            async with httpx.AsyncClient() as client:
-                logging.info("Intentando autenticar servicio...")
-                logging.debug(f"URL: {self.base_url}/token/service")
-                logging.debug(f"Username: {settings.SERVICE_USERNAME}")
-
-                response = await client.post(
-                    f"{self.base_url}/token/service",
-                    data={
-                        "username": settings.SERVICE_USERNAME,
-                        "password": settings.SERVICE_PASSWORD,
-                    },
-                    headers={"Content-Type": "application/x-www-form-urlencoded"},
-                )
+            logging.info("Intentando autenticar servicio...")
+            logging.debug(f"URL: {self.base_url}/token/service")
+            logging.debug(f"Username: {settings.SERVICE_USERNAME}")
 
-                # Loguear la respuesta completa para debugging
-                logging.debug(
-                    f"Respuesta del servicio: Status={response.status_code}, Body={response.text}"
-                )
+            response = await call_auth_service(
+                "POST",
+                f"{self.base_url}/token/service",
+                data={
+                    "username": settings.SERVICE_USERNAME,
+                    "password": settings.SERVICE_PASSWORD,
+                },
+                headers={"Content-Type": "application/x-www-form-urlencoded"},
+            )
 
-                if response.status_code == 200:
-                    self.access_token = response.json()["access_token"]
-                    logging.info("Servicio autenticado exitosamente")
-                    return self.access_token
-                else:
-                    logging.error(
-                        f"Error en la autenticación del servicio. Status: {response.status_code}"
-                    )
-                    logging.error(f"URL: {self.base_url}/token/service")
-                    logging.error(f"Detalle del error: {response.text}")
-                    return None
+            # Loguear la respuesta completa para debugging
+            logging.debug(
+                f"Respuesta del servicio: Status={response.status_code}, Body={response.text}"
+            )
+
+            if response.status_code == 200:
+                self.access_token = response.json()["access_token"]
+                self.expires_at = get_token_expiry(self.access_token)
+                logging.info("Servicio autenticado exitosamente")
+                return self.access_token
+            else:
+                logging.error(
+                    f"Error en la autenticación del servicio. Status: {response.status_code}"
+                )
+                logging.error(f"URL: {self.base_url}/token/service")
+                logging.error(f"Detalle del error: {response.text}")
+                return None
 
         except Exception as e:
             logging.error(f"Error al intentar autenticar el servicio: {str(e)}")
             logging.error(f"URL: {self.base_url}/token/service")
             return None
 
-    def get_token(self) -> Optional[str]:
-        """Retorna el token actual"""
-        return self.access_token
-
 
 @lru_cache()
 def get_service_auth() -> ServiceAuth:
@@ -1,5 +1,6 @@
+from typing import Optional
 from pydantic_settings import BaseSettings
-from pydantic import ConfigDict
+from pydantic import ConfigDict, model_validator
 
 
 class Settings(BaseSettings):
@@ -16,7 +17,56 @@ class Settings(BaseSettings):
 
     AUTH_SERVICE_URL: str
 
+    # Verificación local de tokens de usuario: clave compartida con user-auth
+    # y/o URL del JWKS publicado por user-auth
+    SECRET_KEY: Optional[str] = None
+    ALGORITHM: str = "HS256"
+    AUTH_JWKS_URL: Optional[str] = None
+    JWKS_MIN_REFRESH_SECONDS: float = 60.0
+    TOKEN_CACHE_MAX_SIZE: int = 10000
+
+    # Renovación proactiva del token de servicio
+    SERVICE_TOKEN_REFRESH_MARGIN_SECONDS: float = 60.0
+    SERVICE_TOKEN_RETRY_SECONDS: float = 5.0
+
+    # Cliente HTTP compartido para las llamadas salientes (user-auth)
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    HTTP_CONNECT_TIMEOUT_SECONDS: float = 3.0
+    HTTP_READ_TIMEOUT_SECONDS: float = 10.0
+    HTTP_WRITE_TIMEOUT_SECONDS: float = 10.0
+    HTTP_POOL_TIMEOUT_SECONDS: float = 5.0
+    HTTP2_ENABLED: bool = False
+
+    # Resiliencia de las llamadas a user-auth
+    UPSTREAM_REQUEST_DEADLINE_SECONDS: float = 15.0
+    UPSTREAM_MAX_RETRIES: int = 2
+    UPSTREAM_RETRY_BACKOFF_SECONDS: float = 0.1
+    UPSTREAM_RETRY_MAX_BACKOFF_SECONDS: float = 1.0
+    UPSTREAM_RETRY_BUDGET_RATIO: float = 0.2
+    UPSTREAM_RETRY_BUDGET_MIN_RETRIES: int = 10
+    UPSTREAM_RETRY_BUDGET_WINDOW_SECONDS: float = 10.0
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_BREAKER_RESET_SECONDS: float = 30.0
+
+    # Caché de perfiles (GET /user/{user_id})
+    PROFILE_CACHE_MAX_SIZE: int = 10000
+    PROFILE_CACHE_TTL_SECONDS: float = 30.0
+    PROFILE_CACHE_STALE_SECONDS: float = 300.0
+
     model_config = ConfigDict(env_file=".env")
 
+    @model_validator(mode="after")
+    def require_token_verification_key(self):
+        # Sin ninguna de las dos, todas las rutas de usuario responderían 401:
+        # es mejor que el servicio no arranque
+        if not self.SECRET_KEY and not self.AUTH_JWKS_URL:
+            raise ValueError(
+                "Se debe definir SECRET_KEY (la misma de user-auth) y/o "
+                "AUTH_JWKS_URL para verificar los tokens de usuario"
+            )
+        return self
+
 
 settings = Settings()
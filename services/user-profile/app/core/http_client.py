@@ -0,0 +1,58 @@
+import httpx
+import logging
+from typing import Optional
+from app.core.config import settings
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def build_http_client() -> httpx.AsyncClient:
+    """Crea el cliente HTTP con pool de conexiones y keep-alive"""
+    http2 = settings.HTTP2_ENABLED
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logging.warning("HTTP2_ENABLED requiere 'httpx[http2]'; se usa HTTP/1.1")
+            http2 = False
+
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        timeout=httpx.Timeout(
+            connect=settings.HTTP_CONNECT_TIMEOUT_SECONDS,
+            read=settings.HTTP_READ_TIMEOUT_SECONDS,
+            write=settings.HTTP_WRITE_TIMEOUT_SECONDS,
+            pool=settings.HTTP_POOL_TIMEOUT_SECONDS,
+        ),
+    )
+
+
+async def start_http_client() -> None:
+    """Abre el cliente compartido al arrancar la aplicación"""
+    global _client
+    if _client is None:
+        _client = build_http_client()
+
+
+async def close_http_client() -> None:
+    """Cierra el cliente compartido y sus conexiones al apagar la aplicación"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Cliente compartido por todas las llamadas salientes. Se crea si todavía no
+    existe (por ejemplo, en tests que no ejecutan el lifespan).
+    """
+    global _client
+    if _client is None:
+        _client = build_http_client()
+    return _client
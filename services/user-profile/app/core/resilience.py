@@ -0,0 +1,265 @@
+import asyncio
+import contextvars
+import logging
+import random
+import time
+from collections import deque
+from typing import Optional
+import httpx
+from fastapi import HTTPException, status
+from app.core.config import settings
+from app.core.http_client import get_http_client
+
+DEADLINE_HEADER = "x-request-timeout-ms"
+
+# Momento (time.monotonic) en el que vence la petición entrante en curso
+request_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "request_deadline", default=None
+)
+
+RETRYABLE_STATUS = {502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "PUT", "DELETE", "OPTIONS"}
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker para las llamadas a un servicio externo.
+
+    Tras `failure_threshold` fallos consecutivos se abre y rechaza las llamadas
+    sin intentar la conexión. Pasados `reset_timeout` segundos deja pasar una
+    única llamada de prueba (half-open): si funciona se cierra, si no se
+    vuelve a abrir.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.reset()
+
+    def reset(self):
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe_in_flight = False
+
+    def retry_after(self) -> int:
+        if self.opened_at is None:
+            return 0
+        remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+        return max(int(remaining + 0.999), 1)
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = "half_open"
+        if self._probe_in_flight:
+            return False
+        self._probe_in_flight = True
+        return True
+
+    def release_probe(self):
+        self._probe_in_flight = False
+
+    def record_success(self):
+        self.reset()
+
+    def record_failure(self):
+        self._probe_in_flight = False
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                logging.warning("Circuit breaker de user-auth abierto")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def snapshot(self) -> dict:
+        return {"state": self.state, "failures": self.failures}
+
+
+class RetryBudget:
+    """
+    Limita los reintentos a una fracción (`ratio`) de las llamadas de la
+    ventana, con un mínimo de `min_retries`, para que los reintentos no
+    multipliquen la carga sobre un servicio que ya está degradado.
+    """
+
+    def __init__(self, ratio: float, min_retries: int, window: float):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window = window
+        self._requests: deque[float] = deque()
+        self._retries: deque[float] = deque()
+
+    def _trim(self, now: float):
+        for events in (self._requests, self._retries):
+            while events and now - events[0] > self.window:
+                events.popleft()
+
+    def record_request(self):
+        now = time.monotonic()
+        self._trim(now)
+        self._requests.append(now)
+
+    def try_acquire(self) -> bool:
+        now = time.monotonic()
+        self._trim(now)
+        allowed = max(self.min_retries, int(len(self._requests) * self.ratio))
+        if len(self._retries) >= allowed:
+            return False
+        self._retries.append(now)
+        return True
+
+
+auth_service_breaker = CircuitBreaker(
+    failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=settings.CIRCUIT_BREAKER_RESET_SECONDS,
+)
+auth_service_retry_budget = RetryBudget(
+    ratio=settings.UPSTREAM_RETRY_BUDGET_RATIO,
+    min_retries=settings.UPSTREAM_RETRY_BUDGET_MIN_RETRIES,
+    window=settings.UPSTREAM_RETRY_BUDGET_WINDOW_SECONDS,
+)
+
+
+def remaining_time() -> Optional[float]:
+    """Segundos que le quedan a la petición entrante, o None si no tiene plazo"""
+    deadline = request_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def _cap(timeout: Optional[float], remaining: float) -> float:
+    return remaining if timeout is None else min(timeout, remaining)
+
+
+def _backoff(attempt: int) -> float:
+    # Backoff exponencial con "full jitter"
+    cap = min(
+        settings.UPSTREAM_RETRY_MAX_BACKOFF_SECONDS,
+        settings.UPSTREAM_RETRY_BACKOFF_SECONDS * 2**attempt,
+    )
+    return random.uniform(0, cap)
+
+
+async def call_auth_service(method: str, url: str, **kwargs) -> httpx.Response:
+    """
+    Realiza una llamada a user-auth respetando el plazo de la petición
+    entrante, el circuit breaker y el presupuesto de reintentos. Solo se
+    reintentan los métodos idempotentes ante errores de red o 502/503/504.
+    """
+    method = method.upper()
+    client = get_http_client()
+    auth_service_retry_budget.record_request()
+    attempt = 0
+
+    while True:
+        # El plazo se revisa antes de allow(): en half-open, allow() reserva
+        # la llamada de prueba y un 504 aquí la dejaría tomada
+        remaining = remaining_time()
+        if remaining is not None and remaining <= 0:
+            raise HTTPException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail="Se agotó el tiempo de la petición",
+            )
+
+        if not auth_service_breaker.allow():
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="El servicio de autenticación no está disponible",
+                headers={"Retry-After": str(auth_service_breaker.retry_after())},
+            )
+
+        request_kwargs = dict(kwargs)
+        if remaining is not None:
+            # El plazo restante acota cada timeout del cliente por separado
+            # (conexión, lectura, escritura, pool) y se propaga a user-auth
+            configured = client.timeout
+            request_kwargs["timeout"] = httpx.Timeout(
+                connect=_cap(configured.connect, remaining),
+                read=_cap(configured.read, remaining),
+                write=_cap(configured.write, remaining),
+                pool=_cap(configured.pool, remaining),
+            )
+            headers = dict(request_kwargs.get("headers") or {})
+            headers[DEADLINE_HEADER] = str(int(remaining * 1000))
+            request_kwargs["headers"] = headers
+
+        error: Optional[Exception] = None
+        response: Optional[httpx.Response] = None
+        try:
+            response = await getattr(client, method.lower())(url, **request_kwargs)
+        except httpx.HTTPError as e:
+            error = e
+        except BaseException:
+            # Cancelación u otro error local: se libera la llamada de prueba
+            # sin contarlo como fallo de user-auth
+            auth_service_breaker.release_probe()
+            raise
+
+        if error is None and response.status_code not in RETRYABLE_STATUS:
+            auth_service_breaker.record_success()
+            return response
+
+        auth_service_breaker.record_failure()
+
+        can_retry = (
+            method in IDEMPOTENT_METHODS
+            and attempt < settings.UPSTREAM_MAX_RETRIES
+            and auth_service_breaker.state == "closed"
+        )
+        delay = _backoff(attempt)
+        remaining = remaining_time()
+        if can_retry and remaining is not None:
+            can_retry = remaining > delay
+        if not can_retry or not auth_service_retry_budget.try_acquire():
+            if error is None:
+                return response
+            if isinstance(error, httpx.TimeoutException):
+                raise HTTPException(
+                    status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                    detail="El servicio de autenticación no respondió a tiempo",
+                )
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="El servicio de autenticación no está disponible",
+            )
+
+        logging.warning(
+            f"Reintentando {method} {url} (intento {attempt + 1}) en {delay:.2f}s"
+        )
+        attempt += 1
+        await asyncio.sleep(delay)
+
+
+class DeadlineMiddleware:
+    """
+    Middleware ASGI que fija el plazo de cada petición entrante. Por defecto es
+    UPSTREAM_REQUEST_DEADLINE_SECONDS; el cliente puede acortarlo con el header
+    X-Request-Timeout-Ms.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        budget = settings.UPSTREAM_REQUEST_DEADLINE_SECONDS
+        for name, value in scope.get("headers", []):
+            if name.decode("latin-1") == DEADLINE_HEADER:
+                try:
+                    budget = min(budget, int(value) / 1000)
+                except ValueError:
+                    pass
+
+        token = request_deadline.set(time.monotonic() + budget)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_deadline.reset(token)
@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Annotated, Optional
+import jwt
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from pydantic import BaseModel
+from app.core.config import settings
+from app.core.http_client import get_http_client
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+
+class AuthenticatedUser(BaseModel):
+    subject: str
+    role: str
+    user_id: Optional[int] = None
+    scopes: list[str] = []
+
+
+def create_credentials_exception():
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="No se pudieron validar las credenciales",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+class JWKSKeyStore:
+    """
+    Claves públicas de user-auth obtenidas de su JWKS. Se descargan una vez y
+    se vuelven a pedir solo ante un `kid` desconocido (rotación de claves), como
+    mucho una vez cada `min_refresh_interval` segundos.
+    """
+
+    def __init__(self, jwks_url: str, min_refresh_interval: float):
+        self.jwks_url = jwks_url
+        self.min_refresh_interval = min_refresh_interval
+        self._keys: dict[str, jwt.PyJWK] = {}
+        self._last_refresh: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    async def refresh(self) -> None:
+        response = await get_http_client().get(self.jwks_url)
+        response.raise_for_status()
+        keys = {}
+        for key in jwt.PyJWKSet.from_dict(response.json()).keys:
+            keys[key.key_id] = key
+        self._keys = keys
+        self._last_refresh = time.monotonic()
+        logging.info(f"JWKS actualizado: {len(keys)} claves")
+
+    async def get(self, kid: str) -> Optional[jwt.PyJWK]:
+        key = self._keys.get(kid)
+        if key is not None:
+            return key
+        async with self._lock:
+            key = self._keys.get(kid)
+            recently_refreshed = (
+                self._last_refresh is not None
+                and time.monotonic() - self._last_refresh < self.min_refresh_interval
+            )
+            if key is None and not recently_refreshed:
+                try:
+                    await self.refresh()
+                except Exception as e:
+                    logging.error(f"No se pudo obtener el JWKS: {str(e)}")
+                key = self._keys.get(kid)
+        return key
+
+
+class TokenVerifier:
+    """
+    Verifica localmente los tokens emitidos por user-auth, con una clave
+    compartida (HS256) o con las claves públicas de su JWKS. Los tokens ya
+    verificados se guardan hasta su `exp` en un caché LRU acotado.
+    """
+
+    def __init__(
+        self,
+        secret_key: Optional[str] = None,
+        algorithm: str = "HS256",
+        key_store: Optional[JWKSKeyStore] = None,
+        cache_size: int = 10000,
+    ):
+        self.secret_key = secret_key
+        self.algorithm = algorithm
+        self.key_store = key_store
+        self.cache_size = cache_size
+        self._cache: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+
+    def _cached_claims(self, token: str) -> Optional[dict]:
+        entry = self._cache.get(token)
+        if entry is None:
+            return None
+        exp, claims = entry
+        if exp <= time.time():
+            del self._cache[token]
+            return None
+        self._cache.move_to_end(token)
+        return claims
+
+    def _store(self, token: str, claims: dict):
+        self._cache[token] = (claims["exp"], claims)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def verify(self, token: str) -> dict:
+        claims = self._cached_claims(token)
+        if claims is not None:
+            return claims
+
+        try:
+            header = jwt.get_unverified_header(token)
+            if self.key_store is not None and "kid" in header:
+                key = await self.key_store.get(header["kid"])
+                if key is None:
+                    raise create_credentials_exception()
+                claims = jwt.decode(
+                    token,
+                    key.key,
+                    algorithms=[key.algorithm_name],
+                    options={"require": ["exp", "sub"]},
+                )
+            elif self.secret_key is not None:
+                claims = jwt.decode(
+                    token,
+                    self.secret_key,
+                    algorithms=[self.algorithm],
+                    options={"require": ["exp", "sub"]},
+                )
+            else:
+                logging.error("No hay clave configurada para verificar tokens")
+                raise create_credentials_exception()
+        except jwt.InvalidTokenError:
+            raise create_credentials_exception()
+
+        self._store(token, claims)
+        return claims
+
+
+def build_token_verifier() -> TokenVerifier:
+    key_store = None
+    if settings.AUTH_JWKS_URL:
+        key_store = JWKSKeyStore(
+            settings.AUTH_JWKS_URL, settings.JWKS_MIN_REFRESH_SECONDS
+        )
+    return TokenVerifier(
+        secret_key=settings.SECRET_KEY,
+        algorithm=settings.ALGORITHM,
+        key_store=key_store,
+        cache_size=settings.TOKEN_CACHE_MAX_SIZE,
+    )
+
+
+token_verifier = build_token_verifier()
+
+
+async def get_current_user(
+    credentials: Annotated[
+        Optional[HTTPAuthorizationCredentials], Depends(bearer_scheme)
+    ],
+) -> AuthenticatedUser:
+    if credentials is None:
+        raise create_credentials_exception()
+
+    claims = await token_verifier.verify(credentials.credentials)
+    return AuthenticatedUser(
+        subject=claims["sub"],
+        role=claims.get("role", "user"),
+        user_id=claims.get("uid"),
+        scopes=claims.get("scopes", []),
+    )
+
+
+def ensure_can_edit(current_user: AuthenticatedUser, user_id: int):
+    """Un usuario solo puede editar su propio perfil; un servicio, cualquiera"""
+    if current_user.role == "service":
+        return
+    if current_user.user_id is None:
+        raise create_credentials_exception()
+    if current_user.user_id != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Solo se puede editar el perfil propio",
+        )
@@ -6,6 +6,8 @@ from fastapi.middleware.cors import CORSMiddleware
 from app.routers.user_router import router as user_router
 from app.utils.problem_details import problem_detail_response
 from app.core.auth import get_service_auth
+from app.core.http_client import start_http_client, close_http_client
+from app.core.resilience import DeadlineMiddleware, auth_service_breaker
 from contextlib import asynccontextmanager
 from app.core.config import settings
 
@@ -15,6 +17,9 @@ async def lifespan(app: FastAPI):
     """Inicializa los servicios necesarios al arrancar la aplicación"""
     environment = settings.ENVIRONMENT
 
+    # Un único cliente con keep-alive para todas las llamadas a user-auth
+    await start_http_client()
+
     if environment != "test":
         service_auth = get_service_auth()
         await service_auth.initialize()
@@ -23,6 +28,10 @@ async def lifespan(app: FastAPI):
         logging.info("Modo test: se omite autenticación del servicio")
     yield
 
+    if environment != "test":
+        await get_service_auth().close()
+    await close_http_client()
+
 
 app = FastAPI(lifespan=lifespan)
 
@@ -36,6 +45,9 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
+# Plazo por petición, usado para acotar las llamadas a user-auth
+app.add_middleware(DeadlineMiddleware)
+
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
@@ -96,4 +108,10 @@ app.include_router(user_router)
 
 @app.get("/health")
 def get_health():
-    return {"status": "ok"}
+    # user-profile sigue respondiendo aunque user-auth esté caído; el estado
+    # del circuit breaker indica si las ediciones van a fallar rápido
+    breaker = auth_service_breaker.snapshot()
+    return {
+        "status": "ok" if breaker["state"] == "closed" else "degraded",
+        "auth_service": breaker,
+    }
@@ -1,7 +1,7 @@
 from fastapi import HTTPException, status
 from app.core.auth import get_service_auth
 from app.core.config import settings
-import httpx
+from app.core.resilience import call_auth_service
 import logging
 
 
@@ -9,7 +9,7 @@ async def edit_user(user_id, user_data, retry=True):
     url = f"{settings.AUTH_SERVICE_URL}/edituser/{user_id}"
 
     auth_service = get_service_auth()
-    access_token = auth_service.get_token()
+    access_token = await auth_service.get_token()
 
     headers = {
         "Authorization": f"Bearer {access_token}",
@@ -19,8 +19,7 @@ async def edit_user(user_id, user_data, retry=True):
         # Realizar la solicitud PUT al user-service
         logging.info(f"Enviando datos para actualizar el perfil del usuario: {user_id}")
         payload = user_data.model_dump(exclude_none=True)
-        async with httpx.AsyncClient() as client:
-            response = await client.put(url, json=payload, headers=headers)
+        response = await call_auth_service("PUT", url, json=payload, headers=headers)
 
         # Verificar si la respuesta es exitosa
         if response.status_code == 200:
@@ -29,7 +28,7 @@ async def edit_user(user_id, user_data, retry=True):
         else:
             if response.status_code == 401 and retry:
                 logging.warning("Token expirado o inválido, intentando renovar...")
-                await auth_service.login()
+                await auth_service.login(rejected_token=access_token)
                 return await edit_user(user_id, user_data, retry=False)
             raise HTTPException(
                 status_code=response.status_code,
@@ -45,3 +44,36 @@ async def edit_user(user_id, user_data, retry=True):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error interno del servidor: {str(e)}",
         )
+
+
+async def get_user(user_id, retry=True):
+    url = f"{settings.AUTH_SERVICE_URL}/user/{user_id}"
+
+    auth_service = get_service_auth()
+    access_token = await auth_service.get_token()
+
+    headers = {"Authorization": f"Bearer {access_token}"}
+    try:
+        logging.info(f"Obteniendo el perfil del usuario desde user-auth: {user_id}")
+        response = await call_auth_service("GET", url, headers=headers)
+
+        if response.status_code == 200:
+            return response.json()
+        else:
+            if response.status_code == 401 and retry:
+                logging.warning("Token expirado o inválido, intentando renovar...")
+                await auth_service.login(rejected_token=access_token)
+                return await get_user(user_id, retry=False)
+            raise HTTPException(
+                status_code=response.status_code,
+                detail=f"Error al obtener el perfil del usuario (ID {user_id})",
+            )
+    except HTTPException as e:
+        raise e
+
+    except Exception as e:
+        logging.error(f"Error no controlado en obtener usuario: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error interno del servidor: {str(e)}",
+        )
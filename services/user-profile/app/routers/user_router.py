@@ -1,19 +1,44 @@
 import traceback
-from fastapi import APIRouter, HTTPException, status
-from app.services.user_profile import handle_edit_user
+from typing import Annotated
+from fastapi import APIRouter, Depends, HTTPException, status
+from app.core.security import AuthenticatedUser, ensure_can_edit, get_current_user
+from app.services.user_profile import handle_edit_user, handle_get_user
 from app.schemas.user import UserUpdate
 import logging
 
 router = APIRouter()
 
 
+@router.get("/user/{user_id}")
+async def get_user(
+    user_id: int,
+    current_user: Annotated[AuthenticatedUser, Depends(get_current_user)],
+):
+    try:
+        return await handle_get_user(user_id)
+
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        logging.error(f"Exception no manejada al obtener usuario: {str(e)}")
+        logging.error(traceback.format_exc())
+
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor",
+        )
+
+
 @router.put("/edituser")
 async def edit_user(
     user_data: UserUpdate,
     user_id: int,
+    current_user: Annotated[AuthenticatedUser, Depends(get_current_user)],
 ):
     try:
         logging.info("Intento de editar usuario")
+        ensure_can_edit(current_user, user_id)
         return await handle_edit_user(user_id, user_data)
 
     except HTTPException:
@@ -1,12 +1,79 @@
+import asyncio
 from app.schemas.user import UserUpdate
 from fastapi import HTTPException, status
-from app.repositories.user_repository import edit_user
+from app.core.config import settings
+from app.repositories.user_repository import edit_user, get_user
+from app.utils.swr_cache import SWRCache
 import logging
 
+profile_cache = SWRCache(
+    maxsize=settings.PROFILE_CACHE_MAX_SIZE,
+    ttl=settings.PROFILE_CACHE_TTL_SECONDS,
+    stale_ttl=settings.PROFILE_CACHE_STALE_SECONDS,
+)
+
+# Lecturas a user-auth en curso por usuario: los pedidos concurrentes del mismo
+# perfil comparten una única llamada
+_inflight_fetches: dict[int, asyncio.Task] = {}
+
+
+def _on_fetch_done(user_id: int, task: asyncio.Task):
+    if _inflight_fetches.get(user_id) is not task:
+        # Una edición la descartó mientras estaba en curso: el resultado puede
+        # ser anterior a la edición y no debe pisar la copia write-through
+        return
+    del _inflight_fetches[user_id]
+    if task.cancelled():
+        return
+    if task.exception() is not None:
+        logging.warning(
+            f"No se pudo revalidar el perfil del usuario {user_id}: {task.exception()}"
+        )
+        return
+    profile_cache.set(user_id, task.result())
+
+
+def _fetch_profile(user_id: int) -> asyncio.Task:
+    task = _inflight_fetches.get(user_id)
+    if task is None:
+        task = asyncio.create_task(get_user(user_id))
+        task.add_done_callback(lambda t: _on_fetch_done(user_id, t))
+        _inflight_fetches[user_id] = task
+    return task
+
+
+async def handle_get_user(user_id: int):
+    try:
+        cached = profile_cache.get(user_id)
+        if cached is not None:
+            profile, fresh = cached
+            if not fresh:
+                # stale-while-revalidate: se responde con la copia en caché y
+                # se actualiza en segundo plano
+                _fetch_profile(user_id)
+            return profile
+
+        return await asyncio.shield(_fetch_profile(user_id))
+    except HTTPException as e:
+        raise e
+
+    except Exception as e:
+        logging.error(f"Error no controlado en obtener usuario: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error interno del servidor: {str(e)}",
+        )
+
 
 async def handle_edit_user(user_id: int, user_data: UserUpdate):
     try:
-        return await edit_user(user_id, user_data)
+        profile = await edit_user(user_id, user_data)
+        # Una lectura iniciada antes de la edición puede terminar después: se
+        # descarta para que no guarde el perfil anterior
+        _inflight_fetches.pop(user_id, None)
+        # Write-through: user-auth devuelve el perfil actualizado completo
+        profile_cache.set(user_id, profile)
+        return profile
     except HTTPException as e:
         raise e
 
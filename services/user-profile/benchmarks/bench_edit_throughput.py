@@ -0,0 +1,112 @@
+"""
+Benchmark de throughput de edición de perfiles contra un user-auth simulado.
+
+Levanta un servidor local que imita los endpoints de user-auth usados por
+user-profile (/token/service y PUT /edituser/{id}) y compara:
+  - per-call: un httpx.AsyncClient nuevo por llamada (camino anterior, paga
+              un handshake TCP por cada edición)
+  - shared:   el cliente compartido de app.core.http_client vía edit_user
+
+Uso (desde services/user-profile):
+    SERVICE_USERNAME=s SERVICE_PASSWORD=p AUTH_SERVICE_URL=http://127.0.0.1:18080 \
+        PYTHONPATH=. python benchmarks/bench_edit_throughput.py \
+        --requests 5000 --concurrency 50
+
+El servidor simulado no usa TLS, así que la diferencia medida es una cota
+inferior de la que se observa contra user-auth en Render.
+"""
+
+import argparse
+import asyncio
+import threading
+import time
+from urllib.parse import urlparse
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+
+from app.core.auth import get_service_auth
+from app.core.config import settings
+from app.core.http_client import close_http_client, start_http_client
+from app.repositories.user_repository import edit_user
+from app.schemas.user import UserUpdate
+
+
+def build_stand_in_app() -> FastAPI:
+    stand_in = FastAPI()
+
+    @stand_in.post("/token/service")
+    async def token_service():
+        return {"access_token": "bench-token", "token_type": "bearer"}
+
+    @stand_in.put("/edituser/{user_id}")
+    async def edit(user_id: int, body: dict):
+        return {"id": user_id, **body}
+
+    return stand_in
+
+
+def start_stand_in_server(host: str, port: int) -> uvicorn.Server:
+    config = uvicorn.Config(
+        build_stand_in_app(), host=host, port=port, log_level="warning"
+    )
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def edit_per_call(user_id: int, user_data: UserUpdate):
+    url = f"{settings.AUTH_SERVICE_URL}/edituser/{user_id}"
+    headers = {"Authorization": f"Bearer {await get_service_auth().get_token()}"}
+    async with httpx.AsyncClient() as client:
+        response = await client.put(
+            url, json=user_data.model_dump(exclude_none=True), headers=headers
+        )
+    response.raise_for_status()
+    return response.json()
+
+
+async def run(mode: str, total: int, concurrency: int) -> float:
+    edit = edit_per_call if mode == "per-call" else edit_user
+    user_data = UserUpdate(name="Bench User")
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            await edit(i, user_data)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return time.perf_counter() - start
+
+
+async def main(args):
+    await start_http_client()
+    await get_service_auth().initialize()
+    try:
+        for mode in ("per-call", "shared"):
+            await run(mode, min(200, args.requests), args.concurrency)  # warm-up
+            elapsed = await run(mode, args.requests, args.concurrency)
+            print(
+                f"{mode:>8}: {args.requests} ediciones en {elapsed:.2f}s "
+                f"-> {args.requests / elapsed:.0f} req/s"
+            )
+    finally:
+        await close_http_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    target = urlparse(settings.AUTH_SERVICE_URL)
+    server = start_stand_in_server(target.hostname, target.port)
+    try:
+        asyncio.run(main(args))
+    finally:
+        server.should_exit = True
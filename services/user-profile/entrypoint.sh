@@ -9,8 +9,12 @@ if [ "$1" = "test" ]; then
     pytest tests/
 elif [ "$1" = "app" ]; then
     echo "Iniciando la aplicación..."
+    # Varios workers de uvicorn bajo gunicorn (ver gunicorn.conf.py)
+    exec gunicorn app.main:app --config /app/gunicorn.conf.py
+elif [ "$1" = "dev" ]; then
+    echo "Iniciando la aplicación (un solo proceso)..."
     uvicorn app.main:app --host $HOST --port $PORT
 else
-    echo "Uso: /entrypoint.sh [test|app]"
+    echo "Uso: /entrypoint.sh [test|app|dev]"
     exit 1
 fi
\ No newline at end of file
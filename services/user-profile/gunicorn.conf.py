@@ -0,0 +1,57 @@
+# Configuración de gunicorn para producción: N workers de uvicorn con la
+# aplicación precargada en el proceso maestro.
+#
+# Variables de entorno:
+#   WEB_CONCURRENCY          workers (por defecto, uno por núcleo disponible)
+#   GUNICORN_MAX_REQUESTS    peticiones antes de reciclar un worker (0 = nunca)
+#   GUNICORN_MAX_REQUESTS_JITTER, GUNICORN_TIMEOUT, GUNICORN_GRACEFUL_TIMEOUT,
+#   GUNICORN_KEEPALIVE
+#   UVICORN_LOOP             auto | asyncio | uvloop (auto usa uvloop si está)
+#   UVICORN_HTTP             auto | h11 | httptools (auto usa httptools si está)
+
+import math
+import os
+
+from uvicorn_worker import UvicornWorker
+
+
+def available_cpus() -> int:
+    """Núcleos utilizables, respetando la afinidad y la cuota de CPU del cgroup"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(math.ceil(int(quota) / int(period)), 1))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+class Worker(UvicornWorker):
+    CONFIG_KWARGS = {
+        "loop": os.getenv("UVICORN_LOOP", "auto"),
+        "http": os.getenv("UVICORN_HTTP", "auto"),
+    }
+
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+worker_class = Worker
+workers = int(os.getenv("WEB_CONCURRENCY", available_cpus()))
+
+# La aplicación se importa una vez en el maestro y los workers la heredan
+# con fork: arrancan más rápido y comparten memoria de solo lectura
+preload_app = True
+
+# Reciclar workers de a poco (el jitter evita que se reinicien todos juntos)
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 10000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 1000))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 60))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+
+accesslog = None
+errorlog = "-"
@@ -1,9 +1,23 @@
+import pytest
 from fastapi.testclient import TestClient
 from app.main import app
+from app.core.security import AuthenticatedUser, get_current_user
 from unittest.mock import patch, AsyncMock
 
 client = TestClient(app)
 
+
+@pytest.fixture(autouse=True)
+def authenticated_service():
+    # Las pruebas de edición se hacen con identidad de servicio, que puede
+    # editar cualquier perfil; la autorización se prueba en test_security.py
+    app.dependency_overrides[get_current_user] = lambda: AuthenticatedUser(
+        subject="test-service", role="service"
+    )
+    yield
+    app.dependency_overrides.clear()
+
+
 valid_user_data = {"name": "new username", "location": "New location"}
 
 
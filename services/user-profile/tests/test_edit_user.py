@@ -98,3 +98,20 @@ async def test_edit_user_external_service_error():
             await edit_user(user_id=3, user_data=data)
 
         assert exc_info.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_http_client_is_shared_and_closed():
+    """El cliente HTTP se reutiliza entre llamadas y se cierra en el shutdown"""
+    from app.core.http_client import (
+        get_http_client,
+        start_http_client,
+        close_http_client,
+    )
+
+    await start_http_client()
+    client = get_http_client()
+    assert get_http_client() is client
+
+    await close_http_client()
+    assert client.is_closed
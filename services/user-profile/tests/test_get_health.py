@@ -10,4 +10,6 @@ def test_get_health():
 
     response = client.get("/health")
     assert response.status_code == 200
-    assert response.json() == {"status": "ok"}
+    data = response.json()
+    assert data["status"] == "ok"
+    assert data["auth_service"]["state"] == "closed"
@@ -0,0 +1,108 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, patch
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.security import AuthenticatedUser, get_current_user
+from app.schemas.user import UserUpdate
+from app.services.user_profile import (
+    handle_edit_user,
+    handle_get_user,
+    profile_cache,
+)
+
+client = TestClient(app)
+
+profile = {"id": 7, "name": "Pepe", "email": "pepe@example.com", "location": "CABA"}
+
+
+@pytest.fixture(autouse=True)
+def clear_profile_cache():
+    profile_cache.clear()
+    app.dependency_overrides[get_current_user] = lambda: AuthenticatedUser(
+        subject="pepe@example.com", role="user", user_id=7
+    )
+    yield
+    profile_cache.clear()
+    app.dependency_overrides.clear()
+
+
+@patch("app.services.user_profile.get_user", new_callable=AsyncMock)
+def test_get_user_is_served_from_cache(mock_get):
+    """La segunda lectura del perfil no llama a user-auth"""
+    mock_get.return_value = profile
+
+    first = client.get("/user/7")
+    second = client.get("/user/7")
+
+    assert first.status_code == 200
+    assert second.json() == profile
+    assert mock_get.await_count == 1
+
+
+@patch("app.services.user_profile.get_user", new_callable=AsyncMock)
+@patch("app.services.user_profile.edit_user", new_callable=AsyncMock)
+def test_edit_user_writes_through_cache(mock_edit, mock_get):
+    """Editar un perfil actualiza la caché sin volver a leer de user-auth"""
+    mock_edit.return_value = {**profile, "name": "Nuevo"}
+
+    client.put("/edituser", json={"name": "Nuevo"}, params={"user_id": 7})
+    response = client.get("/user/7")
+
+    assert response.json()["name"] == "Nuevo"
+    mock_get.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_stale_profile_is_served_and_revalidated():
+    """Una entrada vencida se sirve igual y se revalida en segundo plano"""
+    with patch(
+        "app.services.user_profile.get_user", new_callable=AsyncMock
+    ) as mock_get, patch.object(profile_cache, "ttl", 0):
+        mock_get.return_value = {**profile, "name": "Actualizado"}
+        profile_cache.set(7, profile)
+
+        stale = await handle_get_user(7)
+        await asyncio.sleep(0.01)
+
+    assert stale == profile
+    mock_get.assert_awaited_once_with(7)
+    assert profile_cache.get(7)[0]["name"] == "Actualizado"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_fetch():
+    """Lecturas simultáneas de un perfil sin caché hacen una sola llamada"""
+
+    async def slow_get(user_id):
+        await asyncio.sleep(0.01)
+        return profile
+
+    with patch("app.services.user_profile.get_user", side_effect=slow_get) as mock:
+        results = await asyncio.gather(*(handle_get_user(7) for _ in range(10)))
+
+    assert results == [profile] * 10
+    assert mock.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_edit_during_pending_fetch_keeps_edited_profile():
+    """Una lectura iniciada antes de una edición no pisa el perfil editado"""
+    release = asyncio.Event()
+
+    async def slow_get(user_id):
+        await release.wait()
+        return profile
+
+    with patch("app.services.user_profile.get_user", side_effect=slow_get), patch(
+        "app.services.user_profile.edit_user", new_callable=AsyncMock
+    ) as mock_edit:
+        mock_edit.return_value = {**profile, "name": "Nuevo"}
+        pending = asyncio.ensure_future(handle_get_user(7))
+        await asyncio.sleep(0)
+
+        await handle_edit_user(7, UserUpdate(name="Nuevo"))
+        release.set()
+        await pending
+
+    assert profile_cache.get(7)[0]["name"] == "Nuevo"
@@ -0,0 +1,130 @@
+import time
+import httpx
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.config import settings
+from app.core.resilience import (
+    auth_service_breaker,
+    call_auth_service,
+    request_deadline,
+)
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def reset_breaker():
+    auth_service_breaker.reset()
+    yield
+    auth_service_breaker.reset()
+
+
+@pytest.mark.asyncio
+async def test_idempotent_call_is_retried_on_503():
+    """Un PUT que recibe 503 se reintenta y devuelve la respuesta exitosa"""
+    with patch("httpx.AsyncClient.put", new_callable=AsyncMock) as mock_put, patch(
+        "app.core.resilience._backoff", return_value=0
+    ):
+        mock_put.side_effect = [MagicMock(status_code=503), MagicMock(status_code=200)]
+
+        response = await call_auth_service("PUT", "http://fake/edituser/1", json={})
+
+    assert response.status_code == 200
+    assert mock_put.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_non_idempotent_call_is_not_retried():
+    """Un POST que falla por red no se reintenta"""
+    with patch("httpx.AsyncClient.post", new_callable=AsyncMock) as mock_post:
+        mock_post.side_effect = httpx.ConnectError("connection refused")
+
+        with pytest.raises(HTTPException) as exc_info:
+            await call_auth_service("POST", "http://fake/token/service")
+
+    assert exc_info.value.status_code == 503
+    assert mock_post.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_breaker_opens_and_fails_fast():
+    """Con el circuito abierto no se intenta la conexión y /health lo informa"""
+    with patch("httpx.AsyncClient.post", new_callable=AsyncMock) as mock_post:
+        mock_post.side_effect = httpx.ConnectError("connection refused")
+
+        for _ in range(settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD):
+            with pytest.raises(HTTPException):
+                await call_auth_service("POST", "http://fake/token/service")
+
+        with pytest.raises(HTTPException) as exc_info:
+            await call_auth_service("POST", "http://fake/token/service")
+
+    assert exc_info.value.status_code == 503
+    assert "Retry-After" in exc_info.value.headers
+    assert mock_post.await_count == settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD
+
+    health = client.get("/health").json()
+    assert health["status"] == "degraded"
+    assert health["auth_service"]["state"] == "open"
+
+
+@pytest.mark.asyncio
+async def test_expired_deadline_returns_504_without_calling():
+    """Si la petición entrante ya venció, no se llama a user-auth"""
+    token = request_deadline.set(time.monotonic() - 1)
+    try:
+        with patch("httpx.AsyncClient.put", new_callable=AsyncMock) as mock_put:
+            with pytest.raises(HTTPException) as exc_info:
+                await call_auth_service("PUT", "http://fake/edituser/1", json={})
+    finally:
+        request_deadline.reset(token)
+
+    assert exc_info.value.status_code == 504
+    mock_put.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_deadline_caps_each_timeout_separately():
+    """El plazo restante acota cada timeout sin pisar los más cortos"""
+    token = request_deadline.set(time.monotonic() + 8)
+    try:
+        with patch("httpx.AsyncClient.put", new_callable=AsyncMock) as mock_put:
+            mock_put.return_value = MagicMock(status_code=200)
+            await call_auth_service("PUT", "http://fake/edituser/1", json={})
+    finally:
+        request_deadline.reset(token)
+
+    timeout = mock_put.await_args.kwargs["timeout"]
+    assert timeout.connect == settings.HTTP_CONNECT_TIMEOUT_SECONDS
+    assert timeout.pool == settings.HTTP_POOL_TIMEOUT_SECONDS
+    assert timeout.read <= 8
+    assert timeout.write <= 8
+
+
+@pytest.mark.asyncio
+async def test_expired_deadline_does_not_hold_the_half_open_probe():
+    """Un 504 por plazo vencido en half-open no deja tomada la llamada de prueba"""
+    auth_service_breaker.state = "open"
+    auth_service_breaker.opened_at = (
+        time.monotonic() - settings.CIRCUIT_BREAKER_RESET_SECONDS - 1
+    )
+
+    with patch("httpx.AsyncClient.put", new_callable=AsyncMock) as mock_put:
+        mock_put.return_value = MagicMock(status_code=200)
+
+        token = request_deadline.set(time.monotonic() - 1)
+        try:
+            with pytest.raises(HTTPException) as exc_info:
+                await call_auth_service("PUT", "http://fake/edituser/1", json={})
+        finally:
+            request_deadline.reset(token)
+        assert exc_info.value.status_code == 504
+
+        response = await call_auth_service("PUT", "http://fake/edituser/1", json={})
+
+    assert response.status_code == 200
+    assert mock_put.await_count == 1
+    assert auth_service_breaker.state == "closed"
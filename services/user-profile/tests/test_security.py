@@ -0,0 +1,130 @@
+import time
+import jwt
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+from app.main import app
+from app.core.config import Settings
+from app.core.security import JWKSKeyStore, TokenVerifier
+
+client = TestClient(app)
+
+SECRET = "user-profile-test-secret-0123456789abcdef"
+OTHER_SECRET = "another-test-secret-0123456789abcdef"
+
+
+def user_token(uid: int, secret: str = SECRET, **claims) -> str:
+    payload = {
+        "sub": f"user{uid}@example.com",
+        "uid": uid,
+        "role": "user",
+        "scopes": ["user"],
+        "exp": int(time.time()) + 600,
+        **claims,
+    }
+    return jwt.encode(payload, secret, algorithm="HS256")
+
+
+@pytest.fixture(autouse=True)
+def shared_key_verifier():
+    with patch("app.core.security.token_verifier", TokenVerifier(secret_key=SECRET)):
+        yield
+
+
+@patch("app.services.user_profile.edit_user", new_callable=AsyncMock)
+def test_user_can_edit_own_profile(mock_edit):
+    mock_edit.return_value = {"id": 7, "name": "Pepe"}
+    response = client.put(
+        "/edituser",
+        json={"name": "Pepe"},
+        params={"user_id": 7},
+        headers={"Authorization": f"Bearer {user_token(7)}"},
+    )
+    assert response.status_code == 200
+
+
+@patch("app.services.user_profile.edit_user", new_callable=AsyncMock)
+def test_user_cannot_edit_another_profile(mock_edit):
+    response = client.put(
+        "/edituser",
+        json={"name": "Pepe"},
+        params={"user_id": 8},
+        headers={"Authorization": f"Bearer {user_token(7)}"},
+    )
+    assert response.status_code == 403
+    mock_edit.assert_not_awaited()
+
+
+def test_missing_or_invalid_token_is_rejected():
+    no_token = client.put("/edituser", json={"name": "Pepe"}, params={"user_id": 7})
+    bad_signature = client.put(
+        "/edituser",
+        json={"name": "Pepe"},
+        params={"user_id": 7},
+        headers={"Authorization": f"Bearer {user_token(7, secret=OTHER_SECRET)}"},
+    )
+    assert no_token.status_code == 401
+    assert bad_signature.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_verified_tokens_are_cached():
+    """Un token ya verificado no se vuelve a decodificar"""
+    verifier = TokenVerifier(secret_key=SECRET)
+    token = user_token(7)
+
+    with patch("app.core.security.jwt.decode", wraps=jwt.decode) as mock_decode:
+        await verifier.verify(token)
+        claims = await verifier.verify(token)
+
+    assert claims["uid"] == 7
+    assert mock_decode.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_jwks_keys_are_fetched_once_and_refreshed_on_new_kid():
+    """Las claves públicas se cachean y se vuelven a pedir ante un kid nuevo"""
+    old_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    new_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+    def jwks(*keys):
+        response = MagicMock(status_code=200)
+        response.json.return_value = {
+            "keys": [
+                {
+                    **jwt.algorithms.RSAAlgorithm.to_jwk(
+                        key.public_key(), as_dict=True
+                    ),
+                    "kid": kid,
+                    "alg": "RS256",
+                    "use": "sig",
+                }
+                for kid, key in keys
+            ]
+        }
+        return response
+
+    def rs256_token(kid, key):
+        payload = {"sub": "a@example.com", "uid": 1, "exp": int(time.time()) + 600}
+        return jwt.encode(payload, key, algorithm="RS256", headers={"kid": kid})
+
+    store = JWKSKeyStore("http://fake/.well-known/jwks.json", min_refresh_interval=0)
+    verifier = TokenVerifier(key_store=store)
+
+    with patch("httpx.AsyncClient.get", new_callable=AsyncMock) as mock_get:
+        mock_get.side_effect = [
+            jwks(("k1", old_key)),
+            jwks(("k1", old_key), ("k2", new_key)),
+        ]
+        await verifier.verify(rs256_token("k1", old_key))
+        claims = await verifier.verify(rs256_token("k2", new_key))
+
+    assert claims["uid"] == 1
+    assert mock_get.await_count == 2
+
+
+def test_settings_require_a_token_verification_key():
+    with pytest.raises(ValidationError):
+        Settings(_env_file=None, SECRET_KEY=None, AUTH_JWKS_URL=None)
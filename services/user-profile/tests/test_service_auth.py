@@ -0,0 +1,64 @@
+import asyncio
+import base64
+import json
+import time
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.core.auth import ServiceAuth, get_token_expiry
+
+
+def make_token(exp: float) -> str:
+    payload = base64.urlsafe_b64encode(json.dumps({"exp": exp}).encode()).decode()
+    return f"header.{payload.rstrip('=')}.signature"
+
+
+def token_response(token: str):
+    response = MagicMock(status_code=200, text="ok")
+    response.json.return_value = {"access_token": token, "token_type": "bearer"}
+    return response
+
+
+def test_get_token_expiry_reads_exp_claim():
+    """Se obtiene el vencimiento del token sin verificar la firma"""
+    assert get_token_expiry(make_token(1234567890)) == 1234567890
+    assert get_token_expiry("no-es-un-jwt") is None
+
+
+@pytest.mark.asyncio
+async def test_concurrent_logins_collapse_into_one():
+    """Varios 401 simultáneos con el mismo token disparan un único login"""
+    stale = make_token(time.time() + 3600)
+    fresh = make_token(time.time() + 7200)
+
+    async def slow_post(*args, **kwargs):
+        await asyncio.sleep(0.01)
+        return token_response(fresh)
+
+    with patch("httpx.AsyncClient.post", new_callable=AsyncMock) as mock_post:
+        mock_post.side_effect = slow_post
+        auth = ServiceAuth()
+        auth.access_token = stale
+
+        tokens = await asyncio.gather(
+            *(auth.login(rejected_token=stale) for _ in range(20))
+        )
+
+    assert mock_post.await_count == 1
+    assert set(tokens) == {fresh}
+
+
+@pytest.mark.asyncio
+async def test_get_token_only_logs_in_when_expired():
+    """El camino caliente no llama a user-auth mientras el token esté vigente"""
+    with patch("httpx.AsyncClient.post", new_callable=AsyncMock) as mock_post:
+        mock_post.return_value = token_response(make_token(time.time() + 3600))
+        auth = ServiceAuth()
+
+        first = await auth.get_token()
+        second = await auth.get_token()
+        assert first == second
+        assert mock_post.await_count == 1
+
+        auth.expires_at = time.time() - 1
+        await auth.get_token()
+        assert mock_post.await_count == 2